@@ -1,68 +1,180 @@
 import pandas as pd
 import numpy as np
 
+# هر کانال یک ردیف: x ها برچسب ایندکس دیتافریم و y ها قیمت نقاط خطوط کانال‌اند
+CHANNEL_COLUMNS = [
+    "type", "start", "end",
+    "lower_x0", "lower_y0", "lower_x1", "lower_y1",
+    "upper_x0", "upper_y0", "upper_x1", "upper_y1",
+]
+X_COLUMNS = ["start", "end", "lower_x0", "lower_x1", "upper_x0", "upper_x1"]
+
+
+def with_times(channels: pd.DataFrame, times: pd.Series) -> pd.DataFrame:
+    """
+    تبدیل برچسب‌های ایندکس (start/end/x) کانال‌های بسته‌شده به زمان کندل (مثلاً از df['time'])؛
+    قالبی که ذخیره و رسم می‌شود.
+    """
+    return channels.assign(**{c: times.loc[channels[c]].to_numpy() for c in X_COLUMNS})
+
+
+def _pick_pairs(pivots: np.ndarray, between: np.ndarray):
+    """
+    جفت‌های متوالی pivots که حداقل یک نقطه از between (موقعیت‌های مرتب) بینشان است.
+
+    مثل پیمایش حریصانه‌ی قبلی: بعد از هر جفت انتخاب‌شده جفت بعدی رد می‌شود، یعنی
+    در هر دنباله‌ی متوالی از جفت‌های معتبر جفت‌ها یکی در میان انتخاب می‌شوند.
+
+    :return: (اندیس اولین pivot هر جفت، اندیس اولین و آخرین نقطه‌ی between بینشان)
+    """
+    first = np.searchsorted(between, pivots[:-1], side="right")
+    stop = np.searchsorted(between, pivots[1:], side="left")
+    valid = stop > first
+
+    i = np.arange(len(valid))
+    run_start = np.maximum.accumulate(np.where(valid & ~np.concatenate(([False], valid[:-1])), i, 0))
+    chosen = np.flatnonzero(valid & ((i - run_start) % 2 == 0))
+    return chosen, first[chosen], stop[chosen] - 1
+
+
+class _Leg:
+    """
+    وضعیت حالت زنده برای یک نوع کانال: آخرین pivot و نقاط between بعد از آن.
+    """
+
+    def __init__(self):
+        self.pivot = None
+        self.first = None
+        self.last = None
+        # جفت قبلی انتخاب شده است (جفت بعدی رد می‌شود)
+        self.consumed = False
+
+    def add_pivot(self, point):
+        """
+        :return: نقاط (pivot قبلی، اولین between، آخرین between) اگر کانالی بسته شود
+        """
+        closed = None
+        if self.pivot is not None:
+            if self.consumed:
+                self.consumed = False
+            elif self.first is not None:
+                closed = (self.pivot, self.first, self.last)
+                self.consumed = True
+        self.pivot = point
+        self.first = self.last = None
+        return closed
+
+    def add_between(self, point):
+        # فقط نقاط بعد از pivot (نه روی همان ردیف)
+        if self.pivot is not None and point[2] > self.pivot[2]:
+            if self.first is None:
+                self.first = point
+            self.last = point
+
+
 class PriceChannelDetector:
     def __init__(self):
-        pass
+        self.reset()
+
+    def reset(self):
+        # حالت زنده (update)
+        self._legs = {"bullish": _Leg(), "bearish": _Leg()}
+        self._position = 0
 
-    def detect_channels(self, df: pd.DataFrame):
-        df = df.copy()
-        channels = []
+    def detect_channels(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        کانال‌های صعودی (بین دو swing_low با highs در بین) و سپس نزولی (بین دو
+        swing_high با lows در بین) روی آرایه‌های موقعیت سوینگ‌ها با searchsorted.
 
-        # استخراج نقاط معتبر
-        swing_highs = df[df['swing_high'].notna()]
-        swing_lows = df[df['swing_low'].notna()]
+        :return: DataFrame با ستون‌های CHANNEL_COLUMNS (یک ردیف برای هر کانال)
+        """
+        index = df.index.to_numpy()
+        high = df['swing_high'].to_numpy(dtype=float)
+        low = df['swing_low'].to_numpy(dtype=float)
+        highs = np.flatnonzero(~np.isnan(high))
+        lows = np.flatnonzero(~np.isnan(low))
+
+        frames = []
 
         # --------- کانال‌های صعودی (بین دو swing_low با highs در بین) ---------
-        i = 0
-        while i < len(swing_lows) - 1:
-            low1_idx = swing_lows.index[i]
-            low2_idx = swing_lows.index[i + 1]
-
-            # high بین دو low
-            highs_between = swing_highs[(swing_highs.index > low1_idx) & (swing_highs.index < low2_idx)]
-            if len(highs_between) >= 1:
-                high1_idx = highs_between.index[0]
-                high2_idx = highs_between.index[-1]
-
-                channel = {
-                    "type": "bullish",
-                    "start": low1_idx,
-                    "end": low2_idx,
-                    "lower_line": [(low1_idx, df.loc[low1_idx, 'swing_low']),
-                                   (low2_idx, df.loc[low2_idx, 'swing_low'])],
-                    "upper_line": [(high1_idx, df.loc[high1_idx, 'swing_high']),
-                                   (high2_idx, df.loc[high2_idx, 'swing_high'])],
-                }
-                channels.append(channel)
-                i += 2
-            else:
-                i += 1
+        k, h0, h1 = _pick_pairs(lows, highs)
+        frames.append(self._frame("bullish", index,
+                                  lower=(lows[k], low[lows[k]], lows[k + 1], low[lows[k + 1]]),
+                                  upper=(highs[h0], high[highs[h0]], highs[h1], high[highs[h1]]),
+                                  start=lows[k], end=lows[k + 1]))
 
         # --------- کانال‌های نزولی (بین دو swing_high با lows در بین) ---------
-        j = 0
-        while j < len(swing_highs) - 1:
-            high1_idx = swing_highs.index[j]
-            high2_idx = swing_highs.index[j + 1]
-
-            # low بین دو high
-            lows_between = swing_lows[(swing_lows.index > high1_idx) & (swing_lows.index < high2_idx)]
-            if len(lows_between) >= 1:
-                low1_idx = lows_between.index[0]
-                low2_idx = lows_between.index[-1]
-
-                channel = {
-                    "type": "bearish",
-                    "start": high1_idx,
-                    "end": high2_idx,
-                    "upper_line": [(high1_idx, df.loc[high1_idx, 'swing_high']),
-                                   (high2_idx, df.loc[high2_idx, 'swing_high'])],
-                    "lower_line": [(low1_idx, df.loc[low1_idx, 'swing_low']),
-                                   (low2_idx, df.loc[low2_idx, 'swing_low'])],
-                }
-                channels.append(channel)
-                j += 2
-            else:
-                j += 1
-
-        return channels
+        k, l0, l1 = _pick_pairs(highs, lows)
+        frames.append(self._frame("bearish", index,
+                                  lower=(lows[l0], low[lows[l0]], lows[l1], low[lows[l1]]),
+                                  upper=(highs[k], high[highs[k]], highs[k + 1], high[highs[k + 1]]),
+                                  start=highs[k], end=highs[k + 1]))
+
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _frame(kind, index, lower, upper, start, end) -> pd.DataFrame:
+        x0, y0, x1, y1 = lower
+        ux0, uy0, ux1, uy1 = upper
+        return pd.DataFrame({
+            "type": np.full(len(start), kind, dtype=object),
+            "start": index[start], "end": index[end],
+            "lower_x0": index[x0], "lower_y0": y0, "lower_x1": index[x1], "lower_y1": y1,
+            "upper_x0": index[ux0], "upper_y0": uy0, "upper_x1": index[ux1], "upper_y1": uy1,
+        }, columns=CHANNEL_COLUMNS)
+
+    # ------------------------ حالت زنده ------------------------
+
+    def update(self, index, swing_high: float = np.nan, swing_low: float = np.nan) -> pd.DataFrame:
+        """
+        افزودن یک کندل با سوینگ‌های تأییدشده‌اش (NaN = بدون سوینگ)، به ترتیب زمان.
+
+        فقط کانال در حال تشکیل هر نوع عوض می‌شود: سوینگ مخالف خط دیگرش را امتداد
+        می‌دهد و سوینگ هم‌نوع آن را می‌بندد. کانال‌های بسته‌شده همان ردیف‌های
+        detect_channels روی کل داده هستند.
+
+        :return: کانال‌هایی که با این کندل بسته شده‌اند (ستون‌های CHANNEL_COLUMNS)
+        """
+        position = self._position
+        self._position += 1
+        rows = []
+
+        bullish, bearish = self._legs["bullish"], self._legs["bearish"]
+        low = None if np.isnan(swing_low) else (index, swing_low, position)
+        high = None if np.isnan(swing_high) else (index, swing_high, position)
+
+        # اول بستن کانال‌ها (سوینگ مخالف روی همان کندل «بین» دو pivot حساب نمی‌شود)
+        closed = low and bullish.add_pivot(low)
+        if closed:
+            pivot, first, last = closed
+            rows.append(("bullish", pivot[0], index, pivot[0], pivot[1], index, swing_low,
+                         first[0], first[1], last[0], last[1]))
+        closed = high and bearish.add_pivot(high)
+        if closed:
+            pivot, first, last = closed
+            rows.append(("bearish", pivot[0], index, first[0], first[1], last[0], last[1],
+                         pivot[0], pivot[1], index, swing_high))
+
+        # سپس امتداد کانال در حال تشکیل نوع دیگر
+        if low:
+            bearish.add_between(low)
+        if high:
+            bullish.add_between(high)
+
+        return pd.DataFrame(rows, columns=CHANNEL_COLUMNS)
+
+    def open_channels(self) -> pd.DataFrame:
+        """
+        کانال‌های در حال تشکیل (pivot آخر و نقاط مخالف بعد از آن؛ end خالی است).
+        """
+        rows = []
+        bullish, bearish = self._legs["bullish"], self._legs["bearish"]
+        if bullish.first is not None and not bullish.consumed:
+            pivot, first, last = bullish.pivot, bullish.first, bullish.last
+            rows.append(("bullish", pivot[0], None, pivot[0], pivot[1], None, np.nan,
+                         first[0], first[1], last[0], last[1]))
+        if bearish.first is not None and not bearish.consumed:
+            pivot, first, last = bearish.pivot, bearish.first, bearish.last
+            rows.append(("bearish", pivot[0], None, first[0], first[1], last[0], last[1],
+                         pivot[0], pivot[1], None, np.nan))
+        return pd.DataFrame(rows, columns=CHANNEL_COLUMNS)
@@ -0,0 +1,204 @@
+# price_action/market_structure.py
+
+"""
+برچسب‌گذاری ساختار بازار (HH/HL/LH/LL)، BoS و CHoCH فقط روی رویدادهای سوینگ.
+
+سوینگ‌ها (خروجی find_peaks) به یک دنباله‌ی رویداد (موقعیت ردیف، قیمت، سقف/کف)
+تبدیل می‌شوند و همه‌ی برچسب‌ها با عملیات برداری روی همین آرایه‌های کوچک محاسبه و
+در انتها در ستون‌های دیتافریم پخش (scatter) می‌شوند؛ هزینه به تعداد سوینگ‌ها
+وابسته است نه تعداد کندل‌ها.
+
+منطق دقیقاً همان حلقه‌های ردیفی قبلی است:
+- ردیفی که هم سقف و هم کف باشد فقط سقف حساب می‌شود.
+- BoS: هر HH بالاتر از HH قبلی (BoS ↓) و هر LL پایین‌تر از LL قبلی (BoS ↑).
+- CHoCH ↑: اولین LL زیر آخرین HL، به شرط اینکه از آخرین CHoCH ↑ به بعد HH دیده شده
+  باشد (و برعکس برای CHoCH ↓ با LH و LL).
+
+StructureState وضعیت دنباله تا یک رویداد است تا برچسب‌گذاری بتواند از وسط (مثلاً
+فقط رویدادهای جدید) ادامه پیدا کند.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+STRUCTURE_LABELS = np.array(['', 'HH', 'LH', 'HL', 'LL'], dtype=object)
+BOS_LABELS = np.array(['', 'BoS ↓', 'BoS ↑'], dtype=object)
+CHOCH_LABELS = np.array([np.nan, 'CHoCH ↑', 'CHoCH ↓'], dtype=object)
+
+NONE, HH, LH, HL, LL = range(5)
+CHOCH_UP, CHOCH_DOWN = 1, 2
+
+
+class SwingEvents(NamedTuple):
+    # مرتب بر اساس موقعیت ردیف
+    pos: np.ndarray
+    price: np.ndarray
+    is_high: np.ndarray
+
+    def __len__(self):
+        return len(self.pos)
+
+    def since(self, k: int) -> "SwingEvents":
+        return SwingEvents(self.pos[k:], self.price[k:], self.is_high[k:])
+
+    def until(self, k: int) -> "SwingEvents":
+        return SwingEvents(self.pos[:k], self.price[:k], self.is_high[:k])
+
+
+class StructureState(NamedTuple):
+    # NaN یعنی هنوز رویدادی از آن نوع دیده نشده
+    last_high: float = np.nan
+    last_low: float = np.nan
+    last_hh: float = np.nan
+    last_ll: float = np.nan
+    last_hl: float = np.nan
+    last_lh: float = np.nan
+    # از آخرین CHoCH ↑ (↓) به بعد HH (LL) دیده شده است
+    bull_armed: bool = False
+    bear_armed: bool = False
+
+
+class StructureLabels(NamedTuple):
+    # کدهای هر رویداد (اندیس در *_LABELS)
+    structure: np.ndarray
+    bos: np.ndarray
+    choch: np.ndarray
+
+
+def swing_events(peaks_high: np.ndarray, high: np.ndarray, peaks_low: np.ndarray, low: np.ndarray) -> SwingEvents:
+    """
+    ادغام اندیس‌های سقف و کف در یک دنباله‌ی مرتب؛ کف‌هایی که روی ردیف سقف هستند حذف می‌شوند.
+    """
+    peaks_high = peaks_high[~np.isnan(high[peaks_high])]
+    peaks_low = peaks_low[~np.isnan(low[peaks_low])]
+    peaks_low = np.setdiff1d(peaks_low, peaks_high, assume_unique=True)
+
+    pos = np.concatenate((peaks_high, peaks_low)).astype(np.int64)
+    order = np.argsort(pos, kind="stable")
+    price = np.concatenate((high[peaks_high], low[peaks_low]))
+    is_high = np.concatenate((np.ones(len(peaks_high), dtype=bool), np.zeros(len(peaks_low), dtype=bool)))
+    return SwingEvents(pos[order], price[order].astype(float), is_high[order])
+
+
+def _last_index(mask: np.ndarray, initial: int = -1) -> np.ndarray:
+    """
+    برای هر رویداد اندیس (1-مبنا) آخرین رویداد قبلی (نه خودش) با mask؛ initial اگر نباشد.
+    """
+    idx = np.where(mask, np.arange(1, len(mask) + 1), initial)
+    last = np.maximum.accumulate(np.concatenate(([initial], idx)))
+    return last[:-1]
+
+
+def _previous(values: np.ndarray, mask: np.ndarray, initial: float) -> np.ndarray:
+    """
+    مقدار آخرین رویداد قبلی با mask (یا initial از وضعیت قبلی).
+    """
+    last = _last_index(mask, 0)
+    padded = np.concatenate(([initial], values))
+    return padded[last]
+
+
+def _first_breaks(candidates: np.ndarray, trigger: np.ndarray, armed: bool) -> np.ndarray:
+    """
+    CHoCH: از هر گروه کاندیداهایی که آخرین trigger (HH یا LL) مشترکی دارند فقط اولی؛
+    کاندیداهای قبل از اولین trigger فقط وقتی که وضعیت قبلی armed باشد (گروه 0).
+    """
+    group = _last_index(trigger, 0 if armed else -1)
+    idx = np.flatnonzero(candidates)
+    g = group[idx]
+    first = np.concatenate(([True], g[1:] != g[:-1])) if len(g) else np.zeros(0, dtype=bool)
+    fires = np.zeros(len(candidates), dtype=bool)
+    fires[idx[first & (g >= 0)]] = True
+    return fires
+
+
+def label_events(events: SwingEvents, state: StructureState = StructureState()):
+    """
+    :return: (StructureLabels، وضعیت بعد از آخرین رویداد)
+    """
+    price, is_high = events.price, events.is_high
+    n = len(events)
+
+    # ساختار بازار (HH, HL, LH, LL)
+    prev_high = _previous(price, is_high, state.last_high)
+    prev_low = _previous(price, ~is_high, state.last_low)
+    structure = np.full(n, NONE, dtype=np.int8)
+    structure[is_high & ~np.isnan(prev_high)] = LH
+    structure[is_high & (price > prev_high)] = HH
+    structure[~is_high & ~np.isnan(prev_low)] = LL
+    structure[~is_high & (price > prev_low)] = HL
+
+    hh, lh, hl, ll = (structure == HH), (structure == LH), (structure == HL), (structure == LL)
+
+    # BoS (مقایسه با NaN همیشه False است)
+    bos = np.zeros(n, dtype=np.int8)
+    bos[hh & (price > _previous(price, hh, state.last_hh))] = 1
+    bos[ll & (price < _previous(price, ll, state.last_ll))] = 2
+
+    # CHoCH
+    choch = np.zeros(n, dtype=np.int8)
+    fires_up = _first_breaks(ll & (price < _previous(price, hl, state.last_hl)), hh, state.bull_armed)
+    fires_down = _first_breaks(hh & (price > _previous(price, lh, state.last_lh)), ll, state.bear_armed)
+    choch[fires_up] = CHOCH_UP
+    choch[fires_down] = CHOCH_DOWN
+
+    labels = StructureLabels(structure, bos, choch)
+    return labels, structure_state(events, labels, state)
+
+
+def structure_state(events: SwingEvents, labels: StructureLabels, state: StructureState = StructureState()) -> StructureState:
+    """
+    وضعیت بعد از آخرین رویداد، از برچسب‌های موجود (مثلاً نتیجه‌ی اجرای قبلی).
+    """
+    price, structure, choch = events.price, labels.structure, labels.choch
+
+    def last(mask, default):
+        idx = np.flatnonzero(mask)
+        return price[idx[-1]] if len(idx) else default
+
+    def armed(trigger, fire, initial):
+        triggers, fires = np.flatnonzero(trigger), np.flatnonzero(fire)
+        last_trigger = triggers[-1] + 1 if len(triggers) else (0 if initial else -1)
+        last_fire = fires[-1] + 1 if len(fires) else -1
+        return bool(last_trigger > last_fire)
+
+    return StructureState(
+        last_high=last(events.is_high, state.last_high),
+        last_low=last(~events.is_high, state.last_low),
+        last_hh=last(structure == HH, state.last_hh),
+        last_ll=last(structure == LL, state.last_ll),
+        last_hl=last(structure == HL, state.last_hl),
+        last_lh=last(structure == LH, state.last_lh),
+        bull_armed=armed(structure == HH, choch == CHOCH_UP, state.bull_armed),
+        bear_armed=armed(structure == LL, choch == CHOCH_DOWN, state.bear_armed),
+    )
+
+
+def encode_labels(events: SwingEvents, result: pd.DataFrame) -> StructureLabels:
+    """
+    کدهای برچسب رویدادها از ستون‌های متنی یک نتیجه‌ی قبلی (structure/bos/choch).
+    """
+    def codes(column, table):
+        values = result[column].to_numpy()[events.pos]
+        return pd.Categorical(values, categories=table[1:]).codes.astype(np.int8) + 1
+
+    return StructureLabels(codes('structure', STRUCTURE_LABELS), codes('bos', BOS_LABELS),
+                           codes('choch', CHOCH_LABELS))
+
+
+def scatter_labels(n: int, events: SwingEvents, labels: StructureLabels, start: int = 0, base: pd.DataFrame = None) -> dict:
+    """
+    ستون‌های structure/bos/choch به طول n؛ ردیف‌های قبل از start از base کپی می‌شوند.
+    """
+    columns = {}
+    for name, table, codes in (('structure', STRUCTURE_LABELS, labels.structure),
+                               ('bos', BOS_LABELS, labels.bos),
+                               ('choch', CHOCH_LABELS, labels.choch)):
+        values = np.full(n, table[0], dtype=object)
+        if start:
+            values[:start] = base[name].to_numpy()[:start]
+        values[events.pos] = table[codes]
+        columns[name] = values
+    return columns
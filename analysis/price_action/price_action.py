@@ -2,10 +2,58 @@ import pandas as pd
 import numpy as np
 from scipy.signal import find_peaks
 from analysis.price_action.base_price_action import BasePriceAction
+from analysis.price_action.market_structure import (
+    swing_events, label_events, structure_state, encode_labels, scatter_labels
+)
+from indicators.feature_store import FeatureStore
 
 class SwingPointDetector(BasePriceAction):
-    def calculate(self, df, timeframe=None):
-        df = df.copy()
+    COLUMNS = ['swing_high', 'swing_low', 'structure', 'bos', 'choch']
+
+    def calculate(self, df, timeframe=None, features=None):
+        """
+        :param features: FeatureStore همین دیتافریم (مثلاً مشترک با اندیکاتورها) برای True Range
+        """
+        swing_high, swing_low, events = self.detect(df, timeframe, features)
+        labels, _ = label_events(events)
+        return self._frame(df.index, swing_high, swing_low, scatter_labels(len(df), events, labels))
+
+    def update(self, df, previous, timeframe=None, features=None):
+        """
+        نتیجه‌ی calculate برای df وقتی previous نتیجه‌ی همین محاسبه روی ابتدای df است
+        (کندل‌های جدید به انتها اضافه شده‌اند).
+
+        سوینگ‌ها روی کل df دوباره پیدا می‌شوند (prominence به میانگین ATR کل داده وابسته
+        است)، ولی برچسب‌ها فقط از اولین سوینگ تغییرکرده به بعد محاسبه می‌شوند؛ معمولاً
+        فقط آخرین سوینگ تأییدنشده (نزدیک انتهای داده) عوض می‌شود. وضعیت ساختار تا آن
+        نقطه از برچسب‌های previous خوانده می‌شود.
+        """
+        n_prev = len(previous)
+        if not n_prev or len(df) < n_prev or not df.index[:n_prev].equals(previous.index):
+            return self.calculate(df, timeframe, features)
+
+        swing_high, swing_low, events = self.detect(df, timeframe, features)
+
+        # اولین ردیفی که سوینگ آن با نتیجه‌ی قبلی فرق دارد
+        changed = np.flatnonzero(
+            ~_same(swing_high[:n_prev], previous['swing_high'].to_numpy(dtype=float))
+            | ~_same(swing_low[:n_prev], previous['swing_low'].to_numpy(dtype=float))
+        )
+        start = int(changed[0]) if len(changed) else n_prev
+        k = int(np.searchsorted(events.pos, start))
+
+        prefix = events.until(k)
+        state = structure_state(prefix, encode_labels(prefix, previous))
+        labels, _ = label_events(events.since(k), state)
+        columns = scatter_labels(len(df), events.since(k), labels, start=start, base=previous)
+        return self._frame(df.index, swing_high, swing_low, columns)
+
+    def detect(self, df, timeframe=None, features=None):
+        """
+        :return: (ستون swing_high، ستون swing_low، رویدادهای سوینگ)
+        """
+        if features is None or not features.df.index.equals(df.index):
+            features = FeatureStore(df)
 
         # تنظیم فاصله و حداقل prominence بر اساس تایم‌فریم
         if timeframe in ['M1', 'M5']:
@@ -21,101 +69,31 @@ class SwingPointDetector(BasePriceAction):
         # محاسبه prominence تطبیقی
         atr_period=14
         atr_multiplier= 0.8
-        
-        df['high_low'] = abs(df['high'] - df['low'])
-        df['high_close'] = abs(df['high'] - df['close'].shift(1))
-        df['low_close'] = abs(df['low'] - df['close'].shift(1))
-        df['true_range'] = df[['high_low', 'high_close', 'low_close']].max(axis=1)
-        df['atr'] = df['true_range'].rolling(window=atr_period).mean()
-        dynamic_prominence = df['atr'].mean() * atr_multiplier
+
+        # ردیف اول (بدون کندل قبلی) فقط high-low است
+        true_range = features.true_range().fillna(abs(df['high'] - df['low']))
+        atr = true_range.rolling(window=atr_period).mean()
+        dynamic_prominence = atr.mean() * atr_multiplier
 
         # تشخیص سوینگ‌ها
-        peaks_high, _ = find_peaks(df['high'], prominence=dynamic_prominence, distance=distance)
-        peaks_low, _ = find_peaks(-df['low'], prominence=dynamic_prominence, distance=distance)
-
-        df['swing_high'] = np.nan
-        df['swing_low'] = np.nan
-        df.loc[df.index[peaks_high], 'swing_high'] = df.loc[df.index[peaks_high], 'high']
-        df.loc[df.index[peaks_low], 'swing_low'] = df.loc[df.index[peaks_low], 'low']
-
-        # ساختار بازار (HH, HL, LH, LL)
-        structure_labels = ['']
-        last_high = None
-        last_low = None
-        for i in range(1, len(df)):
-            curr = df.iloc[i]
-            label = ''
-            if not pd.isna(curr['swing_high']):
-                if last_high is not None:
-                    label = 'HH' if curr['swing_high'] > last_high else 'LH'
-                last_high = curr['swing_high']
-            elif not pd.isna(curr['swing_low']):
-                if last_low is not None:
-                    label = 'HL' if curr['swing_low'] > last_low else 'LL'
-                last_low = curr['swing_low']
-            structure_labels.append(label)
-        df['structure'] = structure_labels
-
-        # تشخیص BoS
-        bos_list = ['']
-        last_hh = None
-        last_ll = None
-        for i in range(1, len(df)):
-            row = df.iloc[i]
-            bos = ''
-            if df['structure'].iloc[i] == 'HH':
-                if last_hh is not None and not pd.isna(row['swing_high']) and row['swing_high'] > last_hh:
-                    bos = 'BoS ↓'
-                last_hh = row['swing_high']
-            elif df['structure'].iloc[i] == 'LL':
-                if last_ll is not None and not pd.isna(row['swing_low']) and row['swing_low'] < last_ll:
-                    bos = 'BoS ↑'
-                last_ll = row['swing_low']
-            bos_list.append(bos)
-        df['bos'] = bos_list
-
-        # تشخیص CHoCH
-        choch_list = [np.nan]
-        last_trend = None
-        last_hl = None
-        last_lh = None
-        confirmed_bull = False
-        confirmed_bear = False
-        for i in range(1, len(df)):
-            row = df.iloc[i]
-            structure = row['structure']
-            price = None
-            if structure == 'HL':
-                price = row['swing_low']
-            elif structure == 'LH':
-                price = row['swing_high']
-            elif structure == 'LL':
-                price = row['swing_low']
-            elif structure == 'HH':
-                price = row['swing_high']
-            label = np.nan
-            if structure == 'HH' and last_trend != 'bullish':
-                confirmed_bull = True
-                last_trend = 'bullish'
-            elif structure == 'LL' and last_trend != 'bearish':
-                confirmed_bear = True
-                last_trend = 'bearish'
-            if structure == 'HL' and price is not None:
-                last_hl = price
-            elif structure == 'LH' and price is not None:
-                last_lh = price
-            if confirmed_bull and structure == 'LL' and last_hl is not None and price < last_hl:
-                label = 'CHoCH ↑'
-                confirmed_bull = False
-                last_trend = 'bearish'
-            if confirmed_bear and structure == 'HH' and last_lh is not None and price > last_lh:
-                label = 'CHoCH ↓'
-                confirmed_bear = False
-                last_trend = 'bullish'
-            choch_list.append(label)
-        df['choch'] = choch_list
-
-        # حذف اضافات
-        df.drop(columns=['high_low', 'high_close', 'low_close', 'true_range', 'atr'], inplace=True, errors='ignore')
-
-        return df[['swing_high', 'swing_low', 'structure', 'bos', 'choch']]
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        peaks_high, _ = find_peaks(high, prominence=dynamic_prominence, distance=distance)
+        peaks_low, _ = find_peaks(-low, prominence=dynamic_prominence, distance=distance)
+
+        swing_high = np.full(len(df), np.nan)
+        swing_low = np.full(len(df), np.nan)
+        swing_high[peaks_high] = high[peaks_high]
+        swing_low[peaks_low] = low[peaks_low]
+
+        return swing_high, swing_low, swing_events(peaks_high, high, peaks_low, low)
+
+    def _frame(self, index, swing_high, swing_low, columns):
+        result = pd.DataFrame({'swing_high': swing_high, 'swing_low': swing_low, **columns}, index=index)
+        # مثل قبل: اگر هیچ CHoCH نباشد ستون float (همه NaN) است
+        result['choch'] = result['choch'].infer_objects()
+        return result[self.COLUMNS]
+
+
+def _same(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a == b) | (np.isnan(a) & np.isnan(b))
@@ -1,80 +1,116 @@
 # price_action/manager.py
 
+"""
+مرحله‌ی دسته‌ای پرایس اکشن: سوینگ‌ها، ساختار بازار (HH/HL/LH/LL)، BoS/CHoCH و
+کانال‌ها برای هر (نماد، تایم‌فریم) یک بار محاسبه و ذخیره می‌شوند تا داشبورد فقط
+نتایج را بخواند.
+
+- ستون‌های سوینگ و برچسب‌ها در جدول باریک price_action_<tf> (مسیر
+  store_indicator_frame؛ برچسب‌ها به‌صورت کد Categorical).
+- کانال‌ها با x های زمانی در جدول channels_<tf>.
+
+prominence سوینگ‌ها به میانگین ATR کل پنجره وابسته است، پس هر اجرا روی کل پنجره
+است؛ store_indicator_frame فقط ردیف‌های تغییرکرده را بازنویسی می‌کند.
+"""
+
+import json
+
 import pandas as pd
-import sqlite3
 
-from database.db_operations import fetch_recent_data, connect, get_table_name
-from price_action.swing_points import SwingPointDetector
+from database.db_operations import (
+    store_indicator_frame,
+    store_channel_frame,
+    get_last_ohlcv_time,
+    get_ohlcv_changes,
+    get_metadata,
+    update_symbol_metadata
+)
+from indicators.ohlcv_frame import OHLCVFrame, FULL_HISTORY_LIMIT
+from analysis.price_action.price_action import SwingPointDetector
+from analysis.price_action.market_structure import STRUCTURE_LABELS, BOS_LABELS, CHOCH_LABELS
+from analysis.channel_detector import PriceChannelDetector, with_times
+
+PRICE_ACTION_NAME = "price_action"
+PRICE_ACTION_LIMIT = FULL_HISTORY_LIMIT
+
+# با تغییر خروجی یا قالب ذخیره افزایش یابد تا اجرای بعدی کامل باشد
+STATE_VERSION = 1
+
+
+def _state_key(timeframe: str) -> str:
+    return f"{PRICE_ACTION_NAME}_state_{timeframe}"
+
+
+def load_price_action_state(symbol: str, timeframe: str):
+    raw = get_metadata(symbol, _state_key(timeframe))
+    state = json.loads(raw) if raw else None
+    return state if state and state.get("version") == STATE_VERSION else None
+
 
-def add_column_if_not_exists(conn: sqlite3.Connection, table: str, column: str):
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table})")
-    columns = [row[1] for row in cursor.fetchall()]
-    if column not in columns:
-        print(f"➕ Adding column '{column}' to {table}")
-        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} REAL")
-        conn.commit()
+def _save_state(symbol: str, timeframe: str, last_time: str, ohlcv_version: int):
+    state = {"version": STATE_VERSION, "last_time": last_time, "ohlcv_version": ohlcv_version}
+    update_symbol_metadata(symbol, _state_key(timeframe), json.dumps(state))
+
+
+def needs_update(symbol: str, timeframe: str) -> bool:
+    """
+    بررسی ارزان (فقط متادیتا) اینکه OHLCV بعد از آخرین اجرای پرایس اکشن تغییر کرده است یا نه.
+    """
+    last_time = get_last_ohlcv_time(symbol, timeframe)
+    if last_time is None:
+        return False
+
+    state = load_price_action_state(symbol, timeframe)
+    if state is None or state["last_time"] != last_time:
+        return True
+    return get_ohlcv_changes(symbol, timeframe, state["ohlcv_version"]) is not None
+
+
+def _encode(result: pd.DataFrame) -> pd.DataFrame:
+    """
+    ستون‌های متنی structure/bos/choch → Categorical (برای ذخیره به‌صورت کد).
+    """
+    return result.assign(
+        structure=pd.Categorical(result['structure'], categories=list(STRUCTURE_LABELS)),
+        bos=pd.Categorical(result['bos'], categories=list(BOS_LABELS)),
+        choch=pd.Categorical(result['choch'], categories=list(CHOCH_LABELS[1:])),
+    )
+
+
+def calculate_and_store_price_action(symbol: str, timeframe: str, incremental: bool = True,
+                                     frame: OHLCVFrame = None) -> int:
+    """
+    :param incremental: اگر OHLCV از آخرین اجرا تغییری نکرده باشد کاری انجام نمی‌شود
+    :param frame: کندل‌های مشترک با مراحل دیگر همین کار (None = خواندن مستقل)
+    :return: تعداد کندل‌هایی که پرایس اکشنشان محاسبه و ذخیره شد (0 = بدون تغییر)
+    """
+    # نسخه پیش از خواندن داده‌ها گرفته می‌شود تا تغییرات حین اجرا در اجرای بعدی دیده شوند
+    frame = frame or OHLCVFrame(symbol, timeframe)
+    ohlcv_version = frame.version
+
+    if incremental and not needs_update(symbol, timeframe):
+        # ثبت نسخه‌ی فعلی تا با کوتاه شدن تاریخچه‌ی تغییرات بی‌دلیل محاسبه‌ی کامل لازم نشود
+        state = load_price_action_state(symbol, timeframe)
+        if state and state["ohlcv_version"] != ohlcv_version:
+            _save_state(symbol, timeframe, state["last_time"], ohlcv_version)
+        print(f"⚪️ Price action up to date for {symbol} [{timeframe}]")
+        return 0
 
-def calculate_and_store_price_action(symbol: str, timeframe: str):
     print(f"🔍 Calculating price action for {symbol} [{timeframe}]...")
-    table = get_table_name(timeframe)
-    conn = connect(symbol)
 
     # دریافت داده‌ها (تا 10100 کندل برای اطمینان)
-    df_rows = fetch_recent_data(symbol, timeframe, limit=10100)
-    df = pd.DataFrame(df_rows, columns=["time", "open", "high", "low", "close", "volume"])
+    df = frame.tail(PRICE_ACTION_LIMIT)
     if df.empty:
         print("⚠️ No data available.")
-        conn.close()
-        return
-
-    # لیست ماژول‌های پرایس اکشن
-    price_action_objects = [
-        SwingPointDetector(symbol, timeframe, params={
-            "atr_period": 14,
-            "atr_multiplier": 0.5,
-            "distance": 1
-        })
-    ]
-
-    cached_results = {}
-    all_columns = set()
-
-    for pa in price_action_objects:
-        result = pa.calculate(df.copy())
-        cached_results[pa] = result
-        all_columns.update([c for c in result.columns if c != "time"])
-
-    # اضافه کردن ستون‌ها به دیتابیس
-    for col in sorted(all_columns):
-        add_column_if_not_exists(conn, table, col)
-
-    # ادغام نتایج در df اصلی
-    for result in cached_results.values():
-        for col in result.columns:
-            if col != "time":
-                df[col] = result[col]
-
-    # تبدیل زمان به فرمت سازگار
-    df['time'] = df['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
-
-    # بروزرسانی دیتابیس
-    cursor = conn.cursor()
-    for idx, row in df.iterrows():
-        time_val = row["time"]
-        update_fields = []
-        update_values = []
-
-        for col in all_columns:
-            val = row.get(col)
-            if pd.notna(val):
-                update_fields.append(f"{col} = ?")
-                update_values.append(str(val))
-
-        if update_fields:
-            sql = f"UPDATE {table} SET {', '.join(update_fields)} WHERE time = ?"
-            cursor.execute(sql, (*update_values, time_val))
-
-    conn.commit()
-    conn.close()
-    print(f"✅ Price action stored for {symbol} [{timeframe}]")
+        return 0
+
+    result = df[['time']].join(SwingPointDetector(symbol, timeframe).calculate(df, timeframe))
+    updated = store_indicator_frame(symbol, timeframe, PRICE_ACTION_NAME, _encode(result))
+
+    # کانال‌ها با x های زمانی؛ همه‌ی کانال‌های پنجره جایگزین می‌شوند
+    channels = with_times(PriceChannelDetector().detect_channels(result), df['time'])
+    stored = store_channel_frame(symbol, timeframe, channels)
+
+    _save_state(symbol, timeframe, df['time'].iloc[-1].strftime('%Y-%m-%d %H:%M:%S'), ohlcv_version)
+    print(f"✅ Price action stored for {symbol} [{timeframe}]: {updated} rows changed, {stored} channels")
+    return len(df)
@@ -2,12 +2,12 @@
 
 import streamlit as st
 import pandas as pd
-import subprocess
 
-from mt5_connector.historical_fetcher import download_btcusd
-from database.db_operations import fetch_recent_data
+from config import REFRESH_IN_APP, REFRESH_INTERVAL, TIMEFRAME_MAP
+from refresh_service import RefreshService, get_last_updated
+from indicators.indicator_manager import fetch_indicators
 from analysis.price_action.price_action import SwingPointDetector
-from analysis.channel_detector import PriceChannelDetector
+from database.db_operations import fetch_channel_frame
 from visualization.charts import (
     plot_price_action_chart,
     plot_atr_chart,
@@ -25,31 +25,65 @@ st.title("🔍 BTCUSD Price Action Viewer")
 symbol = "BTCUSD"
 timeframe = "H4"
 
-# دانلود داده‌ها
-download_btcusd()
+# فقط ستون‌هایی که چارت‌ها استفاده می‌کنند خوانده می‌شوند
+CHART_COLUMNS = [
+    "open", "high", "low", "close", "volume",
+    # ATR
+    "TR", "Volatility_Percent", "Trend_Signal", "ATR_Momentum",
+    # EMA & ADX
+    "EMA_short_9", "EMA_mid_50", "EMA_long_200", "score_EMA", "ADX", "diplusn", "diminusn", "sig_final",
+    # MACD
+    "EMA", "SMA", "RMA", "WMA", "DEMA", "TEMA", "VIDYA", "MACD", "Signal", "Histogram",
+    "long_entry", "short_entry", "isAboveMA",
+    # RSI
+    "RSI", "RSI_ST", "RSI_trend",
+    # Price action (سوینگ‌ها و ساختار بازار)
+    *SwingPointDetector.COLUMNS,
+]
 
-with st.spinner("در حال اجرای اندیکاتورها..."):
-    subprocess.run(["python", "run_indicators_launcher.py"])
+# محدود کردن حجم داده برای رسم سریع‌تر
+MAX_ROWS = 5000
+
+
+@st.cache_resource
+def get_refresh_service(symbol: str, timeframe: str) -> RefreshService:
+    # یک سرویس برای کل پروسه‌ی streamlit؛ دانلود و اندیکاتورها فقط برای نماد و تایم‌فریم نمایش‌داده‌شده
+    tf_enum = next(tf for tf, name in TIMEFRAME_MAP.items() if name == timeframe)
+    return RefreshService([symbol], interval=REFRESH_INTERVAL, timeframes=[tf_enum]).start()
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_chart_data(symbol: str, timeframe: str, last_updated):
+    """
+    last_updated فقط کلید کش است: تا بروزرسانی بعدی سرویس نتیجه از کش خوانده می‌شود.
+    """
+    df = fetch_indicators(symbol, timeframe, limit=MAX_ROWS, columns=CHART_COLUMNS)
+    if df.empty:
+        return df, df, None
+
+    # سوینگ‌ها، ساختار و کانال‌ها در مرحله‌ی دسته‌ای پرایس اکشن محاسبه شده‌اند؛ اینجا فقط خوانده می‌شوند
+    result_df = df.reindex(columns=[*df.columns, *(c for c in SwingPointDetector.COLUMNS if c not in df.columns)])
+    channels = fetch_channel_frame(symbol, timeframe, since=df['time'].iloc[0])
+    return df, result_df, channels
 
-df = fetch_recent_data(symbol, timeframe)
+
+last_updated = get_last_updated(symbol)
+if REFRESH_IN_APP:
+    service = get_refresh_service(symbol, timeframe)
+    if last_updated is None:
+        # فقط بار اول (دیتابیس خالی) منتظر اولین دور سرویس می‌مانیم
+        with st.spinner("در حال دریافت داده‌ها و اجرای اندیکاتورها..."):
+            service.wait_first_cycle(timeout=300)
+        last_updated = get_last_updated(symbol)
+
+df, result_df, channels = load_chart_data(symbol, timeframe, last_updated)
 
 if df.empty:
     st.warning("داده‌ای برای نمایش وجود ندارد.")
     st.stop()
 
-# محدود کردن حجم داده برای رسم سریع‌تر
-MAX_ROWS = 5000
-if len(df) > MAX_ROWS:
-    df = df.tail(MAX_ROWS)
-
-# محاسبه Swing Points
-detector = SwingPointDetector(symbol, timeframe)
-result_df = df.copy()
-result_df[['swing_high', 'swing_low', 'structure', 'bos', 'choch']] = detector.calculate(df, timeframe)
-
-# تشخیص کانال‌ها
-channel_detector = PriceChannelDetector()
-channels = channel_detector.detect_channels(result_df)
+if last_updated:
+    st.caption(f"آخرین بروزرسانی (UTC): {last_updated[:19]}")
 
 # نمایش درصد نوسان قیمت
 st.subheader("درصد نوسان قیمت %")
@@ -1,14 +1,30 @@
-import MetaTrader5 as mt5
-from MetaTrader5 import TIMEFRAME_M5
+# پکیج MetaTrader5 یا بازپخش آفلاین آن (mt5_connector/backend.py)
+from mt5_connector.backend import mt5
 from datetime import timedelta
 
 MT5_LOGIN = 90488412
 MT5_PASSWORD = 'Nm001970@'
 MT5_SERVER = 'LiteFinance-MT5-Demo'
 
-TIMEFRAME = TIMEFRAME_M5
+TIMEFRAME = mt5.TIMEFRAME_M5
 HIST_CANDLES = 1000
 
+# جدول‌های جدید OHLCV زمان را به‌صورت INTEGER (ثانیه از epoch) در جدول WITHOUT ROWID ذخیره می‌کنند؛
+# جدول‌های قدیمی TEXT با database/migrate_time_keys.py قابل تبدیل‌اند.
+EPOCH_TIME_KEYS = True
+
+# اگر True باشد فقط M1 از بروکر دانلود می‌شود و بقیه‌ی تایم‌فریم‌ها از M1 ذخیره‌شده
+# ساخته می‌شوند (database/ohlcv_resampler.py)
+RESAMPLE_FROM_M1 = False
+
+# کش ستونی OHLCV (database/column_cache.py): فایل‌های np.memmap کنار SQLite که هنگام خواندن هر تایم‌فریم همگام می‌شوند
+COLUMN_CACHE = True
+
+# سرویس بروزرسانی پس‌زمینه (refresh_service.py): فاصله‌ی دورها (ثانیه) و اجرای آن درون app.py
+# (اگر سرویس جداگانه اجرا می‌شود REFRESH_IN_APP را False کنید)
+REFRESH_INTERVAL = 60
+REFRESH_IN_APP = True
+
 SUPPORTED_TIMEFRAMES=[
     mt5.TIMEFRAME_M1,
     mt5.TIMEFRAME_M5,
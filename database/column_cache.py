@@ -0,0 +1,251 @@
+# database/column_cache.py
+
+"""
+کش ستونی OHLCV کنار SQLite: برای هر (نماد، تایم‌فریم) و هر ستون یک فایل باینری با
+عرض ثابت (time به‌صورت datetime64[ns]، قیمت‌ها float64، حجم int64) که با np.memmap
+باز می‌شود؛ خواندن هر بازه از تاریخچه فقط نمایی روی همین فایل‌هاست.
+
+- فایل‌ها فقط به انتها اضافه می‌شوند: بایت‌هایی که یک بار نوشته شده‌اند (و ممکن است
+  به‌صورت نمای بدون کپی در OHLCVFrame همین پروسه یا پروسه‌ای دیگر باشند) هرگز
+  بازنویسی نمی‌شوند.
+- هر نسل (generation) فایل‌ها در پوشه‌ی خودش است (data/column_cache/<symbol>/<tf>/<n>/).
+  اگر ردیف‌های قبلاً کش‌شده تغییر کنند (جایگزینی کندل، پر کردن فاصله) یا کش بعد از
+  delete_old_data نامعتبر شود، نسل جدیدی نوشته و با ثبت آن در metadata نماد (کلید
+  column_cache_<tf>) یکجا جایگزین می‌شود؛ نسل‌های قدیمی‌تر از نسل قبلی پاک می‌شوند.
+- همگام‌سازی تنبل است: فقط هنگام خواندن همان تایم‌فریم. بررسی «به‌روز بودن» فقط
+  خواندن آخرین نسخه‌ی ohlcv_changes همین تایم‌فریم است؛ قفل نوشتن (BEGIN IMMEDIATE)
+  فقط وقتی گرفته می‌شود که این تایم‌فریم واقعاً تغییر کرده باشد.
+
+    df = read_ohlcv("BTCUSD", "M1", start="2024-01-01", end="2024-02-01")
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from config import COLUMN_CACHE
+from database.db_operations import (
+    connect,
+    fetch_recent_data,
+    get_ohlcv_changes,
+    get_timeframe_version,
+    get_table_name,
+    OHLCV_COLUMNS
+)
+
+CACHE_DIR = "data/column_cache"
+
+DTYPES = {
+    "time": np.dtype("datetime64[ns]"),
+    "open": np.dtype("float64"),
+    "high": np.dtype("float64"),
+    "low": np.dtype("float64"),
+    "close": np.dtype("float64"),
+    "volume": np.dtype("int64"),
+}
+
+# حداقل ظرفیت فایل‌ها (ردیف) تا درج‌های کوچک فایل را مدام بزرگ نکنند
+MIN_CAPACITY = 65536
+
+# نگاشت‌های باز هر پروسه: (symbol, timeframe) -> (نسل، ظرفیت، {ستون: memmap})
+_maps = {}
+
+
+def _meta_key(timeframe: str) -> str:
+    return f"column_cache_{timeframe}"
+
+
+def _cache_dir(symbol: str, timeframe: str) -> str:
+    return os.path.join(CACHE_DIR, symbol, timeframe)
+
+
+def _column_path(symbol: str, timeframe: str, generation: int, column: str) -> str:
+    return os.path.join(_cache_dir(symbol, timeframe), str(generation), f"{column}.bin")
+
+
+def _generations(symbol: str, timeframe: str) -> list:
+    root = _cache_dir(symbol, timeframe)
+    names = os.listdir(root) if os.path.isdir(root) else []
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+def _load_meta(conn, timeframe: str):
+    row = conn.execute('SELECT value FROM metadata WHERE key = ?', (_meta_key(timeframe),)).fetchone()
+    meta = json.loads(row[0]) if row else None
+    # metadata قالب قدیمی (بدون نسل) = کش نامعتبر
+    return meta if meta and "generation" in meta else None
+
+
+def _write_columns(symbol: str, timeframe: str, generation: int, position: int, columns: dict) -> int:
+    """
+    نوشتن columns (آرایه یا ستون‌های دیتافریم) از ردیف position به بعد؛ فقط بعد از
+    ردیف‌های معتبر فعلی (بزرگ کردن فایل‌ها در صورت نیاز).
+
+    :return: ظرفیت فایل‌ها (ردیف)
+    """
+    os.makedirs(os.path.dirname(_column_path(symbol, timeframe, generation, "time")), exist_ok=True)
+    rows = position + len(columns["time"])
+    paths = {c: _column_path(symbol, timeframe, generation, c) for c in OHLCV_COLUMNS}
+    current = min(os.path.getsize(p) // DTYPES[c].itemsize if os.path.exists(p) else 0 for c, p in paths.items())
+    capacity = current if current >= rows else max(MIN_CAPACITY, 2 * current, rows)
+
+    for c, path in paths.items():
+        dtype = DTYPES[c]
+        values = np.ascontiguousarray(np.asarray(columns[c]).astype(dtype, copy=False))
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            if f.seek(0, os.SEEK_END) < capacity * dtype.itemsize:
+                f.truncate(capacity * dtype.itemsize)
+            f.seek(position * dtype.itemsize)
+            f.write(values.tobytes())
+    return capacity
+
+
+def _remove_old_generations(symbol: str, timeframe: str, keep: set):
+    # نسل قبلی نگه داشته می‌شود تا خواننده‌ای که metadata قدیمی را خوانده هنوز فایل‌ها را پیدا کند؛
+    # روی ویندوز فایل نگاشت‌شده پاک نمی‌شود و در همگام‌سازی بعدی دوباره امتحان می‌شود
+    for generation in _generations(symbol, timeframe):
+        if generation not in keep:
+            shutil.rmtree(os.path.join(_cache_dir(symbol, timeframe), str(generation)), ignore_errors=True)
+
+
+def _is_current(meta, version: int) -> bool:
+    return meta is not None and meta["version"] == version
+
+
+def sync_column_cache(symbol: str, timeframe: str):
+    """
+    همگام کردن کش با جدول OHLCV.
+
+    :return: metadata کش (generation، rows، capacity، version) یا None اگر جدول OHLCV وجود ندارد
+    """
+    conn = connect(symbol)
+    try:
+        meta = _load_meta(conn, timeframe)
+    except sqlite3.OperationalError:
+        # دیتابیس نماد هنوز ساخته نشده
+        return None
+    # فقط خواندن: بدون تغییر در این تایم‌فریم قفلی گرفته نمی‌شود
+    if _is_current(meta, get_timeframe_version(symbol, timeframe)):
+        return meta
+
+    # اگر تراکنشی باز است (درون transaction()) قفل نوشتن همین حالا در اختیار این اتصال است
+    own = not conn.in_transaction
+    if own:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        meta = _load_meta(conn, timeframe)
+        if meta is not None and not os.path.exists(_column_path(symbol, timeframe, meta["generation"], "time")):
+            # فایل‌های نسل فعلی (دستی) پاک شده‌اند: ساخت دوباره
+            meta = None
+        version = get_timeframe_version(symbol, timeframe)
+        if _is_current(meta, version):
+            if own:
+                conn.rollback()
+            return meta
+
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                            (get_table_name(timeframe),)).fetchone():
+            if own:
+                conn.rollback()
+            return None
+
+        if meta is None:
+            since, position = None, 0
+        else:
+            since = get_ohlcv_changes(symbol, timeframe, meta["version"])
+            position = meta["rows"]
+            if since is not None:
+                times = _columns(symbol, timeframe, meta)["time"]
+                position = int(np.searchsorted(times, np.datetime64(pd.Timestamp(since), "ns")))
+
+        if meta is not None and since is None:
+            # تغییرات این تایم‌فریم در ردیف‌های کش اثری ندارند
+            meta = dict(meta)
+        elif meta is not None and position == meta["rows"]:
+            # فقط ردیف‌های جدید بعد از انتهای کش: اضافه به همان نسل
+            df = fetch_recent_data(symbol, timeframe, limit=None, columns=OHLCV_COLUMNS, start=since)
+            capacity = _write_columns(symbol, timeframe, meta["generation"], position, df)
+            meta = dict(meta, rows=position + len(df), capacity=capacity)
+        else:
+            # ردیف‌های کش‌شده تغییر کرده‌اند یا کشی نیست: نسل جدید (پیشوند بدون تغییر از نسل فعلی)
+            existing = _generations(symbol, timeframe)
+            # بعد از reset_column_cache نسل قبلی همان آخرین پوشه است
+            previous = meta["generation"] if meta is not None else max(existing, default=None)
+            generation = max([*existing, previous or 0]) + 1
+            capacity = 0
+            if position:
+                prefix = {c: values[:position] for c, values in _columns(symbol, timeframe, meta).items()}
+                capacity = _write_columns(symbol, timeframe, generation, 0, prefix)
+            df = fetch_recent_data(symbol, timeframe, limit=None, columns=OHLCV_COLUMNS, start=since)
+            if len(df) or not capacity:
+                capacity = _write_columns(symbol, timeframe, generation, position, df)
+            meta = {"generation": generation, "rows": position + len(df), "capacity": capacity}
+            _remove_old_generations(symbol, timeframe, {generation, previous})
+        meta["version"] = version
+
+        conn.execute('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+                     (_meta_key(timeframe), json.dumps(meta)))
+        if own:
+            conn.commit()
+    except BaseException:
+        if own:
+            conn.rollback()
+        raise
+    return meta
+
+
+def reset_column_cache(symbol: str, timeframe: str):
+    """
+    نامعتبر کردن کش (مثلاً بعد از حذف ردیف‌های قدیمی)؛ خواندن بعدی نسل جدیدی می‌سازد
+    و فایل‌های فعلی (و نماهای باز روی آن‌ها) دست نمی‌خورند.
+    """
+    conn = connect(symbol)
+    conn.execute('DELETE FROM metadata WHERE key = ?', (_meta_key(timeframe),))
+    conn.commit()
+
+
+def _columns(symbol: str, timeframe: str, meta: dict) -> dict:
+    """
+    نمای فقط‌خواندنی ردیف‌های معتبر هر ستون؛ نگاشت‌ها تا تغییر نسل یا بزرگ شدن فایل‌ها نگه داشته می‌شوند.
+    """
+    key = (symbol, timeframe)
+    cached = _maps.get(key)
+    if cached is None or cached[:2] != (meta["generation"], meta["capacity"]):
+        arrays = {c: np.memmap(_column_path(symbol, timeframe, meta["generation"], c), dtype=DTYPES[c], mode="r",
+                               shape=(meta["capacity"],))
+                  for c in OHLCV_COLUMNS}
+        cached = _maps[key] = (meta["generation"], meta["capacity"], arrays)
+    return {c: np.asarray(values[:meta["rows"]]) for c, values in cached[2].items()}
+
+
+def read_ohlcv(symbol: str, timeframe: str, limit: int = 5000, columns: list = None,
+               start=None, end=None, dtypes: dict = None) -> pd.DataFrame:
+    """
+    همان خروجی fetch_recent_data (قدیمی به جدید، آخرین limit ردیف در بازه‌ی
+    [start, end)) به‌صورت نمای فقط‌خواندنی روی فایل‌های کش؛ بدون کپی و بدون خواندن
+    کل تاریخچه در حافظه. با COLUMN_CACHE=False مستقیم از SQLite خوانده می‌شود.
+    """
+    meta = sync_column_cache(symbol, timeframe) if COLUMN_CACHE else None
+    if meta is None:
+        return fetch_recent_data(symbol, timeframe, limit=limit, columns=columns, start=start, end=end, dtypes=dtypes)
+
+    try:
+        arrays = _columns(symbol, timeframe, meta)
+    except FileNotFoundError:
+        # فایل‌های نسل ثبت‌شده در دسترس نیستند: یک بار ساخت دوباره
+        reset_column_cache(symbol, timeframe)
+        arrays = _columns(symbol, timeframe, sync_column_cache(symbol, timeframe))
+    times = arrays["time"]
+    first = 0 if start is None else int(np.searchsorted(times, np.datetime64(pd.Timestamp(start), "ns")))
+    stop = len(times) if end is None else int(np.searchsorted(times, np.datetime64(pd.Timestamp(end), "ns")))
+    if limit is not None:
+        first = max(first, stop - limit)
+    first = min(first, stop)
+
+    names = ["time", *[c for c in columns if c != "time"]] if columns else list(OHLCV_COLUMNS)
+    df = pd.DataFrame({c: arrays[c][first:stop] for c in names}, copy=False)
+    return df.astype(dtypes) if dtypes else df
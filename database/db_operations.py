@@ -1,30 +1,194 @@
+import atexit
 import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 import os
-from config import TIMEFRAME_MAP
+from config import TIMEFRAME_MAP, EPOCH_TIME_KEYS, COLUMN_CACHE
 
 # ------------------------ مسیر و اتصال ------------------------
 
+DB_DIR = "data/db_per_symbol"
+
+# تنظیمات هر اتصال: WAL تا خواننده‌ها (Streamlit) و نویسنده‌ها (اندیکاتورها) همدیگر را مسدود نکنند
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",      # 64MB
+    "PRAGMA mmap_size=268435456",    # 256MB
+    "PRAGMA temp_store=MEMORY",
+)
+
+_db_dir_ready = False
+_pool = threading.local()
+_inherited_pools = []
+_initialized_tables = set()
+
+
 def get_db_path(symbol: str) -> str:
-    base_dir = "data/db_per_symbol"
-    os.makedirs(base_dir, exist_ok=True)
-    return os.path.join(base_dir, f"{symbol}.db")
+    global _db_dir_ready
+    if not _db_dir_ready:
+        os.makedirs(DB_DIR, exist_ok=True)
+        _db_dir_ready = True
+    return os.path.join(DB_DIR, f"{symbol}.db")
 
 def connect(symbol: str):
-    path = get_db_path(symbol)
-    return sqlite3.connect(path)
+    """
+    اتصال کش‌شده به دیتابیس نماد.
+
+    هر ترد از هر پروسه اتصال‌های خودش را دارد (sqlite3 اجازه‌ی اشتراک بین تردها را
+    نمی‌دهد و اتصال نباید از fork عبور کند)؛ بنابراین فراخواننده‌ها نباید آن را ببندند.
+    """
+    connections = getattr(_pool, "connections", None)
+    if connections is None:
+        connections = _pool.connections = {}
+
+    conn = connections.get(symbol)
+    if conn is None:
+        conn = sqlite3.connect(get_db_path(symbol), timeout=30, cached_statements=512)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        connections[symbol] = conn
+    return conn
+
+def close_connections():
+    """
+    بستن اتصال‌های کش‌شده‌ی ترد جاری.
+    """
+    connections = getattr(_pool, "connections", None) or {}
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+def _deferred() -> set:
+    # اتصال‌هایی از ترد جاری که درون transaction() هستند
+    deferred = getattr(_pool, "deferred", None)
+    if deferred is None:
+        deferred = _pool.deferred = set()
+    return deferred
+
+@contextmanager
+def transaction(symbol: str):
+    """
+    همه‌ی نوشتن‌های ترد جاری روی دیتابیس نماد (insert_ohlcv_data، store_indicator_frame،
+    store_channel_frame، update_symbol_metadata) در یک تراکنش:
+    commit در پایان بلوک و rollback همه‌چیز در صورت خطا. بلوک تودرتو بخشی از بلوک بیرونی است.
+    """
+    conn = connect(symbol)
+    deferred = _deferred()
+    if conn in deferred:
+        yield conn
+        return
+
+    deferred.add(conn)
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+    finally:
+        deferred.discard(conn)
+
+def _commit(conn: sqlite3.Connection):
+    # درون transaction() تا پایان بلوک به تعویق می‌افتد
+    if conn not in _deferred():
+        conn.commit()
+
+def _rollback(conn: sqlite3.Connection):
+    if conn not in _deferred():
+        conn.rollback()
+
+def _reset_after_fork():
+    # اتصال‌های پروسه‌ی والد در فرزند استفاده نمی‌شوند (و بسته هم نمی‌شوند)
+    global _pool, _initialized_tables
+    _inherited_pools.append(_pool)
+    _pool = threading.local()
+    _initialized_tables = set()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(close_connections)
 
 # ------------------------ جدول بر اساس تایم‌فریم ------------------------
 
 def get_table_name(timeframe: str) -> str:
     return f"ohlcv_{timeframe}"
 
+# ------------------------ کلید زمانی (TEXT یا INTEGER epoch) ------------------------
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_time_kinds = {}
+
+
+def get_time_kind(symbol: str, table: str) -> str:
+    """
+    نوع ذخیره‌ی ستون time در جدول: "epoch" (INTEGER ثانیه) یا "text".
+    """
+    key = (symbol, table)
+    kind = _time_kinds.get(key)
+    if kind is None:
+        conn = connect(symbol)
+        declared = {row[1]: (row[2] or '').upper() for row in conn.execute(f'PRAGMA table_info({table})')}
+        if 'time' not in declared:
+            # جدول هنوز ساخته نشده؛ نتیجه کش نمی‌شود
+            return "epoch" if EPOCH_TIME_KEYS else "text"
+        kind = "epoch" if declared['time'].startswith('INT') else "text"
+        _time_kinds[key] = kind
+    return kind
+
+
+def reset_time_kinds(symbol: str):
+    """
+    فراموش کردن نوع کلیدهای کش‌شده‌ی نماد (مثلاً بعد از migrate_time_keys).
+    """
+    for key in [key for key in _time_kinds if key[0] == symbol]:
+        del _time_kinds[key]
+
+
+def to_db_time(times, kind: str):
+    """
+    تبدیل زمان‌ها (datetime یا رشته) به مقدار ذخیره‌شده در دیتابیس.
+    """
+    times = pd.to_datetime(pd.Series(times))
+    if kind == "epoch":
+        return times.astype('datetime64[s]').astype('int64')
+    return times.dt.strftime(TIME_FORMAT)
+
+
+def from_db_time(values, kind: str) -> pd.Series:
+    """
+    تبدیل ستون time خوانده‌شده از دیتابیس به datetime64[ns] (بدون parse رشته برای epoch).
+    """
+    if kind == "epoch":
+        return pd.Series(pd.to_datetime(np.asarray(values, dtype='int64'), unit='s'))
+    return pd.Series(pd.to_datetime(values))
+
+
+def _time_key(value, kind: str):
+    if kind == "epoch":
+        return int(pd.Timestamp(value).timestamp())
+    return value
+
+
+def _time_text(value, kind: str):
+    if value is None or kind != "epoch":
+        return value
+    return pd.Timestamp(value, unit='s').strftime(TIME_FORMAT)
+
 # ------------------------ ساختار اولیه دیتابیس برای هر نماد ------------------------
 
 def initialize_symbol_db(symbol: str, timeframes: list = None):
     if timeframes is None:
         timeframes = ["M1", "M5", "M15", "M30", "H1", "H4"]
 
+    # جدول‌هایی که در این پروسه قبلاً ساخته/بررسی شده‌اند دوباره بررسی نمی‌شوند
+    if all((symbol, tf) in _initialized_tables for tf in timeframes):
+        return
+
     conn = connect(symbol)
     cursor = conn.cursor()
 
@@ -47,19 +211,32 @@ def initialize_symbol_db(symbol: str, timeframes: list = None):
         table = get_table_name(tf_str)
 
         # ساخت جدول اولیه OHLCV
-        cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS {table} (
-                time TEXT PRIMARY KEY,
-                open REAL NOT NULL,
-                high REAL NOT NULL,
-                low REAL NOT NULL,
-                close REAL NOT NULL,
-                volume INTEGER NOT NULL
-            )
-        ''')
-        cursor.execute(f'''
-            CREATE INDEX IF NOT EXISTS idx_{table}_time ON {table}(time DESC)
-        ''')
+        if EPOCH_TIME_KEYS:
+            # زمان به ثانیه‌ی epoch؛ جدول بر اساس time خوشه‌بندی می‌شود و ایندکس جدا لازم نیست
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    time INTEGER PRIMARY KEY,
+                    open REAL NOT NULL,
+                    high REAL NOT NULL,
+                    low REAL NOT NULL,
+                    close REAL NOT NULL,
+                    volume INTEGER NOT NULL
+                ) WITHOUT ROWID
+            ''')
+        else:
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    time TEXT PRIMARY KEY,
+                    open REAL NOT NULL,
+                    high REAL NOT NULL,
+                    low REAL NOT NULL,
+                    close REAL NOT NULL,
+                    volume INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_{table}_time ON {table}(time DESC)
+            ''')
 
         # افزودن ستون‌های اندیکاتورها در صورت نیاز
         existing_cols = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
@@ -75,112 +252,564 @@ def initialize_symbol_db(symbol: str, timeframes: list = None):
         )
     ''')
 
-    conn.commit()
-    conn.close()
+    _create_code_tables(cursor)
+
+    # تاریخچه‌ی تغییرات OHLCV (هر درج یک نسخه با کمترین زمان تغییرکرده)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ohlcv_changes (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            timeframe TEXT NOT NULL,
+            since TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ohlcv_changes_timeframe ON ohlcv_changes(timeframe, version)
+    ''')
+
+    _commit(conn)
+    _initialized_tables.update((symbol, tf) for tf in timeframes)
 
 # ------------------------ درج داده‌ها ------------------------
 
-def insert_ohlcv_data(df: pd.DataFrame, symbol: str, timeframe: str):
+def insert_ohlcv_data(df: pd.DataFrame, symbol: str, timeframe: str, fill_gaps: bool = False,
+                      replace: bool = False, verbose: bool = True) -> int:
+    """
+    درج کندل‌ها در جدول OHLCV. درون transaction(symbol) commit به پایان بلوک موکول
+    می‌شود و خطا به فراخواننده می‌رسد تا کل بلوک rollback شود.
+
+    :param fill_gaps: اگر True باشد کندل‌های قدیمی‌تر از آخرین زمان هم (برای پر کردن
+        فاصله‌ها) درج می‌شوند و کندل‌های موجود بدون تغییر می‌مانند
+    :param replace: مثل fill_gaps، ولی کندل‌های موجود با مقادیر جدید بروزرسانی می‌شوند
+        (upsert؛ ردیف‌های بدون تغییر بازنویسی نمی‌شوند)
+    :param verbose: چاپ پیام برای هر درج (نویسنده‌های دسته‌ای خودشان خلاصه چاپ می‌کنند)
+    :return: تعداد ردیف‌های درج/بروزرسانی‌شده
+    """
     if isinstance(timeframe, int):
         timeframe = TIMEFRAME_MAP.get(timeframe, str(timeframe))
 
     if df.empty:
         print(f"⚠️ Empty DataFrame for {symbol} {timeframe}")
-        return
+        return 0
 
     initialize_symbol_db(symbol, [timeframe])  # اطمینان از وجود جدول
 
     table = get_table_name(timeframe)
+    kind = get_time_kind(symbol, table)
 
-    # تبدیل زمان به رشته برای مقایسه با دیتابیس (در قالب یکنواخت)
-    df['time'] = pd.to_datetime(df['time']).dt.strftime('%Y-%m-%d %H:%M:%S')
+    # تبدیل زمان به قالب ذخیره‌ی جدول (epoch یا رشته‌ی یکنواخت)
+    df['time'] = to_db_time(df['time'], kind).to_numpy()
 
     # دریافت آخرین زمان موجود در دیتابیس
-    last_time_in_db = get_last_ohlcv_time(symbol, timeframe)
+    last_time_in_db = None if fill_gaps or replace else get_last_ohlcv_time(symbol, timeframe)
 
     # فیلتر کردن فقط رکوردهایی که جدیدترند
     if last_time_in_db:
-        df = df[df['time'] > last_time_in_db]
+        df = df[df['time'] > _time_key(last_time_in_db, kind)]
+
+    conn = connect(symbol)
+    cursor = conn.cursor()
+
+    if fill_gaps or replace:
+        # فقط کندل‌های جدید (و در حالت replace تغییرکرده) نوشته و در تاریخچه ثبت می‌شوند
+        df = _changed_ohlcv_rows(conn, table, df, compare=replace)
 
     if df.empty:
-        print(f"⚪️ No new rows to insert for {symbol} {timeframe}")
-        return
+        if verbose:
+            print(f"⚪️ No new rows to insert for {symbol} {timeframe}")
+        return 0
 
     # آماده‌سازی داده‌ها برای درج
+    times = df['time'].tolist()
     data = list(zip(
-        df['time'], df['open'], df['high'], df['low'], df['close'], df['tick_volume']
+        times, df['open'], df['high'], df['low'], df['close'], df['tick_volume'].tolist()
     ))
 
-    conn = connect(symbol)
-    cursor = conn.cursor()
+    on_conflict = ""
+    if replace:
+        values = ("open", "high", "low", "close", "volume")
+        on_conflict = (
+            f"ON CONFLICT(time) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in values)} "
+            f"WHERE {' OR '.join(f'{table}.{c} IS NOT excluded.{c}' for c in values)}"
+        )
 
     try:
         cursor.executemany(f'''
-            INSERT INTO {table} (time, open, high, low, close, volume)
+            INSERT {'OR IGNORE ' if fill_gaps and not replace else ''}INTO {table} (time, open, high, low, close, volume)
             VALUES (?, ?, ?, ?, ?, ?)
+            {on_conflict}
         ''', data)
-        conn.commit()
-        print(f"✅ Inserted {cursor.rowcount} rows into {symbol}.{table}")
+        inserted = cursor.rowcount
+        _log_ohlcv_change(cursor, timeframe, _time_text(min(times), kind))
+        _commit(conn)
     except Exception as e:
+        if conn in _deferred():
+            raise
+        conn.rollback()
         print(f"❌ Insert Error ({symbol}.{table}): {e}")
-    finally:
-        conn.close()
+        return 0
 
+    if verbose:
+        print(f"✅ Inserted {inserted} rows into {symbol}.{table}")
+    return inserted
 
-# ------------------------ واکشی داده‌ها ------------------------
 
-def fetch_recent_data(symbol: str, timeframe: str, limit: int = 5000):
+def _changed_ohlcv_rows(conn: sqlite3.Connection, table: str, df: pd.DataFrame, compare: bool) -> pd.DataFrame:
     """
-    خواندن همه‌ی ستون‌های جدول مربوط به نماد و تایم‌فریم.
+    ردیف‌هایی از df (با زمان به قالب جدول) که در جدول نیستند یا (اگر compare) مقدارشان فرق دارد.
     """
-    table = get_table_name(timeframe)
+    times = df['time'].tolist()
+    existing = pd.DataFrame(conn.execute(f'''
+        SELECT time, open, high, low, close, volume FROM {table} WHERE time BETWEEN ? AND ?
+    ''', (min(times), max(times))).fetchall(), columns=OHLCV_COLUMNS).set_index("time")
+
+    found = df['time'].isin(existing.index).to_numpy()
+    keep = ~found
+    if compare and found.any():
+        stored = existing.reindex(df['time'][found]).to_numpy(dtype=float)
+        incoming = df.loc[found, ["open", "high", "low", "close", "tick_volume"]].to_numpy(dtype=float)
+        keep[found] = (stored != incoming).any(axis=1)
+    return df[keep]
+
+
+def _log_ohlcv_change(cursor: sqlite3.Cursor, timeframe: str, since: str):
+    cursor.execute('''
+        INSERT INTO ohlcv_changes (timeframe, since) VALUES (?, ?)
+    ''', (timeframe, since))
+    cursor.execute('''
+        DELETE FROM ohlcv_changes WHERE version <= ?
+    ''', (cursor.lastrowid - OHLCV_CHANGE_LOG_SIZE,))
+
+
+def _to_db_rows(frame: pd.DataFrame) -> list:
+    # تبدیل به اشیای پایتونی (float/int/bool/str) و NaN → NULL
+    frame = frame.astype(object)
+    frame = frame.where(frame.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+
+# ------------------------ جدول‌های اندیکاتور ------------------------
+
+OHLCV_COLUMNS = ["time", "open", "high", "low", "close", "volume"]
+
+_SQL_TYPES = {
+    "floating": "REAL",
+    "mixed-integer-float": "REAL",
+    "integer": "INTEGER",
+    "boolean": "INTEGER",
+    "string": "TEXT",
+}
+
+
+def get_indicator_table(name: str, timeframe: str) -> str:
+    return f"{name}_{timeframe}".lower()
+
+
+def _is_coded(series: pd.Series) -> bool:
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def _sql_type(series: pd.Series) -> str:
+    # نوع ستون از روی dtype؛ برای ستون‌های object از مقادیر غیرتهی تشخیص داده می‌شود
+    # (از ستون‌های Categorical فقط کد ذخیره می‌شود)
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series) or _is_coded(series):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(series):
+        return "REAL"
+    return _SQL_TYPES.get(pd.api.types.infer_dtype(series, skipna=True), "")
+
+
+def store_indicator_frame(symbol: str, timeframe: str, name: str, df: pd.DataFrame) -> int:
+    """
+    ذخیره‌ی خروجی یک اندیکاتور در جدول باریک و نوع‌دار خودش (<name>_<tf>).
+
+    کلید time هم‌نوع جدول OHLCV است تا join مستقیم باشد؛ ستون‌های OHLCV ذخیره
+    نمی‌شوند، ستون‌های جدید با نوع مناسب اضافه می‌شوند و ردیف‌هایی که تغییری
+    ندارند بازنویسی نمی‌شوند. از ستون‌های Categorical فقط کدها ذخیره و
+    برچسب‌هایشان در جدول code_tables ثبت می‌شوند.
+
+    :return: تعداد ردیف‌های درج یا تغییر داده‌شده
+    """
+    columns = [c for c in df.columns if c not in OHLCV_COLUMNS]
+    if df.empty or not columns:
+        return 0
+
+    table = get_indicator_table(name, timeframe)
+    kind = get_time_kind(symbol, get_table_name(timeframe))
     conn = connect(symbol)
     cursor = conn.cursor()
 
-    # خواندن نام ستون‌ها به‌صورت داینامیک
-    cursor.execute(f'''
-        SELECT * FROM {table}
-        ORDER BY time DESC
-        LIMIT ?
-    ''', (limit,))
-    rows = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
+    existing = {row[1]: (row[2] or '').upper() for row in cursor.execute(f'PRAGMA table_info({table})')}
+    coded = {c: list(df[c].cat.categories) for c in columns if _is_coded(df[c])}
+    if not existing:
+        time_type = "INTEGER" if kind == "epoch" else "TEXT"
+        defs = ", ".join(f"{c} {_sql_type(df[c])}".strip() for c in columns)
+        cursor.execute(f"CREATE TABLE {table} (time {time_type} PRIMARY KEY, {defs}) WITHOUT ROWID")
+    else:
+        # ستون‌های متنی قدیمی؛ مقادیرشان در اجرای کامل بعد از تغییر state_version دوباره نوشته می‌شوند
+        retyped = [c for c in coded if c in existing and existing[c] != "INTEGER"]
+        if retyped:
+            print(f"🔁 Storing columns {retyped} of {table} as codes")
+            _recreate_table(conn, table, existing, retyped)
+        for c in columns:
+            if c not in existing:
+                print(f"➕ Adding column '{c}' to {table}")
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {c} {_sql_type(df[c])}")
+
+    frame = df[["time", *columns]].assign(
+        time=to_db_time(df["time"], kind).to_numpy(),
+        **{c: _codes(df[c]) for c in coded}
+    )
+    cols_sql = ", ".join(columns)
+    set_sql = ", ".join(f"{c} = excluded.{c}" for c in columns)
+    changed_sql = " OR ".join(f"{table}.{c} IS NOT excluded.{c}" for c in columns)
+
+    try:
+        cursor.executemany(f'''
+            INSERT INTO {table} (time, {cols_sql}) VALUES ({', '.join('?' * (len(columns) + 1))})
+            ON CONFLICT(time) DO UPDATE SET {set_sql} WHERE {changed_sql}
+        ''', _to_db_rows(frame))
+        changed = cursor.rowcount
+        if coded:
+            _store_code_tables(cursor, table, coded)
+        _commit(conn)
+    except Exception:
+        _rollback(conn)
+        raise
+
+    return changed
+
+
+def _recreate_table(conn: sqlite3.Connection, table: str, existing: dict, retyped: list):
+    """
+    ساخت دوباره‌ی جدول اندیکاتور با ستون‌های retyped از نوع INTEGER (مقادیرشان NULL).
+
+    به‌جای ALTER TABLE ... DROP COLUMN که به SQLite 3.35 به بالا نیاز دارد: جدول جدید
+    ساخته، ردیف‌ها کپی و جدول قدیمی حذف می‌شود؛ همه در یک تراکنش.
+    """
+    types = {c: "INTEGER" if c in retyped else t for c, t in existing.items()}
+    defs = ", ".join(f"{c} {t}".strip() + (" PRIMARY KEY" if c == "time" else "") for c, t in types.items())
+    copied = ", ".join("NULL" if c in retyped else c for c in types)
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")
+        cursor.execute(f"DROP TABLE IF EXISTS {table}__retype")
+        cursor.execute(f"CREATE TABLE {table}__retype ({defs}) WITHOUT ROWID")
+        cursor.execute(f"INSERT INTO {table}__retype ({', '.join(types)}) SELECT {copied} FROM {table}")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}__retype RENAME TO {table}")
+    except Exception:
+        _rollback(conn)
+        raise
+
 
-    conn.close()
+def _codes(series: pd.Series) -> pd.Series:
+    # کد -1 (NaN) → NULL
+    codes = series.cat.codes
+    return codes.astype("Int64").mask(codes < 0)
 
-    df = pd.DataFrame(rows[::-1], columns=columns)  # ترتیب قدیمی به جدید
-    if "time" in df.columns:
-        df["time"] = pd.to_datetime(df["time"])
 
-    return df
+# ------------------------ جدول کدها ------------------------
+
+def _create_code_tables(cursor: sqlite3.Cursor):
+    # برچسب هر کد در ستون‌های کدشده‌ی جدول‌های اندیکاتور
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS code_tables (
+            tbl TEXT NOT NULL,
+            col TEXT NOT NULL,
+            code INTEGER NOT NULL,
+            label TEXT NOT NULL,
+            PRIMARY KEY (tbl, col, code)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _store_code_tables(cursor: sqlite3.Cursor, table: str, coded: dict):
+    _create_code_tables(cursor)
+    stored = _load_code_tables(cursor.connection, [table]).get(table, {})
+    for col, labels in coded.items():
+        if stored.get(col) == labels:
+            continue
+        cursor.execute("DELETE FROM code_tables WHERE tbl = ? AND col = ?", (table, col))
+        cursor.executemany("INSERT INTO code_tables (tbl, col, code, label) VALUES (?, ?, ?, ?)",
+                           [(table, col, code, str(label)) for code, label in enumerate(labels)])
+
+
+def _load_code_tables(conn: sqlite3.Connection, tables: list) -> dict:
+    """
+    :return: {جدول: {ستون: [برچسب کد 0، برچسب کد 1، ...]}}
+    """
+    result = {}
+    if not tables:
+        return result
+    try:
+        rows = conn.execute(f'''
+            SELECT tbl, col, label FROM code_tables
+            WHERE tbl IN ({', '.join('?' * len(tables))})
+            ORDER BY tbl, col, code
+        ''', list(tables)).fetchall()
+    except sqlite3.OperationalError:
+        return result
+    for tbl, col, label in rows:
+        result.setdefault(tbl, {}).setdefault(col, []).append(label)
+    return result
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> list:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+# ------------------------ کانال‌های قیمت ------------------------
+
+# ستون‌های زمان (کلید کندل) و قیمت هر کانال؛ مثل خروجی PriceChannelDetector با x های زمانی
+CHANNEL_TIME_COLUMNS = ["start", "end", "lower_x0", "lower_x1", "upper_x0", "upper_x1"]
+CHANNEL_PRICE_COLUMNS = ["lower_y0", "lower_y1", "upper_y0", "upper_y1"]
+CHANNEL_COLUMNS = [
+    "type", "start", "end",
+    "lower_x0", "lower_y0", "lower_x1", "lower_y1",
+    "upper_x0", "upper_y0", "upper_x1", "upper_y1",
+]
+
+
+def store_channel_frame(symbol: str, timeframe: str, df: pd.DataFrame) -> int:
+    """
+    جایگزینی همه‌ی کانال‌های (نماد، تایم‌فریم) در جدول channels_<tf> در یک تراکنش.
+
+    :param df: یک ردیف برای هر کانال (type، ستون‌های زمان و قیمت)
+    :return: تعداد کانال‌های ذخیره‌شده
+    """
+    table = get_indicator_table("channels", timeframe)
+    kind = get_time_kind(symbol, get_table_name(timeframe))
+    time_type = "INTEGER" if kind == "epoch" else "TEXT"
+    columns = CHANNEL_COLUMNS
+    cols_sql = ", ".join(f'"{c}"' for c in columns)
+
+    frame = df[columns].assign(**{c: to_db_time(df[c], kind).to_numpy() for c in CHANNEL_TIME_COLUMNS})
+    defs = ", ".join([
+        "type TEXT NOT NULL",
+        *(f'"{c}" {time_type}' for c in CHANNEL_TIME_COLUMNS),
+        *(f'"{c}" REAL' for c in CHANNEL_PRICE_COLUMNS),
+    ])
+
+    conn = connect(symbol)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({defs}, PRIMARY KEY (start, type)) WITHOUT ROWID")
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.executemany(f"INSERT INTO {table} ({cols_sql}) VALUES ({', '.join('?' * len(columns))})",
+                           _to_db_rows(frame))
+        _commit(conn)
+    except Exception:
+        _rollback(conn)
+        raise
+
+    return len(frame)
+
+
+def fetch_channel_frame(symbol: str, timeframe: str, since=None) -> pd.DataFrame:
+    """
+    کانال‌های ذخیره‌شده (به ترتیب شروع)؛ با since فقط کانال‌هایی که در آن زمان یا بعد از آن تمام می‌شوند.
+    """
+    columns = CHANNEL_COLUMNS
+    table = get_indicator_table("channels", timeframe)
+    conn = connect(symbol)
+    if not _table_columns(conn, table):
+        return pd.DataFrame(columns=columns)
+
+    kind = get_time_kind(symbol, get_table_name(timeframe))
+    where_sql, params = _time_range_sql('"end"', since, None, kind)
+    rows = conn.execute(f'''
+        SELECT {", ".join(f'"{c}"' for c in columns)} FROM {table}{where_sql}
+        ORDER BY start, type DESC
+    ''', params).fetchall()
+
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    data = {c: list(v) for c, v in zip(columns, values)}
+    for c in CHANNEL_TIME_COLUMNS:
+        data[c] = from_db_time(data[c], kind).to_numpy() if rows else np.array([], dtype='datetime64[ns]')
+    for c in CHANNEL_PRICE_COLUMNS:
+        data[c] = np.array(data[c], dtype=float)
+    return pd.DataFrame(data, columns=columns)
+
+
+# ------------------------ واکشی داده‌ها ------------------------
+
+def _column_types(conn: sqlite3.Connection, table: str) -> dict:
+    return {row[1]: ((row[2] or '').upper(), bool(row[3] or row[5])) for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _time_range_sql(column: str, start, end, kind: str):
+    """
+    شرط WHERE برای بازه‌ی [start, end) به همراه پارامترها.
+    """
+    clauses, params = [], []
+    if start is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(_time_key(pd.Timestamp(start).strftime(TIME_FORMAT), kind))
+    if end is not None:
+        clauses.append(f"{column} < ?")
+        params.append(_time_key(pd.Timestamp(end).strftime(TIME_FORMAT), kind))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _frame_from_rows(rows: list, names: list, types: dict, kind: str, dtypes: dict = None,
+                     codes: dict = None) -> pd.DataFrame:
+    """
+    ساخت DataFrame ستون‌به‌ستون از خروجی fetchall.
+
+    ستون‌های REAL و INTEGER NOT NULL مستقیماً به آرایه‌ی numpy تبدیل می‌شوند و
+    فقط ستون‌های متنی/nullable از مسیر استنتاج نوع pandas می‌گذرند. ستون‌هایی که
+    در codes جدول برچسب دارند Categorical برگردانده می‌شوند (مگر dtype داده شود).
+    """
+    dtypes = dtypes or {}
+    codes = codes or {}
+    values = list(zip(*rows)) if rows else [()] * len(names)
+    data = {}
+    for name, col in zip(names, values):
+        if name == "time":
+            data[name] = from_db_time(list(col), kind).to_numpy() if rows else np.array([], dtype='datetime64[ns]')
+            continue
+        decl, notnull = types.get(name, ('', False))
+        dtype = dtypes.get(name)
+        if dtype is None and name in codes:
+            # NULL → کد -1 (NaN)؛ متن هر ردیف فقط هنگام دسترسی ساخته می‌شود
+            values = np.array(col, dtype=float)
+            values = np.where(np.isnan(values), -1, values).astype(np.int64)
+            data[name] = pd.Categorical.from_codes(values, categories=codes[name])
+            continue
+        if dtype is None:
+            if decl == "REAL":
+                dtype = np.float64
+            elif decl.startswith("INT") and notnull:
+                dtype = np.int64
+        if dtype is not None:
+            data[name] = np.array(col, dtype=dtype)
+        else:
+            data[name] = pd.Series(list(col), dtype=object if not rows else None)
+    return pd.DataFrame(data, columns=names)
+
+
+def fetch_recent_data(symbol: str, timeframe: str, limit: int = 5000, columns: list = None,
+                      start=None, end=None, dtypes: dict = None):
+    """
+    خواندن کندل‌های جدول مربوط به نماد و تایم‌فریم (قدیمی به جدید).
+
+    :param limit: حداکثر تعداد آخرین ردیف‌ها در بازه (None = همه)
+    :param columns: فقط این ستون‌ها (time همیشه برگردانده می‌شود)؛ None = همه
+    :param start: ابتدای بازه (شامل)
+    :param end: انتهای بازه (غیرشامل)
+    :param dtypes: نوع خروجی ستون‌ها، مثلاً {"close": "float32"}
+    """
+    table = get_table_name(timeframe)
+    conn = connect(symbol)
+    types = _column_types(conn, table)
+    if not types:
+        return pd.DataFrame(columns=["time", *(columns or [])])
+
+    names = ["time", *[c for c in columns if c != "time"]] if columns else list(types)
+    kind = get_time_kind(symbol, table)
+    where_sql, params = _time_range_sql("time", start, end, kind)
+
+    # آخرین limit ردیف (LIMIT -1 = بدون محدودیت)، مرتب‌شده از قدیم به جدید در خود SQLite
+    rows = conn.execute(f'''
+        SELECT * FROM (
+            SELECT {', '.join(names)} FROM {table}{where_sql}
+            ORDER BY time DESC
+            LIMIT ?
+        ) ORDER BY time
+    ''', (*params, -1 if limit is None else limit)).fetchall()
+    return _frame_from_rows(rows, names, types, kind, dtypes)
 
 # ------------------------ واکشی داده‌ها اندیکاتورها ------------------------
 
-def fetch_indicator_data(symbol: str, timeframe: str, indicator_name: str, limit: int = 5000):
+def fetch_indicator_data(symbol: str, timeframe: str, indicator_name: str, limit: int = 5000,
+                         columns: list = None, start=None, end=None, dtypes: dict = None):
     """
     واکشی اطلاعات اندیکاتور ذخیره‌شده در دیتابیس نماد.
+
+    پارامترهای columns/start/end/dtypes مانند fetch_recent_data هستند.
     """
-    table = f"{indicator_name}_{timeframe}".lower()
+    table = get_indicator_table(indicator_name, timeframe)
     conn = connect(symbol)
-    cursor = conn.cursor()
+    types = _column_types(conn, table)
+    if not types:
+        return pd.DataFrame(columns=["time", *(columns or [])])
 
-    cursor.execute(f'''
-        SELECT * FROM {table}
-        ORDER BY time DESC
-        LIMIT ?
-    ''', (limit,))
-    rows = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
+    names = ["time", *[c for c in columns if c != "time"]] if columns else list(types)
+    kind = "epoch" if types["time"][0].startswith("INT") else "text"
+    where_sql, params = _time_range_sql("time", start, end, kind)
 
-    conn.close()
+    rows = conn.execute(f'''
+        SELECT * FROM (
+            SELECT {', '.join(names)} FROM {table}{where_sql}
+            ORDER BY time DESC
+            LIMIT ?
+        ) ORDER BY time
+    ''', (*params, -1 if limit is None else limit)).fetchall()
+    codes = _load_code_tables(conn, [table]).get(table)
+    return _frame_from_rows(rows, names, types, kind, dtypes, codes)
 
-    df = pd.DataFrame(rows[::-1], columns=columns)
-    if "time" in df.columns:
-        df["time"] = pd.to_datetime(df["time"])
 
-    return df
+# ------------------------ واکشی ادغام‌شده OHLCV + اندیکاتورها ------------------------
 
+def fetch_indicator_frame(symbol: str, timeframe: str, indicator_names: list, limit: int = 5000,
+                          columns: list = None, start=None, end=None, dtypes: dict = None):
+    """
+    خواندن کندل‌ها همراه ستون‌های اندیکاتورها با یک LEFT JOIN روی time.
 
+    اگر چند اندیکاتور ستون هم‌نام داشته باشند مقدار اندیکاتور بعدی در
+    indicator_names برنده است. با columns فقط ستون‌های لازم خوانده می‌شوند
+    (time همیشه برگردانده می‌شود) و جدول‌هایی که ستونی نمی‌دهند join نمی‌شوند.
+    """
+    table = get_table_name(timeframe)
+    conn = connect(symbol)
+    wanted = None if columns is None else set(columns)
+    types = _column_types(conn, table)
+    if not types:
+        return pd.DataFrame(columns=["time", *(columns or [])])
+
+    # مالک هر ستون: آخرین اندیکاتوری که آن را دارد
+    owners = {}
+    for alias, name in enumerate(indicator_names):
+        for col, col_type in _column_types(conn, get_indicator_table(name, timeframe)).items():
+            if col not in OHLCV_COLUMNS:
+                owners[col] = alias
+                types[col] = col_type
+
+    names = [c for c in OHLCV_COLUMNS if wanted is None or c == "time" or c in wanted]
+    select = [f"o.{c}" for c in names]
+    joined = set()
+    for col, alias in owners.items():
+        if wanted is None or col in wanted:
+            names.append(col)
+            select.append(f"t{alias}.{col}")
+            joined.add(alias)
+
+    joins = "".join(
+        f" LEFT JOIN {get_indicator_table(indicator_names[alias], timeframe)} AS t{alias} ON t{alias}.time = o.time"
+        for alias in sorted(joined)
+    )
+
+    kind = get_time_kind(symbol, table)
+    where_sql, params = _time_range_sql("time", start, end, kind)
+    rows = conn.execute(f'''
+        SELECT {', '.join(select)}
+        FROM (
+            SELECT {', '.join(OHLCV_COLUMNS)} FROM {table}{where_sql}
+            ORDER BY time DESC
+            LIMIT ?
+        ) AS o{joins}
+        ORDER BY o.time
+    ''', (*params, -1 if limit is None else limit)).fetchall()
+
+    tables = {alias: get_indicator_table(indicator_names[alias], timeframe) for alias in joined}
+    code_tables = _load_code_tables(conn, list(tables.values()))
+    codes = {
+        col: code_tables[tables[alias]][col]
+        for col, alias in owners.items()
+        if alias in joined and col in code_tables.get(tables[alias], {})
+    }
+    return _frame_from_rows(rows, names, types, kind, dtypes, codes)
 
 # ------------------------ حذف داده‌های قدیمی ------------------------
 
@@ -198,13 +827,26 @@ def delete_old_data(symbol: str, timeframe: str, keep_last_n: int = 5000):
 
     if result:
         cutoff_time = result[0]
-        cursor.execute(f'''
-            DELETE FROM {table}
-            WHERE time < ?
-        ''', (cutoff_time,))
+        # جدول OHLCV و جدول‌های اندیکاتور همین تایم‌فریم (<name>_<tf>)
+        suffix = f"_{timeframe.lower()}"
+        tables = [row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for name in tables:
+            if name.lower().endswith(suffix) and "time" in _table_columns(conn, name):
+                cursor.execute(f'''
+                    DELETE FROM {name}
+                    WHERE time < ?
+                ''', (cutoff_time,))
+        # کانال‌هایی (channels_<tf>) که پیش از اولین کندل باقی‌مانده تمام شده‌اند
+        channels = get_indicator_table("channels", timeframe)
+        if _table_columns(conn, channels):
+            cursor.execute(f'DELETE FROM {channels} WHERE "end" < ?', (cutoff_time,))
         conn.commit()
-        print(f"🧹 Deleted old data in {symbol}.{table} before {cutoff_time}")
-    conn.close()
+        print(f"🧹 Deleted old data in {symbol}.{table} before {_time_text(cutoff_time, get_time_kind(symbol, table))}")
+
+        if COLUMN_CACHE:
+            # ردیف‌های ابتدای کش دیگر در SQLite نیستند: خواندن بعدی کش را از نو می‌سازد
+            from database.column_cache import reset_column_cache
+            reset_column_cache(symbol, timeframe)
 
 # ------------------------ دریافت آخرین زمان ------------------------
 
@@ -218,10 +860,115 @@ def get_last_ohlcv_time(symbol: str, timeframe: str):
         ''')
         result = cursor.fetchone()[0]
     except sqlite3.OperationalError:
-        result = None
-    conn.close()
+        return None
+    return _time_text(result, get_time_kind(symbol, table))
+
+def get_first_ohlcv_time(symbol: str, timeframe: str):
+    table = get_table_name(timeframe)
+    conn = connect(symbol)
+    try:
+        result = conn.execute(f"SELECT MIN(time) FROM {table}").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+    return _time_text(result, get_time_kind(symbol, table))
+
+def find_time_gaps(symbol: str, timeframe: str, step_seconds: int, after: str = None) -> list:
+    """
+    پیدا کردن فاصله‌های بیش از یک کندل بین کندل‌های ذخیره‌شده.
+
+    :param after: فقط کندل‌های از این زمان به بعد بررسی می‌شوند
+    :return: لیست (زمان کندل قبل از فاصله، زمان کندل بعد از فاصله) به‌صورت رشته
+    """
+    table = get_table_name(timeframe)
+    conn = connect(symbol)
+    kind = get_time_kind(symbol, table)
+    seconds = "time" if kind == "epoch" else "CAST(strftime('%s', time) AS INTEGER)"
+    where_sql = "" if after is None else " WHERE time >= ?"
+    params = [] if after is None else [_time_key(after, kind)]
+
+    try:
+        rows = conn.execute(f'''
+            SELECT prev, time FROM (
+                SELECT time, {seconds} AS ts,
+                       LAG(time) OVER (ORDER BY time) AS prev,
+                       LAG({seconds}) OVER (ORDER BY time) AS prev_ts
+                FROM {table}{where_sql}
+            )
+            WHERE ts - prev_ts > ?
+        ''', (*params, step_seconds)).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [(_time_text(prev, kind), _time_text(cur, kind)) for prev, cur in rows]
+
+def count_rows(symbol: str, timeframe: str) -> int:
+    table = get_table_name(timeframe)
+    conn = connect(symbol)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+def count_rows_after(symbol: str, timeframe: str, after_time: str) -> int:
+    table = get_table_name(timeframe)
+    conn = connect(symbol)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT COUNT(*) FROM {table} WHERE time > ?
+    ''', (_time_key(after_time, get_time_kind(symbol, table)),))
+    result = cursor.fetchone()[0]
     return result
 
+# ------------------------ تاریخچه‌ی تغییرات OHLCV ------------------------
+
+# تعداد نسخه‌های نگه‌داشته‌شده؛ مصرف‌کننده‌ای که از این عقب‌تر باشد همه‌چیز را تغییرکرده فرض می‌کند
+OHLCV_CHANGE_LOG_SIZE = 5000
+
+
+def get_ohlcv_version(symbol: str) -> int:
+    """
+    شماره‌ی آخرین تغییر OHLCV نماد (در همه‌ی تایم‌فریم‌ها)؛ مصرف‌کننده‌ها (مثل
+    اندیکاتورها) آن را همراه حالت خود ذخیره می‌کنند.
+    """
+    conn = connect(symbol)
+    try:
+        result = conn.execute('SELECT MAX(version) FROM ohlcv_changes').fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    return result or 0
+
+
+def get_timeframe_version(symbol: str, timeframe: str) -> int:
+    """
+    شماره‌ی آخرین تغییر OHLCV همین تایم‌فریم (0 اگر در تاریخچه‌ی تغییرات نیست)؛ فقط خواندن.
+    """
+    conn = connect(symbol)
+    try:
+        result = conn.execute('SELECT MAX(version) FROM ohlcv_changes WHERE timeframe = ?',
+                              (timeframe,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    return result or 0
+
+
+def get_ohlcv_changes(symbol: str, timeframe: str, after_version: int):
+    """
+    کمترین زمان کندل تغییرکرده (درج یا بروزرسانی) در timeframe بعد از نسخه‌ی after_version.
+
+    :return: None اگر تغییری نبوده؛ اگر تاریخچه تا after_version کوتاه شده باشد اولین زمان جدول
+    """
+    conn = connect(symbol)
+    try:
+        since, oldest = conn.execute('''
+            SELECT (SELECT MIN(since) FROM ohlcv_changes WHERE timeframe = ? AND version > ?),
+                   (SELECT MIN(version) FROM ohlcv_changes)
+        ''', (timeframe, after_version)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+
+    if oldest is not None and after_version < oldest - 1:
+        return get_first_ohlcv_time(symbol, timeframe)
+    return since
+
 # ------------------------ متادیتا ------------------------
 
 def update_symbol_metadata(symbol: str, key: str, value: str):
@@ -231,13 +978,11 @@ def update_symbol_metadata(symbol: str, key: str, value: str):
         INSERT OR REPLACE INTO metadata (key, value)
         VALUES (?, ?)
     ''', (key, value))
-    conn.commit()
-    conn.close()
+    _commit(conn)
 
 def get_metadata(symbol: str, key: str):
     conn = connect(symbol)
     cursor = conn.cursor()
     cursor.execute('SELECT value FROM metadata WHERE key = ?', (key,))
     result = cursor.fetchone()
-    conn.close()
     return result[0] if result else None
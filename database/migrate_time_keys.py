@@ -0,0 +1,126 @@
+# database/migrate_time_keys.py
+
+"""
+تبدیل جدول‌های قدیمی با کلید زمانی TEXT به INTEGER (ثانیه از epoch): جدول‌های OHLCV،
+جدول‌های باریک اندیکاتور و پرایس اکشن (<name>_<tf>، نوع time را هنگام ساخت از جدول
+OHLCV گرفته‌اند) و ستون‌های زمانی channels_<tf>. بقیه‌ی ستون‌ها دست‌نخورده منتقل می‌شوند.
+
+حالت‌های ذخیره‌شده (indicator_state_*، price_action_state_*، backfill_*، column_cache_*)
+حذف می‌شوند تا اجرای بعدی همه‌چیز را با کلیدهای جدید از نو محاسبه کند.
+
+    python -m database.migrate_time_keys            # همه‌ی دیتابیس‌های data/db_per_symbol
+    python -m database.migrate_time_keys BTCUSD --vacuum
+"""
+
+import argparse
+import glob
+import os
+import sqlite3
+import time
+
+from database.db_operations import DB_DIR, CHANNEL_TIME_COLUMNS, get_db_path, reset_time_kinds
+
+# کلیدهای metadata که به زمان‌های ذخیره‌شده یا خروجی‌های قبلی وابسته‌اند
+STATE_KEY_PATTERNS = ("indicator_state_*", "price_action_state_*", "backfill_*", "column_cache_*")
+
+
+def _time_columns(conn: sqlite3.Connection, table: str) -> list:
+    names = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if table.lower().startswith("channels_"):
+        return [c for c in CHANNEL_TIME_COLUMNS if c in names]
+    return ["time"] if "time" in names else []
+
+
+def _text_time_tables(conn: sqlite3.Connection) -> dict:
+    """
+    جدول‌هایی که ستون زمانی غیر INTEGER دارند: {جدول: ستون‌های زمانی}
+    """
+    tables = {}
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+        columns = _time_columns(conn, table)
+        if not columns:
+            continue
+        types = {row[1]: (row[2] or "").upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+        if any(not types[c].startswith("INT") for c in columns):
+            tables[table] = columns
+    return tables
+
+
+def migrate_table(conn: sqlite3.Connection, table: str, time_columns: list = ("time",)) -> int:
+    """
+    بازسازی یک جدول با ستون‌های زمانی INTEGER؛ کل کار در یک تراکنش انجام می‌شود.
+    """
+    info = list(conn.execute(f"PRAGMA table_info({table})"))
+    keys = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]] or [time_columns[0]]
+    defs = ", ".join(
+        f'"{name}" {"INTEGER" if name in time_columns else ctype or ""}{" NOT NULL" if notnull else ""}'.strip()
+        for _, name, ctype, notnull, _, _ in info
+    )
+    names = ", ".join(f'"{row[1]}"' for row in info)
+    values = ", ".join(
+        f"""CAST(strftime('%s', "{row[1]}") AS INTEGER)""" if row[1] in time_columns else f'"{row[1]}"'
+        for row in info
+    )
+    primary = ", ".join(f'"{c}"' for c in keys)
+    tmp = f"_{table}_epoch"
+
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {tmp}")
+        conn.execute(f"CREATE TABLE {tmp} ({defs}, PRIMARY KEY ({primary})) WITHOUT ROWID")
+        conn.execute(f'''
+            INSERT OR REPLACE INTO {tmp} ({names})
+            SELECT {values} FROM {table}
+            WHERE "{time_columns[0]}" IS NOT NULL
+            ORDER BY "{time_columns[0]}"
+        ''')
+        rows = conn.execute(f"SELECT COUNT(*) FROM {tmp}").fetchone()[0]
+        conn.execute(f"DROP INDEX IF EXISTS idx_{table}_time")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {tmp} RENAME TO {table}")
+    return rows
+
+
+def _drop_states(conn: sqlite3.Connection) -> int:
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'metadata'").fetchone():
+        return 0
+    with conn:
+        where = " OR ".join("key GLOB ?" for _ in STATE_KEY_PATTERNS)
+        return conn.execute(f"DELETE FROM metadata WHERE {where}", STATE_KEY_PATTERNS).rowcount
+
+
+def migrate_database(path: str, vacuum: bool = False) -> dict:
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        migrated = {}
+        tables = _text_time_tables(conn)
+        if tables:
+            # اول حالت‌ها: اگر مهاجرت نیمه‌کاره بماند هم اجرای بعدی کامل است
+            print(f"🧹 {os.path.basename(path)}: {_drop_states(conn)} stored states removed")
+        for table, columns in tables.items():
+            started = time.perf_counter()
+            migrated[table] = migrate_table(conn, table, columns)
+            print(f"🔁 {os.path.basename(path)}.{table}: {migrated[table]} rows in {time.perf_counter() - started:.2f}s")
+        # نوع کلیدهای کش‌شده‌ی این پروسه برای این نماد دیگر معتبر نیست
+        reset_time_kinds(os.path.splitext(os.path.basename(path))[0])
+        if migrated and vacuum:
+            conn.execute("VACUUM")
+        return migrated
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert TEXT time keys of OHLCV, indicator and channel tables to INTEGER epoch seconds")
+    parser.add_argument("symbols", nargs="*", help="symbols to migrate (default: every database in DB_DIR)")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM each database after migration")
+    args = parser.parse_args()
+
+    paths = [get_db_path(s) for s in args.symbols] or sorted(glob.glob(os.path.join(DB_DIR, "*.db")))
+    for path in paths:
+        if not migrate_database(path, args.vacuum):
+            print(f"⚪️ {os.path.basename(path)} already uses epoch time keys")
+    print("✅ Migration finished")
+
+
+if __name__ == "__main__":
+    main()
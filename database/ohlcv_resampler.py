@@ -0,0 +1,109 @@
+# database/ohlcv_resampler.py
+
+"""
+ساخت کندل‌های تایم‌فریم بالاتر (M5/M30/H1/H4) از کندل‌های M1 ذخیره‌شده با
+گروه‌بندی برداری numpy، به‌جای دانلود جداگانه‌ی هر تایم‌فریم از بروکر.
+
+فقط کندل‌های کامل نوشته می‌شوند (کندلی که M1 بعد از پایانش موجود است)، پس
+کندل‌های ذخیره‌شده نهایی‌اند و اندیکاتورهای افزایشی روی آن‌ها درست می‌مانند.
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import TIMEFRAME_MAP, timeframe_to_timedelta
+from database.db_operations import (
+    fetch_recent_data,
+    get_first_ohlcv_time,
+    get_last_ohlcv_time,
+    insert_ohlcv_data
+)
+
+TIMEFRAME_SECONDS = {
+    name: int(timeframe_to_timedelta(tf).total_seconds()) for tf, name in TIMEFRAME_MAP.items()
+}
+
+
+def resample_ohlcv(times: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                   close: np.ndarray, volume: np.ndarray, seconds: int) -> dict:
+    """
+    تجمیع کندل‌ها (زمان‌ها به ثانیه‌ی epoch و مرتب) در بازه‌های seconds ثانیه‌ای.
+
+    :return: دیکشنری آرایه‌ها: time (شروع بازه)، open، high، low، close، volume
+    """
+    times = np.asarray(times, dtype=np.int64)
+    if len(times) == 0:
+        empty = np.array([], dtype=np.float64)
+        return {"time": times, "open": empty, "high": empty, "low": empty, "close": empty,
+                "volume": np.array([], dtype=np.int64)}
+
+    buckets = times - times % seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+
+    return {
+        "time": buckets[starts],
+        "open": np.asarray(open_)[starts],
+        "high": np.maximum.reduceat(np.asarray(high), starts),
+        "low": np.minimum.reduceat(np.asarray(low), starts),
+        "close": np.asarray(close)[ends],
+        "volume": np.add.reduceat(np.asarray(volume, dtype=np.int64), starts),
+    }
+
+
+def resample_symbol(symbol: str, timeframes: list, source: str = "M1", since: str = None) -> dict:
+    """
+    بروزرسانی افزایشی تایم‌فریم‌های بالاتر یک نماد از روی source.
+
+    برای هر تایم‌فریم فقط M1های بعد از آخرین کندل ذخیره‌شده خوانده می‌شوند.
+    :param since: اگر M1های قدیمی‌تر تغییر کرده باشند (پر شدن فاصله یا بروزرسانی
+        آخرین کندل) کندل‌های از این زمان به بعد دوباره ساخته و جایگزین می‌شوند
+    :return: تعداد کندل‌های نوشته‌شده برای هر تایم‌فریم
+    """
+    written = {}
+    first_time = get_first_ohlcv_time(symbol, source)
+    if first_time is None:
+        return written
+    history_start = int(pd.Timestamp(first_time).timestamp())
+
+    for timeframe in timeframes:
+        if timeframe == source:
+            continue
+        seconds = TIMEFRAME_SECONDS[timeframe]
+
+        # شروع از بازه‌ی بعد از آخرین کندل ذخیره‌شده (یا بازه‌ی شامل since)
+        starts = []
+        last_time = get_last_ohlcv_time(symbol, timeframe)
+        if last_time is not None:
+            starts.append(int(pd.Timestamp(last_time).timestamp()) + seconds)
+        if since is not None:
+            ts = int(pd.Timestamp(since).timestamp())
+            starts.append(ts - ts % seconds)
+        start = pd.Timestamp(min(starts), unit='s') if starts else None
+
+        m1 = fetch_recent_data(symbol, source, limit=None, start=start,
+                               columns=["open", "high", "low", "close", "volume"])
+        if m1.empty:
+            written[timeframe] = 0
+            continue
+
+        times = m1["time"].to_numpy().astype("datetime64[s]").astype(np.int64)
+        bars = resample_ohlcv(times, m1["open"].to_numpy(), m1["high"].to_numpy(), m1["low"].to_numpy(),
+                              m1["close"].to_numpy(), m1["volume"].to_numpy(), seconds)
+
+        # آخرین بازه تا رسیدن M1 بعد از پایانش ناقص است؛ بقیه کامل‌اند
+        keep = slice(0, -1)
+        if bars["time"][0] < history_start:
+            # اولین بازه‌ی تاریخچه‌ی M1 از وسط شروع شده و ناقص است
+            keep = slice(1, -1)
+
+        df = pd.DataFrame({k: v[keep] for k, v in bars.items()})
+        if df.empty:
+            written[timeframe] = 0
+            continue
+        df["time"] = pd.to_datetime(df["time"], unit="s")
+        df = df.rename(columns={"volume": "tick_volume"})
+        insert_ohlcv_data(df, symbol, timeframe, replace=since is not None)
+        written[timeframe] = len(df)
+
+    return written
@@ -0,0 +1,141 @@
+# database/ohlcv_writer.py
+
+"""
+نویسنده‌ی دسته‌ای کندل‌های زنده: کندل‌ها در حافظه برای هر (نماد، تایم‌فریم) جمع
+می‌شوند و در دسته‌های محدود به زمان/اندازه از یک ترد اختصاصی در SQLite نوشته
+می‌شوند: هر flush برای هر نماد یک تراکنش است، نه یک تراکنش برای هر پیام سوکت یا هر سری.
+"""
+
+import queue
+import threading
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+from database.db_operations import insert_ohlcv_data, transaction
+
+_STOP = object()
+
+
+class OHLCVWriter:
+    def __init__(self, max_batch: int = 1000, flush_interval: float = 1.0, max_queue: int = 100_000):
+        """
+        :param max_batch: با رسیدن تعداد کندل‌های بافر به این عدد فوراً flush می‌شود
+        :param flush_interval: حداکثر فاصله‌ی زمانی (ثانیه) بین دو flush
+        :param max_queue: ظرفیت صف؛ در صورت پر بودن، کندل‌های جدید دور ریخته و شمرده می‌شوند
+        """
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.buffers = defaultdict(dict)
+        self.buffered = 0
+        self.oldest_enqueued = None
+        self.thread = None
+        self.stats = {
+            "submitted": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "rows": 0,
+            "errors": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "max_delay_ms": 0.0,
+        }
+
+    # ------------------------ سمت تولیدکننده ------------------------
+
+    def submit(self, symbol: str, timeframe: str, bar: dict) -> bool:
+        """
+        افزودن یک کندل بسته‌شده به صف (بدون انتظار).
+
+        :return: False اگر صف پر بوده و کندل دور ریخته شده باشد
+        """
+        try:
+            self.queue.put_nowait((symbol, timeframe, bar, time.monotonic()))
+        except queue.Full:
+            self.stats["dropped"] += 1
+            if self.stats["dropped"] % 1000 == 1:
+                print(f"⚠️ OHLCV writer queue full: {self.stats['dropped']} bars dropped so far")
+            return False
+        self.stats["submitted"] += 1
+        return True
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="ohlcv-writer", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        if self.thread is not None:
+            self.queue.put(_STOP)
+            self.thread.join(timeout)
+            self.thread = None
+
+    # ------------------------ ترد نویسنده ------------------------
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self.flush()
+                return
+
+            if item is not None:
+                symbol, timeframe, bar, enqueued = item
+                # کندل تکراری با همان زمان جایگزین قبلی می‌شود (ادغام نوشتن‌ها)
+                series = self.buffers[(symbol, timeframe)]
+                if bar["time"] not in series:
+                    self.buffered += 1
+                series[bar["time"]] = bar
+                if self.oldest_enqueued is None:
+                    self.oldest_enqueued = enqueued
+
+            if self.buffered >= self.max_batch or time.monotonic() - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = time.monotonic()
+
+    def flush(self):
+        if not self.buffered:
+            return
+
+        started = time.monotonic()
+        delay_ms = (started - self.oldest_enqueued) * 1000
+        buffers, rows = self.buffers, self.buffered
+        self.buffers, self.buffered, self.oldest_enqueued = defaultdict(dict), 0, None
+
+        by_symbol = defaultdict(dict)
+        for (symbol, timeframe), bars in buffers.items():
+            by_symbol[symbol][timeframe] = bars
+
+        for symbol, series in by_symbol.items():
+            # همه‌ی تایم‌فریم‌های یک نماد در یک تراکنش؛ خطا کل دسته‌ی همان نماد را برمی‌گرداند
+            try:
+                with transaction(symbol):
+                    for timeframe, bars in series.items():
+                        df = pd.DataFrame(sorted(bars.values(), key=lambda b: b["time"]))
+                        df = df.rename(columns={"volume": "tick_volume"})
+                        # fill_gaps: کندلی که دیرتر از کندل‌های جدیدتر رسیده هم نوشته می‌شود
+                        insert_ohlcv_data(df, symbol, timeframe, fill_gaps=True, verbose=False)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ OHLCV writer failed for {symbol} [{', '.join(series)}]: {e}")
+
+        flush_ms = (time.monotonic() - started) * 1000
+        stats = self.stats
+        stats["flushes"] += 1
+        stats["rows"] += rows
+        stats["last_flush_ms"] = flush_ms
+        stats["max_flush_ms"] = max(stats["max_flush_ms"], flush_ms)
+        stats["max_delay_ms"] = max(stats["max_delay_ms"], delay_ms)
+
+        lag = " ⚠️ falling behind" if flush_ms > self.flush_interval * 1000 else ""
+        print(f"💾 Flushed {rows} bars for {len(buffers)} series ({len(by_symbol)} symbols) in {flush_ms:.1f} ms "
+              f"(queued {delay_ms:.0f} ms, backlog {self.queue.qsize()}, dropped {stats['dropped']}){lag}")
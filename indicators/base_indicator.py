@@ -1,14 +1,29 @@
 # indicators/base_indicator.py
 
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
 
+from indicators.feature_store import FeatureStore, ewm_params
+
 class BaseIndicator(ABC):
     """
     کلاس پایه برای همه اندیکاتورهای تکنیکال. این کلاس ساختار پایه‌ای را برای
     محاسبه اندیکاتور، تولید سیگنال، امتیازدهی و توضیح فراهم می‌کند.
     """
 
+    # نام کوتاه اندیکاتور (در کلیدهای متادیتا استفاده می‌شود)
+    name = None
+
+    # تعداد کندل‌های زمینه که در حالت افزایشی همراه کندل‌های جدید خوانده می‌شوند؛
+    # باید از بزرگ‌ترین پنجره‌ی rolling/shift اندیکاتور بیشتر باشد.
+    lookback = 128
+
+    # با تغییر منطق محاسبه یا محل ذخیره‌ی خروجی افزایش یابد تا حالت‌های ذخیره‌شده‌ی قدیمی نادیده گرفته شوند
+    # (2: خروجی هر اندیکاتور در جدول جداگانه‌ی <name>_<tf>، 3: ثبت نسخه‌ی OHLCV پردازش‌شده،
+    #  4: ستون‌های متنی شمارشی به‌صورت کد ذخیره می‌شوند)
+    state_version = 4
+
     def __init__(self, symbol: str, timeframe: str, params: dict = None):
         """
         :param symbol: نماد معاملاتی (مثل BTCUSD)
@@ -19,6 +34,17 @@ class BaseIndicator(ABC):
         self.timeframe = timeframe
         self.params = params or {}
 
+        # حالت افزایشی: انتهای سری‌های بازگشتی (EWM/RMA) از اجرای قبلی
+        self.state = {}
+        self.context = 0
+        self.new_state = {}
+
+        # حالت محاسبه‌ی زنده (در اولین فراخوانی update ساخته می‌شود)
+        self._stream = None
+
+        # حافظه‌ی سری‌های مشترک بین اندیکاتورها (توسط مدیر اندیکاتورها وصل می‌شود)
+        self.features = None
+
     @abstractmethod
     def calculate(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -30,10 +56,109 @@ class BaseIndicator(ABC):
         - امتیاز در ستون score_<name>
         - توضیح در ستون reason_<name>
 
+        df نباید تغییر داده شود: آرایه‌های آن بین همه‌ی اندیکاتورها و پرایس اکشن مشترک
+        و فقط‌خواندنی‌اند (OHLCVFrame)؛ ستون‌ها روی df.copy(deep=False) اضافه شوند.
+
         :param df: دیتافریم شامل OHLCV
         :return: pd.DataFrame شامل خروجی تحلیل اندیکاتور
         """
         pass
 
+    # ------------------------ حالت افزایشی ------------------------
+
+    def resume(self, state: dict, context: int):
+        """
+        آماده‌سازی اندیکاتور برای محاسبه‌ی افزایشی.
+
+        :param state: خروجی export_state از اجرای قبلی
+        :param context: تعداد ردیف‌های ابتدای df که قبلاً پردازش شده‌اند
+        """
+        self.state = (state or {}).get("tails", {})
+        self.context = context
+
+    def export_state(self, last_time: str, rows: int) -> dict:
+        """
+        حالت لازم برای ادامه‌ی محاسبه از کندل بعد از last_time.
+
+        :param rows: تعداد ردیف‌های df در این اجرا
+        """
+        return {
+            "version": self.state_version,
+            "params": self.params,
+            "last_time": last_time,
+            "context": min(self.lookback, rows),
+            "tails": self.new_state,
+        }
+
+    def is_state_valid(self, state: dict) -> bool:
+        return bool(state) and state.get("version") == self.state_version and state.get("params") == self.params
+
+    def restore(self, key: str):
+        """
+        مقادیر ذخیره‌شده‌ی یک سری برای ردیف‌های زمینه (یا None).
+        """
+        tail = self.state.get(key)
+        if tail is None or not self.context or len(tail) != self.context:
+            return None
+        return np.asarray(tail, dtype=float)
+
+    def remember(self, key: str, values):
+        self.new_state[key] = np.asarray(values, dtype=float)[-self.lookback:].tolist()
+
+    # ------------------------ سری‌های مشترک ------------------------
+
+    def feature_store(self, df: pd.DataFrame) -> FeatureStore:
+        """
+        حافظه‌ی وصل‌شده اگر برای همین دیتافریم ساخته شده باشد، وگرنه یک حافظه‌ی موقت.
+        """
+        if self.features is not None and self.features.df.index.equals(df.index):
+            return self.features
+        return FeatureStore(df)
+
+    def ewm(self, key: str, series: pd.Series, source: str = None, **kwargs) -> pd.Series:
+        """
+        معادل series.ewm(**kwargs).mean() که در حالت افزایشی از آخرین مقدار
+        ذخیره‌شده ادامه می‌دهد؛ خروجی با محاسبه‌ی کامل بیت‌به‌بیت یکسان است.
+
+        :param source: نام سری ورودی؛ اگر داده شود نتیجه با اندیکاتورهای دیگر همان
+            دیتافریم (از طریق features) به اشتراک گذاشته می‌شود
+        """
+        store = self.features
+        if source is not None and store is not None and store.df.index.equals(series.index):
+            result = store.get("ewm", ewm_params(**kwargs), source, lambda: self._ewm(key, series, **kwargs))
+            self.remember(key, result)
+            return result
+        return self._ewm(key, series, **kwargs)
+
+    def _ewm(self, key: str, series: pd.Series, **kwargs) -> pd.Series:
+        tail = self.restore(key)
+        result = None
+
+        if tail is not None:
+            ctx = self.context
+            observed = np.flatnonzero(series.iloc[:ctx].notna().to_numpy())
+            if len(observed):
+                # ادامه‌ی بازگشت از آخرین مشاهده‌ی زمینه (NaNهای بعد از آن هم مثل
+                # محاسبه‌ی کامل وزن قبلی را کاهش می‌دهند)
+                j = observed[-1]
+                seeded = pd.concat([pd.Series([tail[j]]), series.iloc[j + 1:]], ignore_index=True)
+                resumed = seeded.ewm(**kwargs).mean().to_numpy()[ctx - j:]
+                result = pd.Series(np.concatenate([tail, resumed]), index=series.index)
+
+        if result is None:
+            result = series.ewm(**kwargs).mean()
+
+        self.remember(key, result)
+        return result
+
+    # ------------------------ حالت زنده (استریم) ------------------------
+
+    def update(self, bar: dict) -> dict:
+        """
+        به‌روزرسانی O(1) با یک کندل بسته‌شده (time, open, high, low, close, volume)
+        و بازگرداندن مقادیر اندیکاتور برای همان کندل، بدون محاسبه‌ی دوباره‌ی تاریخچه.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not support streaming updates")
+
     def __repr__(self):
         return f"<{self.__class__.__name__} symbol={self.symbol} tf={self.timeframe} params={self.params}>"
@@ -0,0 +1,50 @@
+# indicators/enums.py
+
+"""
+جدول‌های کد مشترک برای ستون‌های متنی شمارشی اندیکاتورها (سیگنال، هشدار، متن توضیح).
+
+اندیکاتورها به‌جای ستون object از رشته‌ها یک ستون Categorical می‌سازند (کد int8 و
+جدول کوچک برچسب‌ها). store_indicator_frame فقط کدها را در ستون INTEGER ذخیره و
+برچسب‌ها را در جدول code_tables دیتابیس نماد ثبت می‌کند؛ واکشی دوباره Categorical
+برمی‌گرداند و متن هر ردیف فقط هنگام دسترسی (مثلاً ردیف‌های نمایش‌داده‌شده) ساخته می‌شود.
+
+ترتیب برچسب‌ها همان کد ذخیره‌شده است: برچسب جدید فقط به انتهای جدول اضافه شود
+(وگرنه state_version اندیکاتور افزایش یابد).
+"""
+
+import numpy as np
+import pandas as pd
+
+TREND = ("Downtrend", "Uptrend")
+TRADE = ("Hold", "Buy", "Sell")
+VOLATILITY = ("Normal", "High Volatility", "Low Volatility")
+MOMENTUM = ("Normal", "Explosion", "Calm")
+ATR_ENTRY = ("⏸️ بی تصمیمی (No Entry)", "📈 ورود به معامله خرید (Buy)", "📉 ورود به معامله فروش (Sell)")
+ZONE = ("red", "green")
+CANDLE_COLOR = ("Neutral", "BrightBlue", "BrightMagenta")
+
+
+def categorical(codes, labels, index=None) -> pd.Series:
+    """
+    ستون Categorical از کدها (اندیس در labels؛ -1 = NaN)؛ pandas کدها را با کوچک‌ترین
+    نوع صحیح (int8 تا 126 برچسب) نگه می‌دارد.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=list(labels)), index=index)
+
+
+def choose(conditions: list, labels, index=None) -> pd.Series:
+    """
+    معادل np.select(conditions, labels[1:], default=labels[0]) با خروجی Categorical.
+    """
+    codes = np.select([np.asarray(c, dtype=bool) for c in conditions], np.arange(1, len(conditions) + 1), 0)
+    return categorical(codes, labels, index)
+
+
+def decode(df: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """
+    تبدیل ستون‌های Categorical به رشته (object)؛ فقط برای ردیف‌هایی که واقعاً لازم‌اند
+    (مثلاً df.tail(n) پیش از خروجی گرفتن).
+    """
+    columns = columns or [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    return df.assign(**{c: df[c].astype(object) for c in columns})
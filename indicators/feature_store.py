@@ -0,0 +1,98 @@
+# indicators/feature_store.py
+
+"""
+حافظه‌ی مشترک سری‌های پایه (EMA/RMA، True Range، تغییرات قیمت و ...) برای یک
+دیتافریم OHLCV، تا اندیکاتورهایی که یک سری را لازم دارند (مثلاً EMA 50 در MACD،
+ADX و TripleEMA یا MACD 12/26/9 در MACD و ADX) آن را فقط یک بار محاسبه کنند.
+
+کلید هر سری (primitive، params، source) است؛ source نام سری ورودی است (ستون
+دیتافریم مثل close یا نام یک سری مشتق‌شده‌ی دیگر مثل macd(12,26)).
+یک FeatureStore فقط برای یک دیتافریم (و ایندکس آن) معتبر است.
+سری‌های برگشتی بین مصرف‌کننده‌ها مشترک‌اند و نباید درجا تغییر داده شوند.
+"""
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+
+def ewm_params(span=None, alpha=None, com=None, halflife=None, adjust=True, ignore_na=False,
+               min_periods=0) -> tuple:
+    """
+    پارامترهای کلید یک ewm؛ span/com/alpha مثل خود pandas به alpha تبدیل می‌شوند تا
+    ewm(span=50) و ewm(alpha=2/51) (که نتیجه‌ی یکسان دارند) یک کلید داشته باشند.
+    """
+    if halflife is not None:
+        return ("halflife", halflife, adjust, ignore_na, min_periods)
+    if span is not None:
+        com = (span - 1) / 2.0
+    elif alpha is not None:
+        com = (1.0 - alpha) / alpha
+    return ("alpha", 1.0 / (1.0 + com), adjust, ignore_na, min_periods)
+
+
+class FeatureStore:
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._cache = {}
+        self.computed = Counter()
+        self.hits = Counter()
+
+    def get(self, primitive: str, params: tuple, source: str, compute):
+        """
+        مقدار ذخیره‌شده‌ی (primitive، params، source) یا محاسبه و ذخیره با compute().
+        """
+        key = (primitive, params, source)
+        if key in self._cache:
+            self.hits[key] += 1
+            return self._cache[key]
+        value = compute()
+        self._cache[key] = value
+        self.computed[key] += 1
+        return value
+
+    # ------------------------ سری‌های پایه ------------------------
+
+    def true_range(self) -> pd.Series:
+        """
+        max(high-low, |high-prev_close|, |low-prev_close|)؛ ردیف اول NaN است.
+        """
+        def compute():
+            high, low, close = self.df['high'], self.df['low'], self.df['close']
+            tr = np.maximum.reduce([
+                high - low,
+                (high - close.shift(1)).abs(),
+                (low - close.shift(1)).abs()
+            ])
+            return pd.Series(tr, index=self.df.index)
+        return self.get("true_range", (), "ohlc", compute)
+
+    def delta(self, source: str = "close") -> pd.Series:
+        return self.get("diff", (1,), source, lambda: self.df[source].diff())
+
+    def gain(self, source: str = "close") -> pd.Series:
+        return self.get("gain", (), source, lambda: self.delta(source).clip(lower=0))
+
+    def loss(self, source: str = "close") -> pd.Series:
+        return self.get("loss", (), source, lambda: -self.delta(source).clip(upper=0))
+
+    # ------------------------ گزارش ------------------------
+
+    def report(self) -> pd.DataFrame:
+        """
+        یک ردیف برای هر سری: تعداد دفعات استفاده از حافظه (hits).
+        """
+        rows = [
+            {"primitive": key[0], "params": key[1], "source": key[2],
+             "computed": self.computed[key], "hits": self.hits[key]}
+            for key in self._cache
+        ]
+        return pd.DataFrame(rows, columns=["primitive", "params", "source", "computed", "hits"])
+
+    def summary(self) -> str:
+        computed = sum(self.computed.values())
+        hits = sum(self.hits.values())
+        total = computed + hits
+        ratio = hits / total if total else 0.0
+        return f"{computed} series computed, {hits} reused ({ratio:.0%} hit rate)"
@@ -1,41 +1,30 @@
 # indicators/manager_indicators.py
 
+import json
+import time
 import pandas as pd
-import sqlite3
 
 from indicators.inds.rsi import RSIIndicator
 from indicators.inds.macd import MACDIndicator
 from indicators.inds.adx import ADXHybridIndicator
 from indicators.inds.ema import TripleEMAIndicator
 from indicators.inds.atr import ATRIndicator
-from database.db_operations import fetch_recent_data, connect, get_table_name
+from indicators.feature_store import FeatureStore
+from indicators.ohlcv_frame import OHLCVFrame, FULL_HISTORY_LIMIT
+from analysis.price_action.price_action_manager import PRICE_ACTION_NAME
+from database.db_operations import (
+    fetch_indicator_frame,
+    store_indicator_frame,
+    count_rows_after,
+    get_last_ohlcv_time,
+    get_ohlcv_changes,
+    get_metadata,
+    update_symbol_metadata
+)
 
 
-def add_column_if_not_exists(conn: sqlite3.Connection, table: str, column: str):
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table})")
-    columns = [row[1] for row in cursor.fetchall()]
-    if column not in columns:
-        print(f"➕ Adding column '{column}' to {table}")
-        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} REAL")
-        conn.commit()
-
-
-def calculate_and_store_indicators(symbol: str, timeframe: str):
-    print(f"📈 Calculating indicators for {symbol} [{timeframe}]...")
-    table = get_table_name(timeframe)
-    conn = connect(symbol)
-
-    # دریافت داده‌ها
-    df_rows = fetch_recent_data(symbol, timeframe, limit=10100)
-    df = pd.DataFrame(df_rows, columns=["time", "open", "high", "low", "close", "volume"])
-    if df.empty:
-        print("⚠️ No data available.")
-        conn.close()
-        return
-
-    # لیست اندیکاتورها
-    indicator_objects = [
+def build_indicators(symbol: str, timeframe: str) -> list:
+    return [
         RSIIndicator(symbol, timeframe, params={
             "period": 14,
             "sma_short": 20,
@@ -68,42 +57,195 @@ def calculate_and_store_indicators(symbol: str, timeframe: str):
         })
     ]
 
-    # اجرای محاسبات و ذخیره نتایج در حافظه
+# ------------------------ حالت افزایشی ------------------------
+
+def _state_key(indicator, timeframe: str) -> str:
+    return f"indicator_state_{indicator.name}_{timeframe}"
+
+
+def select_indicators(indicators: list, names: list = None) -> list:
+    """
+    فیلتر اندیکاتورها بر اساس نام (None = همه).
+    """
+    if names is None:
+        return indicators
+    unknown = set(names) - {indicator.name for indicator in indicators}
+    if unknown:
+        print(f"⚠️ Unknown indicators: {', '.join(sorted(unknown))}")
+    return [indicator for indicator in indicators if indicator.name in names]
+
+
+def load_indicator_states(symbol: str, timeframe: str, indicators: list) -> dict:
+    states = {}
+    for indicator in indicators:
+        raw = get_metadata(symbol, _state_key(indicator, timeframe))
+        state = json.loads(raw) if raw else None
+        states[indicator.name] = state if indicator.is_state_valid(state) else None
+    return states
+
+
+def save_indicator_states(symbol: str, timeframe: str, indicators: list, last_time: str, rows: int,
+                          ohlcv_version: int):
+    for indicator in indicators:
+        state = indicator.export_state(last_time, rows)
+        state["ohlcv_version"] = ohlcv_version
+        update_symbol_metadata(symbol, _state_key(indicator, timeframe), json.dumps(state))
+
+
+def _advance_states(symbol: str, timeframe: str, indicators: list, states: dict, ohlcv_version: int):
+    """
+    ثبت نسخه‌ی فعلی OHLCV برای حالت‌هایی که تغییری در تایم‌فریمشان نداشته‌اند
+    (تا با کوتاه شدن تاریخچه‌ی تغییرات بی‌دلیل محاسبه‌ی کامل لازم نشود).
+    """
+    for indicator in indicators:
+        state = states[indicator.name]
+        if state["ohlcv_version"] != ohlcv_version:
+            state["ohlcv_version"] = ohlcv_version
+            update_symbol_metadata(symbol, _state_key(indicator, timeframe), json.dumps(state))
+
+
+def _plan_groups(states: dict) -> dict:
+    """
+    گروه‌بندی اندیکاتورها بر اساس نقطه‌ی ادامه‌ی حالت ذخیره‌شده
+    (last_time، تعداد ردیف‌های زمینه، نسخه‌ی OHLCV)؛ کلید None یعنی محاسبه‌ی کامل.
+    """
+    groups = {}
+    for name, state in states.items():
+        key = None if state is None else (state["last_time"], state["context"], state["ohlcv_version"])
+        groups.setdefault(key, []).append(name)
+    return groups
+
+
+def needs_update(symbol: str, timeframe: str, indicators: list = None) -> bool:
+    """
+    بررسی ارزان (فقط متادیتا) اینکه OHLCV این (نماد، تایم‌فریم) بعد از آخرین
+    اجرای اندیکاتورها تغییر کرده است یا نه.
+    """
+    last_time = get_last_ohlcv_time(symbol, timeframe)
+    if last_time is None:
+        return False
+
+    indicator_objects = select_indicators(build_indicators(symbol, timeframe), indicators)
+    for state in load_indicator_states(symbol, timeframe, indicator_objects).values():
+        if state is None or state["last_time"] != last_time:
+            return True
+        if get_ohlcv_changes(symbol, timeframe, state["ohlcv_version"]) is not None:
+            return True
+    return False
+
+
+def calculate_and_store_indicators(symbol: str, timeframe: str, incremental: bool = True,
+                                   indicators: list = None, frame: OHLCVFrame = None) -> int:
+    """
+    :param indicators: نام اندیکاتورهایی که محاسبه می‌شوند (None = همه)
+    :param frame: کندل‌های مشترک با مراحل دیگر همین کار (None = خواندن مستقل)
+    :return: تعداد کندل‌هایی که اندیکاتورهایشان محاسبه و ذخیره شد (0 = بدون تغییر)
+    """
+    print(f"📈 Calculating indicators for {symbol} [{timeframe}]...")
+
+    # لیست اندیکاتورها
+    indicator_objects = select_indicators(build_indicators(symbol, timeframe), indicators)
+    if not indicator_objects:
+        return 0
+
+    # نسخه پیش از خواندن داده‌ها گرفته می‌شود تا تغییرات حین اجرا در اجرای بعدی دیده شوند
+    frame = frame or OHLCVFrame(symbol, timeframe, prefetch=0)
+    ohlcv_version = frame.version
+
+    # در حالت افزایشی فقط کندل‌های بعد از آخرین زمان پردازش‌شده محاسبه می‌شوند
+    if incremental:
+        states = load_indicator_states(symbol, timeframe, indicator_objects)
+    else:
+        states = {indicator.name: None for indicator in indicator_objects}
+
+    groups = _plan_groups(states)
+    if len(groups) > 1:
+        # اندیکاتورهایی که در نقاط متفاوتی از تاریخچه‌اند جداگانه ادامه داده می‌شوند
+        return max(calculate_and_store_indicators(symbol, timeframe, incremental, names, frame)
+                   for names in groups.values())
+    plan = next(iter(groups))
+
+    context = 0
+    rewind = 0
+    limit = FULL_HISTORY_LIMIT
+    if plan:
+        last_time, context, seen_version = plan
+
+        # کندل‌هایی که بعد از اجرای قبلی در بازه‌ی پردازش‌شده درج یا بروزرسانی شده‌اند
+        changed_since = get_ohlcv_changes(symbol, timeframe, seen_version)
+        if changed_since is not None and changed_since <= last_time:
+            if changed_since == last_time and context > 1:
+                # فقط آخرین کندل پردازش‌شده (کندل در حال تشکیل) تغییر کرده: از یک کندل قبل‌تر ادامه می‌دهیم
+                rewind = 1
+            else:
+                print(f"↩️ History changed at {changed_since} for {symbol} [{timeframe}], running full recompute")
+                return calculate_and_store_indicators(symbol, timeframe, incremental=False, indicators=indicators,
+                                                      frame=frame)
+
+        new_rows = count_rows_after(symbol, timeframe, last_time) + rewind
+        if new_rows == 0:
+            _advance_states(symbol, timeframe, indicator_objects, states, ohlcv_version)
+            print(f"⚪️ Indicators up to date for {symbol} [{timeframe}]")
+            return 0
+
+        context -= rewind
+        limit = context + new_rows
+        for state in states.values():
+            state["tails"] = {key: tail[:len(tail) - rewind] for key, tail in state["tails"].items()}
+
+    # دریافت داده‌ها (آخرین limit کندل از frame)
+    df = frame.tail(limit)
+    if df.empty:
+        print("⚠️ No data available.")
+        return 0
+
+    if plan:
+        # ردیف‌های زمینه (به‌علاوه‌ی کندل برگشتی) باید دقیقاً به آخرین زمان پردازش‌شده ختم شوند
+        position = context + rewind - 1
+        boundary = df['time'].iloc[position].strftime('%Y-%m-%d %H:%M:%S') if len(df) > position else None
+        if boundary != plan[0]:
+            print(f"↩️ Stored state does not match history for {symbol} [{timeframe}], running full recompute")
+            return calculate_and_store_indicators(symbol, timeframe, incremental=False, indicators=indicators,
+                                                  frame=frame)
+        print(f"➕ Incremental run for {symbol} [{timeframe}]: {len(df) - context} new rows")
+
+    for indicator in indicator_objects:
+        indicator.resume(states.get(indicator.name), context)
+
+    # اجرای محاسبات و ذخیره نتایج در حافظه؛ سری‌های مشترک (EMA، MACD، TR، ...) یک بار محاسبه می‌شوند
     cached_results = {}
-    all_columns = set()
+    features = FeatureStore(df)
 
     for indicator in indicator_objects:
-        result_df = indicator.calculate(df.copy())
-        cached_results[indicator] = result_df
-        all_columns.update([col for col in result_df.columns if col != "time"])
-
-    # اطمینان از وجود همه ستون‌ها در دیتابیس
-    for col in sorted(all_columns):
-        add_column_if_not_exists(conn, table, col)
-
-    # ادغام نتایج در دیتافریم اصلی
-    for result_df in cached_results.values():
-        for col in result_df.columns:
-            if col != "time":
-                df[col] = result_df[col]
-
-    # فرمت‌دهی زمان
-    df['time'] = df['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
-
-    # بروزرسانی دیتابیس
-    cursor = conn.cursor()
-    for idx, row in df.iterrows():
-        update_fields = []
-        update_values = []
-        for col in all_columns:
-            val = row.get(col)
-            if pd.notna(val):
-                update_fields.append(f"{col} = ?")
-                update_values.append(val)
-        if update_fields:
-            sql = f"UPDATE {table} SET {', '.join(update_fields)} WHERE time = ?"
-            cursor.execute(sql, (*update_values, row["time"]))
-
-    conn.commit()
-    conn.close()
+        indicator.features = features
+        cached_results[indicator] = indicator.calculate(df)
+    print(f"🧮 Shared features for {symbol} [{timeframe}]: {features.summary()}")
+
+    # فقط ردیف‌های جدید نوشته می‌شوند (ردیف‌های زمینه قبلاً ذخیره شده‌اند)
+    rows = len(df)
+    df = df.iloc[context:]
+
+    # هر اندیکاتور در جدول باریک خودش (<name>_<tf>) ذخیره می‌شود
+    started = time.perf_counter()
+    updated = 0
+    for indicator, result_df in cached_results.items():
+        updated += store_indicator_frame(symbol, timeframe, indicator.name, result_df.iloc[context:])
+    elapsed = time.perf_counter() - started
+    rate = len(df) / elapsed if elapsed > 0 else float("inf")
+    print(f"⏱️ {symbol} [{timeframe}]: {len(df)} rows ({updated} indicator rows changed) written in {elapsed:.3f}s — {rate:,.0f} rows/s")
+
+    save_indicator_states(symbol, timeframe, indicator_objects,
+                          df['time'].iloc[-1].strftime('%Y-%m-%d %H:%M:%S'), rows, ohlcv_version)
     print(f"✅ Indicators stored for {symbol} [{timeframe}]")
+    return len(df)
+
+
+def fetch_indicators(symbol: str, timeframe: str, limit: int = 5000, columns: list = None,
+                     start=None, end=None, dtypes: dict = None) -> pd.DataFrame:
+    """
+    کندل‌ها همراه خروجی اندیکاتورها و پرایس اکشن ذخیره‌شده؛ ستون‌های هم‌نام مثل
+    قبل از اندیکاتور بعدی در build_indicators گرفته می‌شوند.
+    """
+    names = [indicator.name for indicator in build_indicators(symbol, timeframe)] + [PRICE_ACTION_NAME]
+    return fetch_indicator_frame(symbol, timeframe, names, limit=limit, columns=columns,
+                                 start=start, end=end, dtypes=dtypes)
@@ -1,35 +1,165 @@
 # indicators/runner_indicator.py
 
+import atexit
 import traceback
 from multiprocessing import Pool, cpu_count
-from indicators.indicator_manager import calculate_and_store_indicators
+from indicators.indicator_manager import (
+    calculate_and_store_indicators,
+    needs_update,
+    build_indicators,
+    select_indicators
+)
+from indicators.ohlcv_frame import OHLCVFrame, FULL_HISTORY_LIMIT
+from analysis.price_action.price_action_manager import (
+    PRICE_ACTION_NAME,
+    calculate_and_store_price_action,
+    needs_update as price_action_needs_update
+)
+from database.db_operations import transaction, count_rows
 from database.symbols_meta import get_all_registered_symbols
 from config import SUPPORTED_TIMEFRAMES, TIMEFRAME_MAP
 
 
-def _run_for_symbol_and_timeframe(args):
-    symbol, tf_enum = args
-    tf_str = TIMEFRAME_MAP[tf_enum]
+def build_targets(symbols: list = None, timeframes: list = None, indicators: list = None) -> list:
+    """
+    ساخت لیست اهداف (symbol, timeframe, indicator)؛ indicator=None یعنی همه‌ی اندیکاتورها
+    به‌علاوه‌ی مرحله‌ی پرایس اکشن (نام "price_action").
+
+    پیش‌فرض‌ها: همه‌ی نمادهای ثبت‌شده و همه‌ی تایم‌فریم‌های پشتیبانی‌شده.
+    """
+    symbols = symbols or get_all_registered_symbols()
+    timeframes = [TIMEFRAME_MAP.get(tf, tf) for tf in (timeframes or SUPPORTED_TIMEFRAMES)]
+    return [(symbol, tf, name) for symbol in symbols for tf in timeframes for name in (indicators or [None])]
+
+
+def _group_targets(targets: list) -> dict:
+    """
+    ادغام اهداف هر (نماد، تایم‌فریم) در یک کار؛ None یعنی همه‌ی اندیکاتورها.
+    """
+    pairs = {}
+    for symbol, tf, name in targets:
+        key = (symbol, TIMEFRAME_MAP.get(tf, tf))
+        if name is None or pairs.get(key, []) is None:
+            pairs[key] = None
+        elif name not in pairs.setdefault(key, []):
+            pairs[key].append(name)
+    return pairs
+
+
+def _split_stages(names: list):
+    """
+    :return: (نام اندیکاتورها؛ None = همه، اجرای مرحله‌ی پرایس اکشن)
+    """
+    if names is None:
+        return None, True
+    return [name for name in names if name != PRICE_ACTION_NAME], PRICE_ACTION_NAME in names
+
+
+def _needs_update(symbol: str, tf_str: str, names: list) -> bool:
+    indicators, price_action = _split_stages(names)
+    return ((indicators != [] and needs_update(symbol, tf_str, indicators))
+            or (price_action and price_action_needs_update(symbol, tf_str)))
+
+
+def _estimate_cost(symbol: str, tf_str: str, names: list) -> int:
+    """
+    هزینه‌ی تقریبی یک کار: کندل‌های خوانده‌شده (تا FULL_HISTORY_LIMIT) × تعداد ماژول‌ها.
+    """
+    indicators, price_action = _split_stages(names)
+    modules = len(select_indicators(build_indicators(symbol, tf_str), indicators)) + int(price_action)
+    return min(count_rows(symbol, tf_str), FULL_HISTORY_LIMIT) * modules
+
+
+def _run_for_symbol_and_timeframe(args) -> int:
+    """
+    یک کار برای هر (نماد، تایم‌فریم): کندل‌ها یک بار خوانده می‌شوند، اندیکاتورها و
+    سپس پرایس اکشن روی همان داده اجرا و همه‌ی نتایج (جدول‌ها، کانال‌ها، حالت‌ها) در
+    یک تراکنش ذخیره می‌شوند؛ با خطا هیچ‌چیز از این کار ذخیره نمی‌شود.
+    """
+    symbol, tf_str, names, full = args
+    indicators, price_action = _split_stages(names)
     try:
         print(f"🔍 Running indicators for {symbol} [{tf_str}]")
-        calculate_and_store_indicators(symbol, tf_str)
+        with transaction(symbol):
+            frame = OHLCVFrame(symbol, tf_str)
+            rows = 0
+            if indicators != []:
+                rows = calculate_and_store_indicators(symbol, tf_str, incremental=not full,
+                                                      indicators=indicators, frame=frame)
+            if price_action:
+                rows = max(rows, calculate_and_store_price_action(symbol, tf_str, incremental=not full,
+                                                                  frame=frame))
         print(f"✅ Done: {symbol} [{tf_str}]")
+        return rows
     except Exception as e:
         print(f"❌ Error in {symbol} [{tf_str}]: {e}")
         traceback.print_exc()
+        return 0
 
 
-def run_all_indicators_parallel():
-    symbols = get_all_registered_symbols()
-    tasks = [(symbol, tf) for symbol in symbols for tf in SUPPORTED_TIMEFRAMES]
+def _run_task(task):
+    return task, _run_for_symbol_and_timeframe(task)
+
+
+# pool کارگرها بین دورهای بروزرسانی نگه داشته می‌شود (ساخت پروسه‌ها و import ها فقط یک بار)
+_worker_pool = None
+_worker_pool_size = 0
+
+
+def _get_worker_pool(processes: int) -> Pool:
+    global _worker_pool, _worker_pool_size
+    if _worker_pool is None or _worker_pool_size != processes:
+        close_worker_pool()
+        _worker_pool = Pool(processes=processes)
+        _worker_pool_size = processes
+    return _worker_pool
+
+
+def close_worker_pool():
+    global _worker_pool, _worker_pool_size
+    if _worker_pool is not None:
+        _worker_pool.close()
+        _worker_pool.join()
+        _worker_pool = None
+        _worker_pool_size = 0
+
+
+atexit.register(close_worker_pool)
+
+
+def run_indicators(targets: list = None, full: bool = False, processes: int = None) -> dict:
+    """
+    اجرای اندیکاتورها و پرایس اکشن فقط برای اهدافی که OHLCVشان از آخرین اجرا تغییر کرده است.
+
+    کارها از پرهزینه‌ترین (_estimate_cost) یکی‌یکی به کارگرها داده می‌شوند تا کار
+    بزرگی در انتها تنها نماند.
+
+    :param targets: لیست (symbol, timeframe, indicator) از build_targets (None = همه)
+    :param full: محاسبه‌ی کامل همه‌ی اهداف بدون بررسی تغییرات
+    :param processes: تعداد پروسه‌ها؛ 1 یعنی اجرا در همین پروسه (مثلاً از app.py)
+    :return: {(symbol, timeframe): تعداد کندل‌های محاسبه‌شده}
+    """
+    pairs = _group_targets(build_targets() if targets is None else targets)
+    tasks = [(symbol, tf, indicators, full) for (symbol, tf), indicators in pairs.items()
+             if full or _needs_update(symbol, tf, indicators)]
 
     if not tasks:
-        print("⚠️ No tasks to run.")
-        return
+        print(f"⚪️ No indicator jobs to run ({len(pairs)} targets up to date).")
+        return {}
 
-    print(f"🚀 Running {len(tasks)} indicator jobs using {cpu_count()} cores...")
+    tasks.sort(key=lambda task: _estimate_cost(*task[:3]), reverse=True)
+    processes = processes or cpu_count()
+    print(f"🚀 Running {len(tasks)} of {len(pairs)} indicator jobs using {min(processes, len(tasks))} process(es)...")
 
-    with Pool(processes=cpu_count()) as pool:
-        pool.map(_run_for_symbol_and_timeframe, tasks)
+    if processes == 1 or len(tasks) == 1:
+        results = [_run_task(task) for task in tasks]
+    else:
+        results = _get_worker_pool(processes).imap_unordered(_run_task, tasks, chunksize=1)
 
+    rows = {(symbol, tf): count for (symbol, tf, _, _), count in results}
     print("🏁 All indicators processed.")
+    return rows
+
+
+def run_all_indicators_parallel():
+    return run_indicators()
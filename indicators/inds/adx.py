@@ -1,8 +1,29 @@
+import math
 from indicators.base_indicator import BaseIndicator
+from indicators.rules import Rule, Case, evaluate, evaluate_row, reason_labels, case_labels, select_codes, select_row
+from indicators.enums import ZONE, categorical
+from indicators import rolling
+from indicators.online import OnlineEWM, RollingMean, Previous, NaN, isnan
 import pandas as pd
 import numpy as np
 
 class ADXHybridIndicator(BaseIndicator):
+    name = "adx"
+
+    # قوانین امتیازدهی (به ترتیب نمایش در sig_reason)؛ c ستون‌های دیتافریم یا یک ردیف است
+    score_rules = [
+        Rule(lambda c: c['ADX'] > 35, 1, "ADX > 35"),
+        Rule(lambda c: c['ADX'] > 60, 0, "⚠️ ADX بسیار بالا (اشباع روند)"),
+        Rule(lambda c: c['volume'] > c['volume_ma'], 1, "حجم بالای میانگین"),
+        Rule(lambda c: c['RSI'] > 70, -1, "RSI اشباع خرید"),
+        Rule(lambda c: c['RSI'] < 30, -1, "RSI اشباع فروش"),
+        Rule(lambda c: (c['base_sig'] == 'Buy') & (c['MACD'] > c['MACD_signal']), 1, "کراس مثبت MACD"),
+        Rule(lambda c: (c['base_sig'] == 'Sell') & (c['MACD'] < c['MACD_signal']), 1, "کراس منفی MACD"),
+    ]
+
+    # جدول کد sig_reason: متن هر بیت‌ماسک score_rules
+    reason_table = reason_labels(score_rules)
+
     def __init__(self, symbol, timeframe, params):
         super().__init__(symbol, timeframe, params)
         self.period = params.get('period', 14)
@@ -12,121 +33,171 @@ class ADXHybridIndicator(BaseIndicator):
         self.macd_slow = params.get('macd_slow', 26)
         self.macd_signal = params.get('macd_signal', 9)
 
+        # سیگنال پایه بر اساس کراس DI (ADX قوی و تأیید EMA)
+        ema = f'EMA_{self.ema_period}'
+        self.signal_cases = [
+            Case(lambda c: (c['ADX'] > 25) & (c['diplusn'] > c['diminusn']) & (c['close'] > c[ema]), 'Buy'),
+            Case(lambda c: (c['ADX'] > 25) & (c['diminusn'] > c['diplusn']) & (c['close'] < c[ema]), 'Sell'),
+        ]
+
     # ================== تابع RMA (Wilder’s) ==================
-    def rma(self, series, period):
-        return series.ewm(alpha=1/period, adjust=False).mean()
+    def rma(self, key, series, period, source=None):
+        return self.ewm(key, series, source=source, alpha=1/period, adjust=False)
 
     def calculate(self, df):
-        df = df.copy()
+        # ورودی فقط‌خواندنی است؛ ستون‌ها به یک نمای سطحی (بدون کپی داده‌ها) اضافه می‌شوند
+        df = df.copy(deep=False)
 
         # ===== مرحله ۱: محاسبه ADX و DI‌ها =====
         if 'ADX' not in df.columns:
             self._calculate_adx(df)
         if f'EMA_{self.ema_period}' not in df.columns:
-            df[f'EMA_{self.ema_period}'] = df['close'].ewm(span=self.ema_period, adjust=False).mean()
+            df[f'EMA_{self.ema_period}'] = self.ewm('EMA', df['close'], source='close', span=self.ema_period, adjust=False)
         if 'RSI' not in df.columns:
             self._calculate_rsi(df)
         if 'MACD' not in df.columns or 'MACD_signal' not in df.columns:
             self._calculate_macd(df)
         if 'volume_ma' not in df.columns:
-            df['volume_ma'] = df['volume'].rolling(window=self.period).mean()
+            df['volume_ma'] = rolling.sma(df['volume'], self.period)
 
         # ===== مرحله ۲: سیگنال پایه بر اساس کراس DI =====
-        def base_signal(row):
-            if row['ADX'] > 25:
-                if row['diplusn'] > row['diminusn'] and row['close'] > row[f'EMA_{self.ema_period}']:
-                    return 'Buy'
-                elif row['diminusn'] > row['diplusn'] and row['close'] < row[f'EMA_{self.ema_period}']:
-                    return 'Sell'
-            return 'Hold'
-
-        df['base_sig'] = df.apply(base_signal, axis=1)
+        n = len(df)
+        signals = case_labels(self.signal_cases, 'Hold')
+        base = select_codes(self.signal_cases, df, n)
+        df['base_sig'] = np.array(signals, dtype=object)[base]
 
         # ===== مرحله ۳: فیلتر و امتیازدهی =====
-        def hybrid_signal(row):
-            reasons = []
-            score = 0
-            signal = row['base_sig']
-
-            # ADX قوی
-            if row['ADX'] > 35:
-                score += 1
-                reasons.append("ADX > 35")
-            if row['ADX'] > 60:
-                reasons.append("⚠️ ADX بسیار بالا (اشباع روند)")
-
-            # حجم
-            if row['volume'] > row['volume_ma']:
-                score += 1
-                reasons.append("حجم بالای میانگین")
-
-            # RSI
-            if row['RSI'] > 70:
-                score -= 1
-                reasons.append("RSI اشباع خرید")
-            elif row['RSI'] < 30:
-                score -= 1
-                reasons.append("RSI اشباع فروش")
-
-            # MACD
-            if signal == 'Buy' and row['MACD'] > row['MACD_signal']:
-                score += 1
-                reasons.append("کراس مثبت MACD")
-            elif signal == 'Sell' and row['MACD'] < row['MACD_signal']:
-                score += 1
-                reasons.append("کراس منفی MACD")
-
-            # تصمیم نهایی
-            if score <= 0:
-                signal = 'Hold'
-
-            return pd.Series([signal, ' | '.join(reasons), score])
-
-        df[['sig_final', 'sig_reason', 'score']] = df.apply(hybrid_signal, axis=1)
+        score, reasons = evaluate(self.score_rules, df, n)
+        df['score'] = score
 
         # رنگ منطقه برای نمایش مثل Pine Script
-        df['zone'] = np.where(df['diplusn'] > df['diminusn'], 'green', 'red')
+        green = (df['diplusn'] > df['diminusn']).to_numpy()
+
+        # حذف NaN‌های اولیه (فقط در ستون‌های خروجی)
+        out = df[['time', 'ADX', 'diplusn', 'diminusn', f'EMA_{self.ema_period}',
+                  'RSI', 'MACD', 'MACD_signal', 'score']].fillna(0)
+
+        # ستون‌های متنی به‌صورت کد (Categorical)؛ بعد از fillna چون 0 برچسب معتبری نیست
+        out['sig_final'] = categorical(np.where(score > 0, base, 0), signals, df.index)
+        out['sig_reason'] = categorical(reasons, self.reason_table, df.index)
+        out['zone'] = categorical(green, ZONE, df.index)
+
+        return out[['time', 'ADX', 'diplusn', 'diminusn', f'EMA_{self.ema_period}',
+                    'RSI', 'MACD', 'MACD_signal', 'zone', 'sig_final', 'sig_reason', 'score']]
+
+    # ================== منطق سیگنال (مشترک بین حالت دسته‌ای و زنده) ==================
+    def base_signal(self, row):
+        return select_row(self.signal_cases, row, default='Hold')
 
-        # حذف NaN‌های اولیه
-        df.fillna(0, inplace=True)
+    def hybrid_signal(self, row):
+        score, reasons = evaluate_row(self.score_rules, row)
 
-        return df[['time', 'ADX', 'diplusn', 'diminusn', f'EMA_{self.ema_period}',
-                   'RSI', 'MACD', 'MACD_signal', 'zone', 'sig_final', 'sig_reason', 'score']]
+        # تصمیم نهایی
+        signal = row['base_sig'] if score > 0 else 'Hold'
+        return [signal, reasons, score]
 
     # ================== زیر توابع محاسباتی ==================
     def _calculate_adx(self, df):
-        high, low, close = df['high'], df['low'], df['close']
+        high, low = df['high'], df['low']
 
-        tr = np.maximum.reduce([
-            high - low,
-            (high - close.shift()).abs(),
-            (low - close.shift()).abs()
-        ])
+        tr = self.feature_store(df).true_range()
         dm_plus = np.where((high - high.shift()) > (low.shift() - low),
                            np.maximum(high - high.shift(), 0), 0)
         dm_minus = np.where((low.shift() - low) > (high - high.shift()),
                             np.maximum(low.shift() - low, 0), 0)
 
-        trn = self.rma(pd.Series(tr), self.period)
-        dm_plus_n = self.rma(pd.Series(dm_plus), self.period)
-        dm_minus_n = self.rma(pd.Series(dm_minus), self.period)
+        trn = self.rma('TR', tr, self.period, source='true_range')
+        dm_plus_n = self.rma('DM_plus', pd.Series(dm_plus, index=df.index), self.period)
+        dm_minus_n = self.rma('DM_minus', pd.Series(dm_minus, index=df.index), self.period)
 
         df['diplusn'] = 100 * (dm_plus_n / trn).replace([np.inf, -np.inf], np.nan)
         df['diminusn'] = 100 * (dm_minus_n / trn).replace([np.inf, -np.inf], np.nan)
         dx = 100 * np.abs(df['diplusn'] - df['diminusn']) / (df['diplusn'] + df['diminusn']).replace(0, np.nan)
-        df['ADX'] = self.rma(dx, self.period)
+        df['ADX'] = self.rma('ADX', dx, self.period)
 
     def _calculate_rsi(self, df):
-        delta = df['close'].diff()
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
-        avg_gain = gain.rolling(self.rsi_period).mean()
-        avg_loss = loss.rolling(self.rsi_period).mean()
+        features = self.feature_store(df)
+        gain = features.gain('close')
+        loss = features.loss('close')
+        avg_gain = rolling.sma(gain, self.rsi_period)
+        avg_loss = rolling.sma(loss, self.rsi_period)
         rs = avg_gain / avg_loss
         df['RSI'] = 100 - (100 / (1 + rs))
 
     def _calculate_macd(self, df):
-        ema_fast = df['close'].ewm(span=self.macd_fast, adjust=False).mean()
-        ema_slow = df['close'].ewm(span=self.macd_slow, adjust=False).mean()
+        ema_fast = self.ewm('MACD_fast', df['close'], source='close', span=self.macd_fast, adjust=False)
+        ema_slow = self.ewm('MACD_slow', df['close'], source='close', span=self.macd_slow, adjust=False)
         df['MACD'] = ema_fast - ema_slow
-        df['MACD_signal'] = df['MACD'].ewm(span=self.macd_signal, adjust=False).mean()
+        df['MACD_signal'] = self.ewm('MACD_signal', df['MACD'], source=f'macd({self.macd_fast},{self.macd_slow})',
+                                     span=self.macd_signal, adjust=False)
+
+    # ================== نسخه‌ی زنده (O(1) برای هر کندل) ==================
+    def update(self, bar: dict) -> dict:
+        if self._stream is None:
+            self._stream = {
+                "TR": OnlineEWM(alpha=1/self.period),
+                "DM_plus": OnlineEWM(alpha=1/self.period),
+                "DM_minus": OnlineEWM(alpha=1/self.period),
+                "ADX": OnlineEWM(alpha=1/self.period),
+                "EMA": OnlineEWM(span=self.ema_period),
+                "avg_gain": RollingMean(self.rsi_period),
+                "avg_loss": RollingMean(self.rsi_period),
+                "MACD_fast": OnlineEWM(span=self.macd_fast),
+                "MACD_slow": OnlineEWM(span=self.macd_slow),
+                "MACD_signal": OnlineEWM(span=self.macd_signal),
+                "volume_ma": RollingMean(self.period),
+                "prev": Previous(),
+            }
+        s = self._stream
+
+        high, low, close = bar['high'], bar['low'], bar['close']
+        prev = s["prev"].update((high, low, close))
+        if isinstance(prev, tuple):
+            prev_high, prev_low, prev_close = prev
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+            up, down = high - prev_high, prev_low - low
+            dm_plus = max(up, 0) if up > down else 0
+            dm_minus = max(down, 0) if down > up else 0
+            delta = close - prev_close
+        else:
+            tr = delta = NaN
+            dm_plus = dm_minus = 0
+
+        trn = s["TR"].update(tr)
+        dm_plus_n = s["DM_plus"].update(dm_plus)
+        dm_minus_n = s["DM_minus"].update(dm_minus)
+        diplusn = 100 * (dm_plus_n / trn) if trn else NaN
+        diminusn = 100 * (dm_minus_n / trn) if trn else NaN
+        di_sum = diplusn + diminusn
+        adx = s["ADX"].update(100 * abs(diplusn - diminusn) / di_sum if di_sum else NaN)
+
+        avg_gain = s["avg_gain"].update(max(delta, 0) if not isnan(delta) else NaN)
+        avg_loss = s["avg_loss"].update(-min(delta, 0) if not isnan(delta) else NaN)
+        if avg_loss:
+            rs = avg_gain / avg_loss
+        else:
+            rs = math.inf if avg_gain > 0 else NaN
+        rsi = 100 - (100 / (1 + rs))
+
+        macd = s["MACD_fast"].update(close) - s["MACD_slow"].update(close)
+
+        row = {
+            'close': close,
+            'volume': bar['volume'],
+            'ADX': adx,
+            'diplusn': diplusn,
+            'diminusn': diminusn,
+            f'EMA_{self.ema_period}': s["EMA"].update(close),
+            'RSI': rsi,
+            'MACD': macd,
+            'MACD_signal': s["MACD_signal"].update(macd),
+            'volume_ma': s["volume_ma"].update(bar['volume']),
+        }
+        row['base_sig'] = self.base_signal(row)
+        row['sig_final'], row['sig_reason'], row['score'] = self.hybrid_signal(row)
+        row['zone'] = 'green' if diplusn > diminusn else 'red'
+
+        # مثل fillna(0) ستون‌های عددی در calculate
+        return {k: 0 if isnan(row[k]) else row[k]
+                for k in ['ADX', 'diplusn', 'diminusn', f'EMA_{self.ema_period}', 'RSI',
+                          'MACD', 'MACD_signal', 'zone', 'sig_final', 'sig_reason', 'score']}
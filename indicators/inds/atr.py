@@ -1,8 +1,13 @@
 import pandas as pd
 import numpy as np
 from indicators.base_indicator import BaseIndicator
+from indicators.enums import TREND, TRADE, VOLATILITY, MOMENTUM, ATR_ENTRY, choose
+from indicators import rolling
+from indicators.online import OnlineEWM, RollingMean, Previous, NaN, isnan
 
 class ATRIndicator(BaseIndicator):
+    name = "atr"
+
     def __init__(self, symbol, timeframe, params):
         super().__init__(symbol, timeframe, params)
         self.nday = params.get("nday", 14)
@@ -10,22 +15,19 @@ class ATRIndicator(BaseIndicator):
         self.ema_period = params.get("ema_period", 20)  # پارامتری کردن EMA
 
     def calculate(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
+        # ورودی فقط‌خواندنی است؛ ستون‌ها به یک نمای سطحی (بدون کپی داده‌ها) اضافه می‌شوند
+        df = df.copy(deep=False)
 
         # === True Range ===
-        tr = np.maximum.reduce([
-            df['high'] - df['low'],
-            (df['high'] - df['close'].shift(1)).abs(),
-            (df['low'] - df['close'].shift(1)).abs()
-        ])
-        df['TR'] = pd.Series(tr).ewm(alpha=1/self.nday, adjust=False).mean()  # Wilder's ATR
+        tr = self.feature_store(df).true_range()
+        df['TR'] = self.ewm('TR', tr, source='true_range', alpha=1/self.nday, adjust=False)  # Wilder's ATR
 
         # === Volatility ===
         df['Volatility_Percent'] = (df['TR'] / df['close']) * 100
 
         # === Trend filter ===
-        df['EMA'] = df['close'].ewm(span=self.ema_period, adjust=False).mean()
-        df['Trend_Signal'] = np.where(df['close'] > df['EMA'], 'Uptrend', 'Downtrend')
+        df['EMA'] = self.ewm('EMA', df['close'], source='close', span=self.ema_period, adjust=False)
+        df['Trend_Signal'] = choose([df['close'] > df['EMA']], TREND, df.index)
 
         # === ATR-based signal ===
         df['Signal_ATR'] = np.where(
@@ -35,13 +37,13 @@ class ATRIndicator(BaseIndicator):
 
         df['Contrarian_Signal'] = np.where(df['Signal_ATR'] == 1, -1,
                                            np.where(df['Signal_ATR'] == -1, 1, 0))
-        df['Contrarian_Signal_Final'] = np.where(df['Contrarian_Signal'] == -1, 'Sell',
-                                                 np.where(df['Contrarian_Signal'] == 1, 'Buy', 'Hold'))
+        df['Contrarian_Signal_Final'] = choose([df['Contrarian_Signal'] == 1, df['Contrarian_Signal'] == -1],
+                                               TRADE, df.index)
 
-        df['Final_Signal'] = np.where(
-            (df['Signal_ATR'] == 1) & (df['Trend_Signal'] == 'Uptrend'), 'Buy',
-            np.where((df['Signal_ATR'] == -1) & (df['Trend_Signal'] == 'Downtrend'), 'Sell', 'Hold')
-        )
+        df['Final_Signal'] = choose([
+            (df['Signal_ATR'] == 1) & (df['Trend_Signal'] == 'Uptrend'),
+            (df['Signal_ATR'] == -1) & (df['Trend_Signal'] == 'Downtrend')
+        ], TRADE, df.index)
 
         # === Stop Loss ===
         df['Buy_Stop_Loss'] = df['close'] - (self.stop_loss_multiplier * df['TR'])
@@ -49,24 +51,85 @@ class ATRIndicator(BaseIndicator):
 
         # === Momentum & Alerts ===
         df['ATR_Momentum'] = df['TR'].diff()
-        tr_mean = df['TR'].rolling(window=self.nday).mean()
-        df['ATR_Alert'] = np.where(
-            df['TR'] > 1.5 * tr_mean, 'High Volatility',
-            np.where(df['TR'] < 0.5 * tr_mean, 'Low Volatility', 'Normal')
-        )
+        tr_mean = rolling.sma(df['TR'], self.nday)
+        df['ATR_Alert'] = choose([df['TR'] > 1.5 * tr_mean, df['TR'] < 0.5 * tr_mean], VOLATILITY, df.index)
 
-        atr_mom_mean = df['ATR_Momentum'].rolling(window=self.nday).mean()
-        df['Trend_Momentum_Status'] = np.where(
-            df['ATR_Momentum'] > 1.5 * atr_mom_mean, 'Explosion',
-            np.where(df['ATR_Momentum'] < 0.5 * atr_mom_mean, 'Calm', 'Normal')
-        )
+        atr_mom_mean = rolling.sma(df['ATR_Momentum'], self.nday)
+        df['Trend_Momentum_Status'] = choose([df['ATR_Momentum'] > 1.5 * atr_mom_mean,
+                                              df['ATR_Momentum'] < 0.5 * atr_mom_mean], MOMENTUM, df.index)
 
         # === Entry Text ===
-        df['ATR_Entry'] = np.where(
-            df['Signal_ATR'] == 1, '📈 ورود به معامله خرید (Buy)',
-            np.where(df['Signal_ATR'] == -1, '📉 ورود به معامله فروش (Sell)', '⏸️ بی تصمیمی (No Entry)')
-        )
+        df['ATR_Entry'] = choose([df['Signal_ATR'] == 1, df['Signal_ATR'] == -1], ATR_ENTRY, df.index)
 
         return df[['time', 'TR', 'Volatility_Percent', 'Trend_Signal', 'Final_Signal',
                    'Contrarian_Signal_Final', 'Buy_Stop_Loss', 'Sell_Stop_Loss',
                    'ATR_Momentum', 'ATR_Alert', 'Trend_Momentum_Status', 'ATR_Entry']]
+
+    # === نسخه‌ی زنده (O(1) برای هر کندل) ===
+    def update(self, bar: dict) -> dict:
+        if self._stream is None:
+            self._stream = {
+                "TR": OnlineEWM(alpha=1/self.nday),
+                "EMA": OnlineEWM(span=self.ema_period),
+                "TR_mean": RollingMean(self.nday),
+                "momentum_mean": RollingMean(self.nday),
+                "prev_close": Previous(),
+                "prev_TR": Previous(),
+            }
+        s = self._stream
+
+        close = bar['close']
+        prev_close = s["prev_close"].update(close)
+        tr = max(bar['high'] - bar['low'], abs(bar['high'] - prev_close), abs(bar['low'] - prev_close))
+        atr = s["TR"].update(NaN if isnan(prev_close) else tr)
+        prev_atr = s["prev_TR"].update(atr)
+        ema = s["EMA"].update(close)
+        tr_mean = s["TR_mean"].update(atr)
+        momentum = atr - prev_atr
+        momentum_mean = s["momentum_mean"].update(momentum)
+
+        trend = 'Uptrend' if close > ema else 'Downtrend'
+        if close > prev_close and atr > prev_atr:
+            signal = 1
+        elif close < prev_close and atr < prev_atr:
+            signal = -1
+        else:
+            signal = 0
+
+        if signal == 1 and trend == 'Uptrend':
+            final = 'Buy'
+        elif signal == -1 and trend == 'Downtrend':
+            final = 'Sell'
+        else:
+            final = 'Hold'
+
+        # سیگنال معکوس: خرید روی سیگنال فروش ATR و بالعکس
+        contrarian = 'Buy' if signal == -1 else 'Sell' if signal == 1 else 'Hold'
+
+        if atr > 1.5 * tr_mean:
+            alert = 'High Volatility'
+        elif atr < 0.5 * tr_mean:
+            alert = 'Low Volatility'
+        else:
+            alert = 'Normal'
+
+        if momentum > 1.5 * momentum_mean:
+            momentum_status = 'Explosion'
+        elif momentum < 0.5 * momentum_mean:
+            momentum_status = 'Calm'
+        else:
+            momentum_status = 'Normal'
+
+        return {
+            'TR': atr,
+            'Volatility_Percent': atr / close * 100,
+            'Trend_Signal': trend,
+            'Final_Signal': final,
+            'Contrarian_Signal_Final': contrarian,
+            'Buy_Stop_Loss': close - self.stop_loss_multiplier * atr,
+            'Sell_Stop_Loss': close + self.stop_loss_multiplier * atr,
+            'ATR_Momentum': momentum,
+            'ATR_Alert': alert,
+            'Trend_Momentum_Status': momentum_status,
+            'ATR_Entry': ATR_ENTRY[1] if signal == 1 else ATR_ENTRY[2] if signal == -1 else ATR_ENTRY[0],
+        }
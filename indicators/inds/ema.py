@@ -1,21 +1,40 @@
 import pandas as pd
 import numpy as np
 from indicators.base_indicator import BaseIndicator
+from indicators import rolling
+from indicators.rules import Case, case_labels, select_codes, select_row
+from indicators.enums import categorical
+from indicators.online import OnlineEWM, RollingExtremum, Previous
 
 class TripleEMAIndicator(BaseIndicator):
+    name = "ema"
+
     def __init__(self, symbol, timeframe, params=None):
         super().__init__(symbol, timeframe, params)
         self.short_period = self.params.get("short_period", 9)
         self.mid_period = self.params.get("mid_period", 50)
         self.long_period = self.params.get("long_period", 200)
 
+        # متن توضیح بر اساس سیگنال روند و کراس (c ستون‌ها یا یک ردیف)
+        self.reason_cases = [
+            Case(lambda c: (c["sig_EMA"] == 1) & (c["cross_short_mid"] == 1),
+                 "📈 کراس صعودی EMA کوتاه از میانی → تأیید روند صعودی"),
+            Case(lambda c: c["sig_EMA"] == 1,
+                 f"سه EMA صعودی (کوتاه>{self.short_period}, میانی>{self.mid_period}, بلند>{self.long_period}) → روند صعودی"),
+            Case(lambda c: (c["sig_EMA"] == -1) & (c["cross_short_mid"] == -1),
+                 "📉 کراس نزولی EMA کوتاه از میانی → تأیید روند نزولی"),
+            Case(lambda c: c["sig_EMA"] == -1, "سه EMA نزولی → روند نزولی"),
+        ]
+        self.neutral_reason = "سه EMA در هم تنیده یا نامرتب → بازار خنثی/نوسانی"
+
     def calculate(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
+        # ورودی فقط‌خواندنی است؛ ستون‌ها به یک نمای سطحی (بدون کپی داده‌ها) اضافه می‌شوند
+        df = df.copy(deep=False)
 
         # === محاسبه EMA ها (هماهنگ با Pine Script) ===
-        df[f"EMA_short_{self.short_period}"] = df["close"].ewm(alpha=2/(self.short_period+1), adjust=False).mean()
-        df[f"EMA_mid_{self.mid_period}"] = df["close"].ewm(alpha=2/(self.mid_period+1), adjust=False).mean()
-        df[f"EMA_long_{self.long_period}"] = df["close"].ewm(alpha=2/(self.long_period+1), adjust=False).mean()
+        df[f"EMA_short_{self.short_period}"] = self.ewm("EMA_short", df["close"], source="close", alpha=2/(self.short_period+1), adjust=False)
+        df[f"EMA_mid_{self.mid_period}"] = self.ewm("EMA_mid", df["close"], source="close", alpha=2/(self.mid_period+1), adjust=False)
+        df[f"EMA_long_{self.long_period}"] = self.ewm("EMA_long", df["close"], source="close", alpha=2/(self.long_period+1), adjust=False)
 
         # === شاخص ترکیبی فاصله ===
         df["value_EMA"] = (
@@ -47,22 +66,60 @@ class TripleEMAIndicator(BaseIndicator):
         )
 
         # === امتیاز نرمال‌شده (rolling) ===
-        max_diff = df["value_EMA"].rolling(window=50).apply(lambda x: np.max(np.abs(x)), raw=True)
+        max_diff = rolling.rolling_max_abs(df["value_EMA"], 50)
         df["score_EMA"] = np.where(max_diff != 0, df["value_EMA"] / max_diff, 0)
 
         # === توضیح متنی ===
-        def explain(row):
-            if row["sig_EMA"] == 1:
-                if row["cross_short_mid"] == 1:
-                    return "📈 کراس صعودی EMA کوتاه از میانی → تأیید روند صعودی"
-                return f"سه EMA صعودی (کوتاه>{self.short_period}, میانی>{self.mid_period}, بلند>{self.long_period}) → روند صعودی"
-            elif row["sig_EMA"] == -1:
-                if row["cross_short_mid"] == -1:
-                    return "📉 کراس نزولی EMA کوتاه از میانی → تأیید روند نزولی"
-                return "سه EMA نزولی → روند نزولی"
-            else:
-                return "سه EMA در هم تنیده یا نامرتب → بازار خنثی/نوسانی"
-
-        df["reason_EMA"] = df.apply(explain, axis=1)
+        df["reason_EMA"] = categorical(select_codes(self.reason_cases, df, len(df)),
+                                       case_labels(self.reason_cases, self.neutral_reason), df.index)
 
         return df
+
+    def explain(self, sig, cross):
+        return select_row(self.reason_cases, {"sig_EMA": sig, "cross_short_mid": cross}, default=self.neutral_reason)
+
+    # === نسخه‌ی زنده (O(1) برای هر کندل) ===
+    def update(self, bar: dict) -> dict:
+        if self._stream is None:
+            self._stream = {
+                "short": OnlineEWM(alpha=2/(self.short_period+1)),
+                "mid": OnlineEWM(alpha=2/(self.mid_period+1)),
+                "long": OnlineEWM(alpha=2/(self.long_period+1)),
+                "max_diff": RollingExtremum(50, "max"),
+                "prev": Previous(),
+            }
+        s = self._stream
+
+        short = s["short"].update(bar["close"])
+        mid = s["mid"].update(bar["close"])
+        long = s["long"].update(bar["close"])
+        value = ((short - mid) + (mid - long)) / 2
+
+        if short > mid and mid > long:
+            sig = 1
+        elif short < mid and mid < long:
+            sig = -1
+        else:
+            sig = 0
+
+        prev = s["prev"].update((short, mid))
+        cross = 0
+        if isinstance(prev, tuple):
+            if prev[0] < prev[1] and short > mid:
+                cross = 1
+            elif prev[0] > prev[1] and short < mid:
+                cross = -1
+
+        max_diff = s["max_diff"].update(abs(value))
+        return {
+            # calculate کل دیتافریم (همراه OHLCV کندل) را برمی‌گرداند
+            **{c: bar[c] for c in ("open", "high", "low", "close", "volume")},
+            f"EMA_short_{self.short_period}": short,
+            f"EMA_mid_{self.mid_period}": mid,
+            f"EMA_long_{self.long_period}": long,
+            "value_EMA": value,
+            "sig_EMA": sig,
+            "cross_short_mid": cross,
+            "score_EMA": value / max_diff if max_diff != 0 else 0,
+            "reason_EMA": self.explain(sig, cross),
+        }
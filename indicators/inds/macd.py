@@ -1,8 +1,13 @@
 import pandas as pd
 import numpy as np
 from indicators.base_indicator import BaseIndicator
+from indicators import rolling
+from indicators.enums import CANDLE_COLOR, choose
+from indicators.online import OnlineEWM, RollingMean, RollingWMA, Previous
 
 class MACDIndicator(BaseIndicator):
+    name = "macd"
+
     def __init__(self, symbol, timeframe, params):
         super().__init__(symbol, timeframe, params)
 
@@ -13,27 +18,27 @@ class MACDIndicator(BaseIndicator):
         self.ma_period = params.get("ma_period", 50)
 
     def calculate(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
+        # ورودی فقط‌خواندنی است؛ ستون‌ها به یک نمای سطحی (بدون کپی داده‌ها) اضافه می‌شوند
+        df = df.copy(deep=False)
 
         # === Moving Averages ===
-        df["EMA"] = df["close"].ewm(span=self.ma_period, adjust=False).mean()
-        df["SMA"] = df["close"].rolling(self.ma_period).mean()
-        df["RMA"] = df["close"].ewm(alpha=1/self.ma_period, adjust=False).mean()
-        df["WMA"] = df["close"].rolling(self.ma_period).apply(
-            lambda x: np.dot(x, np.arange(1, self.ma_period+1)) / np.arange(1, self.ma_period+1).sum(), raw=True
-        )
-        df["DEMA"] = 2*df["EMA"] - df["EMA"].ewm(span=self.ma_period, adjust=False).mean()
+        df["EMA"] = self.ewm("EMA", df["close"], source="close", span=self.ma_period, adjust=False)
+        df["SMA"] = rolling.sma(df["close"], self.ma_period)
+        df["RMA"] = self.ewm("RMA", df["close"], source="close", alpha=1/self.ma_period, adjust=False)
+        df["WMA"] = rolling.wma(df["close"], self.ma_period)
         ema1 = df["EMA"]
-        ema2 = ema1.ewm(span=self.ma_period, adjust=False).mean()
-        ema3 = ema2.ewm(span=self.ma_period, adjust=False).mean()
+        ema2 = self.ewm("EMA2", ema1, span=self.ma_period, adjust=False)
+        ema3 = self.ewm("EMA3", ema2, span=self.ma_period, adjust=False)
+        df["DEMA"] = 2*ema1 - ema2
         df["TEMA"] = 3*(ema1 - ema2) + ema3
-        df["VIDYA"] = df["close"].ewm(span=self.ma_period, adjust=False).mean()
+        df["VIDYA"] = self.ewm("VIDYA", df["close"], source="close", span=self.ma_period, adjust=False)
 
         # === MACD ===
-        ema_fast = df["close"].ewm(span=self.fast_period, adjust=False).mean()
-        ema_slow = df["close"].ewm(span=self.slow_period, adjust=False).mean()
+        ema_fast = self.ewm("ema_fast", df["close"], source="close", span=self.fast_period, adjust=False)
+        ema_slow = self.ewm("ema_slow", df["close"], source="close", span=self.slow_period, adjust=False)
         df["MACD"] = ema_fast - ema_slow
-        df["Signal"] = df["MACD"].ewm(span=self.signal_period, adjust=False).mean()
+        df["Signal"] = self.ewm("Signal", df["MACD"], source=f"macd({self.fast_period},{self.slow_period})",
+                                span=self.signal_period, adjust=False)
         df["Histogram"] = df["MACD"] - df["Signal"]
 
         # === رنگ‌بندی Histogram / MACD ===
@@ -65,8 +70,7 @@ class MACDIndicator(BaseIndicator):
 
         # === رنگ کندل برای رسم چارت ===
         conditions = [df["long_entry"], df["short_entry"]]
-        choices = ["BrightBlue", "BrightMagenta"]
-        df["candleColor"] = np.select(conditions, choices, default="Neutral")
+        df["candleColor"] = choose(conditions, CANDLE_COLOR, df.index)
 
         # === ستون‌های ذخیره در DB ===
         return df[[
@@ -81,3 +85,81 @@ class MACDIndicator(BaseIndicator):
             "isAboveMA", "isBelowMA",
             "candleColor"
         ]]
+
+    # === نسخه‌ی زنده (O(1) برای هر کندل) ===
+    def update(self, bar: dict) -> dict:
+        if self._stream is None:
+            self._stream = {
+                "EMA": OnlineEWM(span=self.ma_period),
+                "SMA": RollingMean(self.ma_period),
+                "RMA": OnlineEWM(alpha=1/self.ma_period),
+                "WMA": RollingWMA(self.ma_period),
+                "EMA2": OnlineEWM(span=self.ma_period),
+                "EMA3": OnlineEWM(span=self.ma_period),
+                "VIDYA": OnlineEWM(span=self.ma_period),
+                "fast": OnlineEWM(span=self.fast_period),
+                "slow": OnlineEWM(span=self.slow_period),
+                "Signal": OnlineEWM(span=self.signal_period),
+                "prev_MACD": Previous(),
+                "prev_Signal": Previous(),
+                "prev_long_fast": Previous(),
+                "prev_short_fast": Previous(),
+            }
+        s = self._stream
+
+        close = bar["close"]
+        ema = s["EMA"].update(close)
+        ema2 = s["EMA2"].update(ema)
+        ema3 = s["EMA3"].update(ema2)
+        macd = s["fast"].update(close) - s["slow"].update(close)
+        signal = s["Signal"].update(macd)
+        macd_prev = s["prev_MACD"].update(macd)
+        signal_prev = s["prev_Signal"].update(signal)
+
+        is_bright_blue = macd > macd_prev and macd > 0
+        is_dark_blue = macd < macd_prev and macd > 0
+        is_bright_magenta = macd < macd_prev and macd < 0
+        is_dark_magenta = macd > macd_prev and macd < 0
+
+        long_fast = is_bright_blue or is_dark_magenta
+        short_fast = is_dark_blue or is_bright_magenta
+        prev_long_fast = s["prev_long_fast"].update(long_fast) is True
+        prev_short_fast = s["prev_short_fast"].update(short_fast) is True
+
+        long_entry = long_fast and not prev_long_fast
+        short_entry = short_fast and not prev_short_fast
+
+        if long_entry:
+            color = "BrightBlue"
+        elif short_entry:
+            color = "BrightMagenta"
+        else:
+            color = "Neutral"
+
+        return {
+            "EMA": ema,
+            "SMA": s["SMA"].update(close),
+            "RMA": s["RMA"].update(close),
+            "WMA": s["WMA"].update(close),
+            "DEMA": 2*ema - ema2,
+            "TEMA": 3*(ema - ema2) + ema3,
+            "VIDYA": s["VIDYA"].update(close),
+            "MACD": macd,
+            "Signal": signal,
+            "Histogram": macd - signal,
+            "long_fast": long_fast,
+            "short_fast": short_fast,
+            "long_normal": macd > signal,
+            "short_normal": macd < signal,
+            "long_safe": is_bright_blue,
+            "short_safe": is_dark_blue or is_bright_magenta or is_dark_magenta,
+            "long_crossover": macd > signal and macd_prev <= signal_prev,
+            "short_crossover": macd < signal and macd_prev >= signal_prev,
+            "long_entry": long_entry,
+            "short_entry": short_entry,
+            "long_exit": short_entry,
+            "short_exit": long_entry,
+            "isAboveMA": close > ema,
+            "isBelowMA": close < ema,
+            "candleColor": color,
+        }
@@ -1,8 +1,13 @@
 import pandas as pd
 import numpy as np
 from indicators.base_indicator import BaseIndicator
+from indicators.kernels import supertrend_scan
+from indicators import rolling
+from indicators.online import OnlineEWM, RollingMean, RollingSum, RollingWMA, RollingExtremum, Previous, isnan
 
 class RSIIndicator(BaseIndicator):
+    name = "rsi"
+
     def __init__(self, symbol, timeframe, params):
         super().__init__(symbol, timeframe, params)
         
@@ -16,34 +21,20 @@ class RSIIndicator(BaseIndicator):
         self.ma_lengths = params.get("ma_lengths", {"SMA":14,"EMA":14,"RMA":14,"WMA":14,"HMA":14,"VWMA":14})
 
     # تابع محاسبه MA روی سری
-    def calculate_ma(self, series: pd.Series, length: int, ma_type: str, df=None):
+    def calculate_ma(self, series: pd.Series, length: int, ma_type: str, df=None, key=None):
+        key = key or f"MA_{ma_type}"
         if ma_type == "SMA":
-            return series.rolling(length).mean()
+            return rolling.sma(series, length)
         elif ma_type == "EMA":
-            return series.ewm(span=length, adjust=False).mean()
+            return self.ewm(key, series, span=length, adjust=False)
         elif ma_type == "RMA":
-            return series.ewm(alpha=1/length, adjust=False).mean()
+            return self.ewm(key, series, alpha=1/length, adjust=False)
         elif ma_type == "WMA":
-            return series.rolling(length).apply(
-                lambda x: np.dot(x, np.arange(1, length+1))/np.arange(1, length+1).sum(),
-                raw=True
-            )
+            return rolling.wma(series, length)
         elif ma_type == "HMA":
-            half = int(length/2)
-            wma1 = series.rolling(half).apply(
-                lambda x: np.dot(x, np.arange(1, len(x)+1))/np.arange(1, len(x)+1).sum(),
-                raw=True
-            )
-            wma2 = series.rolling(length).apply(
-                lambda x: np.dot(x, np.arange(1, len(x)+1))/np.arange(1, len(x)+1).sum(),
-                raw=True
-            )
-            return (2*wma1 - wma2).rolling(int(np.sqrt(length))).apply(
-                lambda x: np.dot(x, np.arange(1, len(x)+1))/np.arange(1, len(x)+1).sum(),
-                raw=True
-            )
+            return rolling.hma(series, length)
         elif ma_type == "VWMA" and df is not None:
-            return (series * df['volume']).rolling(length).sum() / df['volume'].rolling(length).sum()
+            return rolling.vwma(series, df['volume'], length)
         else:
             return series
 
@@ -60,7 +51,7 @@ class RSIIndicator(BaseIndicator):
         ], axis=1).max(axis=1)
 
         # RMA = EMA با alpha = 1/length
-        return true_range.ewm(alpha=1/length, adjust=False).mean()
+        return self.ewm("ATR_RSI", true_range, alpha=1/length, adjust=False)
 
     # محاسبه سوپرترند روی RSI
     def calculate_supertrend(self, factor: float, atr_length: int, rsi: pd.Series):
@@ -69,66 +60,75 @@ class RSIIndicator(BaseIndicator):
         upper_band = rsi + factor * atr
         lower_band = rsi - factor * atr
 
-        supertrend = pd.Series(index=rsi.index, dtype=float)
-        trend_dir = pd.Series(index=rsi.index, dtype=int)
-
-        # مقدار اولیه
-        trend_dir.iloc[0] = 1
-        supertrend.iloc[0] = lower_band.iloc[0]
-
-        # پیمایش
-        for i in range(1, len(rsi)):
-            if pd.isna(atr.iloc[i-1]):
-                trend_dir.iloc[i] = 1
-                supertrend.iloc[i] = lower_band.iloc[i]
-                continue
-
-            prev_st = supertrend.iloc[i-1]
-            prev_up = upper_band.iloc[i-1]
-            prev_lo = lower_band.iloc[i-1]
-
-            if prev_st == prev_up:
-                # اگر سوپرترند قبلی روی upperBand بوده
-                trend_dir.iloc[i] = 1 if rsi.iloc[i] >= upper_band.iloc[i] else -1
-            else:
-                # در غیر این صورت
-                trend_dir.iloc[i] = -1 if rsi.iloc[i] <= lower_band.iloc[i] else 1
-
-            # نگاشت باند درست
-            if trend_dir.iloc[i] == 1:
-                supertrend.iloc[i] = lower_band.iloc[i]
-            else:
-                supertrend.iloc[i] = upper_band.iloc[i]
+        source = rsi.to_numpy(dtype=float)
+        upper = upper_band.to_numpy(dtype=float)
+        lower = lower_band.to_numpy(dtype=float)
+        supertrend = np.full(len(source), np.nan)
+        trend_dir = np.full(len(source), np.nan)
+
+        # مقدار اولیه (در حالت افزایشی: مقادیر ردیف‌های زمینه از اجرای قبلی)
+        tail_st = self.restore("RSI_ST")
+        tail_dir = self.restore("RSI_trend")
+        if tail_st is not None and tail_dir is not None:
+            start = self.context
+            supertrend[:start] = tail_st
+            trend_dir[:start] = tail_dir
+        else:
+            start = 1
+            trend_dir[0] = 1
+            supertrend[0] = lower[0]
+
+        # پیمایش (هسته‌ی بازگشتی روی آرایه‌ها)
+        supertrend_scan(source, upper, lower, atr.to_numpy(dtype=float), trend_dir, supertrend, start)
+
+        supertrend = pd.Series(supertrend, index=rsi.index)
+        trend_dir = pd.Series(trend_dir, index=rsi.index)
+
+        self.remember("RSI_ST", supertrend)
+        self.remember("RSI_trend", trend_dir)
 
         trend_dir = trend_dir.fillna(1).astype(int)
         supertrend = supertrend.fillna(method='bfill').fillna(method='ffill')
 
         return supertrend, trend_dir
 
+    @staticmethod
+    def supertrend_step(prev_st, prev_up, rsi, upper, lower):
+        if prev_st == prev_up:
+            # اگر سوپرترند قبلی روی upperBand بوده
+            direction = 1 if rsi >= upper else -1
+        else:
+            # در غیر این صورت
+            direction = -1 if rsi <= lower else 1
+
+        # نگاشت باند درست
+        return direction, (lower if direction == 1 else upper)
+
     # محاسبه اصلی
     def calculate(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
+        # ورودی فقط‌خواندنی است؛ ستون‌ها به یک نمای سطحی (بدون کپی داده‌ها) اضافه می‌شوند
+        df = df.copy(deep=False)
 
         # محاسبه RSI
-        delta = df[self.source].diff()
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
+        features = self.feature_store(df)
+        gain = features.gain(self.source)
+        loss = features.loss(self.source)
 
-        avg_gain = gain.ewm(alpha=1/self.rsi_length, adjust=False).mean()
-        avg_loss = loss.ewm(alpha=1/self.rsi_length, adjust=False).mean()
+        avg_gain = self.ewm("avg_gain", gain, source=f"gain({self.source})", alpha=1/self.rsi_length, adjust=False)
+        avg_loss = self.ewm("avg_loss", loss, source=f"loss({self.source})", alpha=1/self.rsi_length, adjust=False)
         rs = avg_gain / avg_loss.replace(0, np.nan)
 
         rsi = 100 - 100/(1 + rs)
         rsi.fillna(50, inplace=True)
 
         if self.smooth_rsi:
-            rsi = rsi.ewm(span=self.smooth_length, adjust=False).mean()
+            rsi = self.ewm("RSI_smooth", rsi, span=self.smooth_length, adjust=False)
 
         df['RSI'] = rsi
 
         # MAهای مختلف روی RSI
         for ma_type, length in self.ma_lengths.items():
-            df[f'RSI_MA_{ma_type}'] = self.calculate_ma(df['RSI'], length, ma_type, df)
+            df[f'RSI_MA_{ma_type}'] = self.calculate_ma(df['RSI'], length, ma_type, df, key=f'RSI_MA_{ma_type}')
 
         # سوپرترند روی RSI
         df['RSI_ST'], df['RSI_trend'] = self.calculate_supertrend(
@@ -146,3 +146,82 @@ class RSIIndicator(BaseIndicator):
         cols = ['time', 'RSI', 'RSI_ST', 'RSI_trend', 'long_entry', 'short_entry', 'long_exit', 'short_exit']
         ma_cols = [f'RSI_MA_{ma}' for ma in self.ma_lengths.keys()]
         return df[cols + ma_cols]
+
+    # === نسخه‌ی زنده (O(1) برای هر کندل) ===
+    def _online_ma(self, length: int, ma_type: str):
+        if ma_type == "SMA":
+            return RollingMean(length).update
+        elif ma_type == "EMA":
+            return OnlineEWM(span=length).update
+        elif ma_type == "RMA":
+            return OnlineEWM(alpha=1/length).update
+        elif ma_type == "WMA":
+            return RollingWMA(length).update
+        elif ma_type == "HMA":
+            wma1, wma2 = RollingWMA(int(length/2)), RollingWMA(length)
+            hma = RollingWMA(int(np.sqrt(length)))
+            return lambda x: hma.update(2*wma1.update(x) - wma2.update(x))
+        return lambda x: x
+
+    def update(self, bar: dict) -> dict:
+        if self._stream is None:
+            self._stream = {
+                "avg_gain": OnlineEWM(alpha=1/self.rsi_length),
+                "avg_loss": OnlineEWM(alpha=1/self.rsi_length),
+                "smooth": OnlineEWM(span=self.smooth_length),
+                "ma": {ma: self._online_ma(length, ma) for ma, length in self.ma_lengths.items() if ma != "VWMA"},
+                "vwma": (RollingSum(self.ma_lengths["VWMA"]), RollingSum(self.ma_lengths["VWMA"]))
+                        if "VWMA" in self.ma_lengths else None,
+                "highest": RollingExtremum(self.atr_length, "max"),
+                "lowest": RollingExtremum(self.atr_length, "min"),
+                "atr": OnlineEWM(alpha=1/self.atr_length),
+                "prev_source": Previous(),
+                "prev_rsi": Previous(),
+                "prev_atr": Previous(),
+                "prev_bands": Previous(),
+                "prev_st": Previous(),
+            }
+        s = self._stream
+
+        # RSI
+        delta = bar[self.source] - s["prev_source"].update(bar[self.source])
+        avg_gain = s["avg_gain"].update(max(delta, 0) if not isnan(delta) else delta)
+        avg_loss = s["avg_loss"].update(-min(delta, 0) if not isnan(delta) else delta)
+        rs = avg_gain / avg_loss if avg_loss != 0 and not isnan(avg_loss) else float("nan")
+        rsi = 100 - 100/(1 + rs)
+        if isnan(rsi):
+            rsi = 50.0
+        if self.smooth_rsi:
+            rsi = s["smooth"].update(rsi)
+
+        values = {'RSI': rsi}
+        for ma_type, update in s["ma"].items():
+            values[f'RSI_MA_{ma_type}'] = update(rsi)
+        if s["vwma"] is not None:
+            num, den = s["vwma"]
+            values['RSI_MA_VWMA'] = num.update(rsi * bar['volume']) / den.update(bar['volume'])
+
+        # سوپرترند روی RSI
+        prev_rsi = s["prev_rsi"].update(rsi)
+        hh = s["highest"].update(rsi)
+        ll = s["lowest"].update(rsi)
+        ranges = [r for r in (hh - ll, abs(hh - prev_rsi), abs(ll - prev_rsi)) if not isnan(r)]
+        atr = s["atr"].update(max(ranges) if ranges else float("nan"))
+        upper = rsi + self.trend_factor * atr
+        lower = rsi - self.trend_factor * atr
+
+        prev_atr = s["prev_atr"].update(atr)
+        prev_bands = s["prev_bands"].update((upper, lower))
+        if not isinstance(prev_bands, tuple) or isnan(prev_atr):
+            direction, st = 1, lower
+        else:
+            direction, st = self.supertrend_step(s["prev_st"].value, prev_bands[0], rsi, upper, lower)
+        prev_st = s["prev_st"].update(st)
+
+        values['RSI_ST'] = st
+        values['RSI_trend'] = direction
+        values['long_entry'] = rsi > st and prev_rsi <= prev_st
+        values['short_entry'] = rsi < st and prev_rsi >= prev_st
+        values['long_exit'] = values['short_entry']
+        values['short_exit'] = values['long_entry']
+        return values
@@ -0,0 +1,78 @@
+# indicators/kernels.py
+
+"""
+هسته‌های بازگشتی (path-dependent) اندیکاتورها روی آرایه‌های numpy.
+
+حلقه‌هایی که هر مقدار به مقدار قبلی وابسته است (سوپرترند، trailing stop، ...)
+برداری نمی‌شوند؛ با دکوراتور kernel اگر numba نصب باشد کامپایل می‌شوند و در
+غیر این صورت روی لیست‌های پایتون (به‌جای iloc روی pandas) اجرا می‌شوند.
+
+قرارداد هسته‌ها: فقط آرایه‌ها و اعداد می‌گیرند و خروجی را درجا در آرایه‌های
+خروجی (که فراخواننده با np.full می‌سازد و در kernel(outputs=...) نام برده می‌شوند)
+می‌نویسند؛ آرایه‌های ورودی تغییر داده نمی‌شوند.
+"""
+
+import functools
+import inspect
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def kernel(outputs: tuple = ()):
+    """
+    کامپایل هسته با numba (در صورت وجود)؛ در غیر این صورت آرایه‌ها به لیست تبدیل،
+    هسته اجرا و فقط لیست‌های آرگومان‌های outputs دوباره در آرایه‌هایشان نوشته می‌شوند
+    (ورودی‌ها، حتی اگر قابل نوشتن باشند، دست نمی‌خورند).
+
+    :param outputs: نام آرگومان‌هایی که هسته درجا در آن‌ها می‌نویسد
+    """
+    def decorate(func):
+        if njit is not None:
+            return njit(cache=True, nogil=True)(func)
+
+        params = list(inspect.signature(func).parameters)
+        positions = [params.index(name) for name in outputs]
+
+        @functools.wraps(func)
+        def run(*args):
+            lists = [arg.tolist() if isinstance(arg, np.ndarray) else arg for arg in args]
+            result = func(*lists)
+            for i in positions:
+                args[i][:] = lists[i]
+            return result
+
+        return run
+
+    return decorate
+
+
+@kernel(outputs=("trend", "band"))
+def supertrend_scan(source, upper, lower, atr, trend, band, start):
+    """
+    سوپرترند روی source (مثلاً RSI) از اندیس start به بعد.
+
+    trend و band خروجی‌اند و مقادیر قبل از start (مقدار اولیه یا ردیف‌های زمینه‌ی
+    اجرای قبلی) باید از قبل پر شده باشند. اگر atr کندل قبلی NaN باشد روند 1 و
+    باند پایین انتخاب می‌شود.
+    """
+    for i in range(start, len(source)):
+        if atr[i - 1] != atr[i - 1]:
+            trend[i] = 1
+            band[i] = lower[i]
+            continue
+
+        if band[i - 1] == upper[i - 1]:
+            # اگر سوپرترند قبلی روی upperBand بوده
+            direction = 1 if source[i] >= upper[i] else -1
+        else:
+            # در غیر این صورت
+            direction = -1 if source[i] <= lower[i] else 1
+
+        # نگاشت باند درست
+        trend[i] = direction
+        band[i] = lower[i] if direction == 1 else upper[i]
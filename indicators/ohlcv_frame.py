@@ -0,0 +1,60 @@
+# indicators/ohlcv_frame.py
+
+import numpy as np
+import pandas as pd
+
+from database.db_operations import get_ohlcv_version, OHLCV_COLUMNS
+from database.column_cache import read_ohlcv
+
+# حداکثر کندل‌هایی که یک محاسبه‌ی کامل (اندیکاتورها و پرایس اکشن) می‌خواند
+FULL_HISTORY_LIMIT = 10100
+
+
+def read_only_frame(columns: dict) -> pd.DataFrame:
+    """
+    دیتافریم روی همان آرایه‌ها (بدون کپی) که فقط‌خواندنی علامت خورده‌اند.
+
+    قرارداد مصرف‌کننده‌ها (اندیکاتورها، پرایس اکشن): ورودی تغییر داده نمی‌شود؛
+    ستون‌های خروجی روی df.copy(deep=False) یا دیتافریم جدید ساخته می‌شوند. هر
+    نوشتن درجا در این آرایه‌ها ValueError می‌دهد.
+    """
+    arrays = {}
+    for name, values in columns.items():
+        values = values.view()
+        values.setflags(write=False)
+        arrays[name] = values
+    return pd.DataFrame(arrays, copy=False)
+
+
+class OHLCVFrame:
+    """
+    کندل‌های یک (نماد، تایم‌فریم) که یک بار (از کش ستونی یا SQLite) خوانده و بین همه‌ی مراحل
+    یک کار (اندیکاتورها، پرایس اکشن) مشترک می‌شوند.
+
+    version نسخه‌ی OHLCV پیش از خواندن داده‌هاست (هر مرحله همان را در حالتش ذخیره
+    می‌کند تا تغییرات حین اجرا در اجرای بعدی دیده شوند). داده‌ها با اولین tail خوانده
+    می‌شوند، حداقل prefetch کندل تا درخواست‌های کوچک‌تر بعدی از همان داده جواب داده شوند.
+    """
+
+    def __init__(self, symbol: str, timeframe: str, prefetch: int = FULL_HISTORY_LIMIT):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.prefetch = prefetch
+        self.version = get_ohlcv_version(symbol)
+        self._columns = None
+        self._requested = 0
+
+    def tail(self, limit: int = FULL_HISTORY_LIMIT) -> pd.DataFrame:
+        """
+        آخرین limit کندل با ایندکس از صفر، مثل fetch_recent_data؛ فقط‌خواندنی
+        (read_only_frame) و بدون کپی از آرایه‌های مشترک همه‌ی مراحل.
+        """
+        # اگر ردیف‌های کمتری از درخواست قبلی برگشته، جدول بیشتر از این ندارد
+        if self._columns is None or limit > self._requested:
+            self._requested = max(limit, self.prefetch)
+            # از کش ستونی (نمای memmap بدون کپی)؛ بدون کش از SQLite
+            df = read_ohlcv(self.symbol, self.timeframe, limit=self._requested, columns=OHLCV_COLUMNS)
+            self._columns = {name: np.asarray(df[name].to_numpy()) for name in df.columns}
+
+        return read_only_frame({name: values[-limit:] if limit else values[:0]
+                                for name, values in self._columns.items()})
@@ -0,0 +1,145 @@
+# indicators/online.py
+
+"""
+ابزارهای محاسبه‌ی آنلاین (هر به‌روزرسانی O(1) یا در حد طول پنجره) برای نسخه‌ی
+زنده‌ی اندیکاتورها.
+
+فرمول‌ها عیناً مطابق پیاده‌سازی دسته‌ای (pandas و indicators/rolling) هستند تا خروجی زنده با خروجی
+محاسبه‌ی دسته‌ای یکی باشد.
+"""
+
+import math
+from collections import deque
+
+NaN = float("nan")
+
+
+def isnan(x) -> bool:
+    return x is None or x != x
+
+
+class OnlineEWM:
+    """
+    معادل series.ewm(span=..|alpha=.., adjust=False).mean()
+    """
+
+    def __init__(self, span=None, alpha=None):
+        if span is not None:
+            com = (span - 1) / 2.0
+        elif alpha is not None:
+            com = (1 - alpha) / alpha
+        else:
+            raise ValueError("span or alpha is required")
+        self.alpha = 1.0 / (1.0 + com)
+        self.value = NaN
+        self._old_wt = 1.0
+
+    def update(self, x: float) -> float:
+        if isnan(self.value):
+            if not isnan(x):
+                self.value = x
+                self._old_wt = 1.0
+            return self.value
+
+        self._old_wt *= 1.0 - self.alpha
+        if not isnan(x):
+            if self.value != x:
+                self.value = (self._old_wt * self.value + self.alpha * x) / (self._old_wt + self.alpha)
+            self._old_wt = 1.0
+        return self.value
+
+
+class RollingMean:
+    """
+    معادل rolling.sma (و series.rolling(n).mean())؛ اگر پنجره NaN داشته باشد خروجی NaN است.
+
+    جمع پنجره هر بار از مقادیر خود پنجره و به همان ترتیب rolling._window_sum ساخته
+    می‌شود (O(n) برای پنجره‌های کوچک اندیکاتورها) تا خروجی زنده با محاسبه‌ی دسته‌ای
+    بیت‌به‌بیت یکی باشد؛ جمع جاری (total += x - old) خطای گرد کردن را انباشته می‌کند.
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.window = deque(maxlen=n)
+
+    def total(self) -> float:
+        total = NaN
+        for i, x in enumerate(self.window):
+            total = x if i == 0 else total + x
+        return total
+
+    def update(self, x: float) -> float:
+        self.window.append(NaN if x is None else x)
+        if len(self.window) < self.n:
+            return NaN
+        return self.total() / self.n
+
+
+class RollingSum(RollingMean):
+    def update(self, x: float) -> float:
+        self.window.append(NaN if x is None else x)
+        if len(self.window) < self.n:
+            return NaN
+        return self.total()
+
+
+class RollingWMA(RollingMean):
+    """
+    میانگین وزنی خطی (وزن 1..n)؛ جمع وزنی پنجره به همان ترتیب rolling.wma.
+    """
+
+    def __init__(self, n: int):
+        super().__init__(n)
+        self.denominator = n * (n + 1) / 2
+
+    def total(self) -> float:
+        total = NaN
+        for i, x in enumerate(self.window):
+            total = x * (i + 1) if i == 0 else total + x * (i + 1)
+        return total
+
+    def update(self, x: float) -> float:
+        self.window.append(NaN if x is None else x)
+        if len(self.window) < self.n:
+            return NaN
+        return self.total() / self.denominator
+
+
+class RollingExtremum:
+    """
+    بیشینه/کمینه‌ی پنجره‌ی n تایی با صف یکنوا (O(1) سرشکن).
+    """
+
+    def __init__(self, n: int, mode: str = "max"):
+        self.n = n
+        self.better = (lambda a, b: a >= b) if mode == "max" else (lambda a, b: a <= b)
+        self.queue = deque()
+        self.index = -1
+        self.last_nan = -math.inf
+
+    def update(self, x: float) -> float:
+        self.index += 1
+        if isnan(x):
+            self.last_nan = self.index
+        else:
+            while self.queue and self.better(x, self.queue[-1][1]):
+                self.queue.pop()
+            self.queue.append((self.index, x))
+        while self.queue and self.queue[0][0] <= self.index - self.n:
+            self.queue.popleft()
+        if self.index < self.n - 1 or self.last_nan > self.index - self.n:
+            return NaN
+        return self.queue[0][1]
+
+
+class Previous:
+    """
+    نگه‌داری مقدار قبلی یک سری (معادل shift(1)).
+    """
+
+    def __init__(self):
+        self.value = NaN
+
+    def update(self, x):
+        prev, self.value = self.value, x
+        return prev
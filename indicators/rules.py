@@ -0,0 +1,121 @@
+# indicators/rules.py
+
+"""
+موتور قوانین برداری برای امتیازدهی و توضیح سیگنال‌ها.
+
+قوانین به‌صورت داده تعریف می‌شوند (لیستی از Rule) و روی کل ستون‌ها با ماسک‌های
+بولی ارزیابی می‌شوند؛ همان لیست روی یک ردیف (دیکشنری مقادیر اسکالر) هم کار می‌کند
+تا حالت دسته‌ای و زنده منطق یکسان داشته باشند.
+
+دلیل‌ها به‌صورت بیت‌ماسک (بیت i = i-امین قانون دارای reason) نگه داشته می‌شوند؛
+بیت‌ماسک خودش کد ستون Categorical است (reason_labels جدول متن همه‌ی ترکیب‌ها) و
+خروجی Caseها هم به‌صورت کد (select_codes) در دسترس است.
+"""
+
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+
+class Rule(NamedTuple):
+    # cols -> ماسک بولی (یا bool برای یک ردیف)؛ مقایسه با NaN مثل حالت ردیفی False است
+    when: Callable
+    score: int = 0
+    reason: str = None
+
+
+class Case(NamedTuple):
+    # اولین Case برقرار مقدار خروجی را تعیین می‌کند (مثل if/elif)
+    when: Callable
+    value: object
+
+
+def _as_mask(value, n: int) -> np.ndarray:
+    return np.broadcast_to(np.asarray(value, dtype=bool), (n,))
+
+
+def _reasons(rules: list) -> list:
+    return [rule.reason for rule in rules if rule.reason is not None]
+
+
+def evaluate(rules: list, cols, n: int):
+    """
+    :param cols: دیکشنری/دیتافریم ستون‌ها (هر ستون به طول n)
+    :return: (امتیاز int64، بیت‌ماسک دلیل‌ها int64)
+    """
+    score = np.zeros(n, dtype=np.int64)
+    reasons = np.zeros(n, dtype=np.int64)
+    bit = 0
+    for rule in rules:
+        mask = _as_mask(rule.when(cols), n)
+        if rule.score:
+            score += mask * rule.score
+        if rule.reason is not None:
+            reasons |= mask.astype(np.int64) << bit
+            bit += 1
+    return score, reasons
+
+
+def _join(reasons: list, code: int, sep: str) -> str:
+    return sep.join(reason for bit, reason in enumerate(reasons) if code >> bit & 1)
+
+
+def reason_labels(rules: list, sep: str = " | ") -> tuple:
+    """
+    متن همه‌ی بیت‌ماسک‌های ممکن (اندیس = بیت‌ماسک)؛ جدول کد ستون دلیل‌ها.
+    """
+    reasons = _reasons(rules)
+    return tuple(_join(reasons, code, sep) for code in range(1 << len(reasons)))
+
+
+def reason_text(rules: list, reasons: np.ndarray, sep: str = " | ") -> np.ndarray:
+    """
+    تبدیل بیت‌ماسک دلیل‌ها به متن (به ترتیب تعریف قوانین)؛ متن هر کد یکتا یک بار ساخته می‌شود.
+    """
+    codes, inverse = np.unique(reasons, return_inverse=True)
+    labels = np.array([_join(_reasons(rules), code, sep) for code in codes], dtype=object)
+    return labels[inverse.reshape(-1)]
+
+
+def case_labels(cases: list, default) -> tuple:
+    """
+    جدول کد select_codes: (default، مقدار Case اول، ...).
+    """
+    return (default, *(case.value for case in cases))
+
+
+def select_codes(cases: list, cols, n: int) -> np.ndarray:
+    """
+    اندیس اولین Case برقرار + 1 (0 = default) برای هر ردیف.
+    """
+    conditions = [_as_mask(case.when(cols), n) for case in cases]
+    return np.select(conditions, np.arange(1, len(cases) + 1, dtype=np.int64), default=0)
+
+
+def select(cases: list, cols, n: int, default) -> np.ndarray:
+    """
+    معادل برداری select_row (خروجی object).
+    """
+    labels = np.array(case_labels(cases, default), dtype=object)
+    return labels[select_codes(cases, cols, n)]
+
+
+def select_row(cases: list, row: dict, default):
+    for case in cases:
+        if case.when(row):
+            return case.value
+    return default
+
+
+def evaluate_row(rules: list, row: dict, sep: str = " | "):
+    """
+    ارزیابی قوانین روی یک ردیف: (امتیاز، متن دلیل‌ها).
+    """
+    score = 0
+    reasons = []
+    for rule in rules:
+        if rule.when(row):
+            score += rule.score
+            if rule.reason is not None:
+                reasons.append(rule.reason)
+    return score, sep.join(reasons)
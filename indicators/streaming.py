@@ -0,0 +1,106 @@
+# indicators/streaming.py
+
+"""
+موتور اندیکاتور زنده: قیمت‌های دریافتی از سوکت را به کندل تبدیل می‌کند و با بسته
+شدن هر کندل، مقادیر همه‌ی اندیکاتورها را با update() (O(1)) محاسبه می‌کند؛
+بدون خواندن/نوشتن SQLite و بدون محاسبه‌ی دوباره‌ی تاریخچه.
+"""
+
+import time
+from datetime import datetime, timezone
+
+from config import TIMEFRAME_MAP, timeframe_to_timedelta
+from indicators.indicator_manager import build_indicators
+
+TIMEFRAME_SECONDS = {
+    name: int(timeframe_to_timedelta(tf).total_seconds()) for tf, name in TIMEFRAME_MAP.items()
+}
+
+
+class CandleBuilder:
+    """
+    ساخت کندل از قیمت‌های لحظه‌ای برای یک تایم‌فریم.
+    """
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.bucket = None
+        self.bar = None
+
+    def update(self, price: float, ts: float):
+        """
+        :return: کندل بسته‌شده‌ی قبلی (در صورت شروع کندل جدید) یا None
+        """
+        bucket = int(ts // self.seconds) * self.seconds
+        closed = None
+
+        if self.bar is not None:
+            if bucket < self.bucket:
+                # قیمت دیررسیده متعلق به کندلی است که قبلاً بسته شده
+                return None
+            if bucket > self.bucket:
+                closed, self.bar = self.bar, None
+
+        if self.bar is None:
+            self.bucket = bucket
+            self.bar = {
+                "time": datetime.fromtimestamp(bucket, tz=timezone.utc).replace(tzinfo=None),
+                "open": price, "high": price, "low": price, "close": price, "volume": 1,
+            }
+        else:
+            bar = self.bar
+            bar["high"] = max(bar["high"], price)
+            bar["low"] = min(bar["low"], price)
+            bar["close"] = price
+            bar["volume"] += 1
+
+        return closed
+
+
+class StreamingIndicatorEngine:
+    """
+    نگه‌داری کندل جاری و حالت اندیکاتورها برای هر (نماد، تایم‌فریم).
+
+    on_price/on_prices لیستی از رویدادهای کندل بسته‌شده برمی‌گردانند:
+    {"symbol", "timeframe", "bar", "values": {indicator_name: {...}}}
+    """
+
+    def __init__(self, timeframes: list = None, indicator_factory=build_indicators):
+        self.timeframes = timeframes or list(TIMEFRAME_SECONDS)
+        self.indicator_factory = indicator_factory
+        self.streams = {}
+
+    def _stream(self, symbol: str, timeframe: str):
+        key = (symbol, timeframe)
+        if key not in self.streams:
+            self.streams[key] = (
+                CandleBuilder(TIMEFRAME_SECONDS[timeframe]),
+                self.indicator_factory(symbol, timeframe),
+            )
+        return self.streams[key]
+
+    def on_price(self, symbol: str, price: float, ts: float = None) -> list:
+        ts = time.time() if ts is None else ts
+        events = []
+        for timeframe in self.timeframes:
+            builder, indicators = self._stream(symbol, timeframe)
+            bar = builder.update(price, ts)
+            if bar is not None:
+                events.append({
+                    "symbol": symbol,
+                    "timeframe": timeframe,
+                    "bar": bar,
+                    "values": {ind.name: ind.update(bar) for ind in indicators},
+                })
+        return events
+
+    def on_prices(self, symbol: str, prices: list, ts: float = None) -> list:
+        ts = time.time() if ts is None else ts
+        events = []
+        for price in prices:
+            events.extend(self.on_price(symbol, price, ts))
+        return events
+
+    def current_bar(self, symbol: str, timeframe: str):
+        builder, _ = self._stream(symbol, timeframe)
+        return builder.bar
@@ -0,0 +1,27 @@
+# mt5_connector/backend.py
+
+"""
+انتخاب ماژول متاتریدر: پکیج واقعی MetaTrader5 یا بازپخش آفلاین (replay_mt5).
+
+    MT5_BACKEND=replay   همیشه بازپخش آفلاین
+    MT5_BACKEND=terminal همیشه پکیج واقعی (در نبود آن خطا)
+
+در حالت پیش‌فرض اگر پکیج MetaTrader5 نصب نباشد (مثلاً لینوکس) بازپخش استفاده می‌شود.
+"""
+
+import os
+
+MT5_BACKEND = os.environ.get("MT5_BACKEND", "").lower()
+
+if MT5_BACKEND == "replay":
+    from mt5_connector import replay_mt5 as mt5
+elif MT5_BACKEND == "terminal":
+    import MetaTrader5 as mt5
+else:
+    try:
+        import MetaTrader5 as mt5
+    except ImportError:
+        from mt5_connector import replay_mt5 as mt5
+        print("⚠️ MetaTrader5 package not available, using offline replay backend")
+
+IS_REPLAY = mt5.__name__.endswith("replay_mt5")
@@ -0,0 +1,88 @@
+# mt5_connector/download_benchmark.py
+
+"""
+بنچمارک دانلودر تاریخی روی بازپخش آفلاین متاتریدر (بدون ترمینال).
+
+    python -m mt5_connector.download_benchmark --symbols 20 --candles 5000 --latency 20
+
+داده‌ها در یک پوشه‌ی موقت نوشته می‌شوند (دیتابیس‌های پروژه دست نمی‌خورند).
+سه اجرا مقایسه می‌شوند: ترتیبی، pipelined و اجرای افزایشی بعد از جلو رفتن ساعت بازپخش.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+
+# پیش از import ماژول‌های پروژه: همیشه بازپخش آفلاین
+os.environ["MT5_BACKEND"] = "replay"
+
+from mt5_connector import replay_mt5  # noqa: E402
+from config import SUPPORTED_TIMEFRAMES  # noqa: E402
+import database.db_operations as db  # noqa: E402
+from mt5_connector.historical_fetcher import download_historical_data  # noqa: E402
+
+
+def _prepare(symbols: list, candles: int, advance_hours: int, end: int):
+    for i, symbol in enumerate(symbols):
+        for timeframe in SUPPORTED_TIMEFRAMES:
+            count = candles + advance_hours * 3600 // replay_mt5.TIMEFRAME_SECONDS[timeframe]
+            replay_mt5.load_rates(symbol, timeframe, replay_mt5.synthetic_rates(timeframe, count, end=end, seed=i))
+
+
+def _run(symbols: list, candles: int, pipelined: bool) -> dict:
+    with contextlib.redirect_stdout(io.StringIO()):
+        # refresh_interval=0: ساعت بازپخش مستقل از ساعت واقعی جلو می‌رود
+        return download_historical_data(symbols, count=candles, pipelined=pipelined, refresh_interval=0)
+
+
+def run_benchmark(symbols: int, candles: int, latency_ms: float, advance_hours: int) -> list:
+    end = 1_700_000_000
+    advanced = end + advance_hours * 3600
+
+    # هر اجرا نمادهای جدا دارد تا از صفر شروع کند
+    groups = {label: [f"{label.upper()}{i}" for i in range(symbols)] for label in ("seq", "pipe")}
+    replay_mt5.reset()
+    for names in groups.values():
+        _prepare(names, candles, advance_hours, advanced)
+    replay_mt5.initialize()
+    replay_mt5.latency = latency_ms / 1000
+
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs(db.DB_DIR, exist_ok=True)
+        try:
+            replay_mt5.set_clock(end)
+            results.append(("sequential", _run(groups["seq"], candles, pipelined=False)))
+            results.append(("pipelined", _run(groups["pipe"], candles, pipelined=True)))
+
+            # ساعت بازپخش جلو می‌رود؛ فقط کندل‌های جدید دانلود می‌شوند
+            replay_mt5.set_clock(advanced)
+            results.append(("incremental", _run(groups["pipe"], candles, pipelined=True)))
+        finally:
+            db.close_connections()
+            os.chdir(cwd)
+            replay_mt5.latency = 0.0
+            replay_mt5.set_clock(None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historical downloader benchmark on the offline MT5 replay")
+    parser.add_argument("--symbols", type=int, default=10)
+    parser.add_argument("--candles", type=int, default=5000, help="candles per symbol and timeframe")
+    parser.add_argument("--latency", type=float, default=10.0, help="simulated terminal latency per call (ms)")
+    parser.add_argument("--advance", type=int, default=24, help="hours to advance the replay clock for the incremental run")
+    args = parser.parse_args()
+
+    for label, stats in run_benchmark(args.symbols, args.candles, args.latency, args.advance):
+        rate = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        print(f"📊 {label:<11} {stats['rows']:>9,} rows in {stats['seconds']:6.2f}s — {rate:>10,.0f} rows/s "
+              f"({stats['requests']} requests, fetch {stats['fetch_seconds']:.2f}s, write {stats['write_seconds']:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
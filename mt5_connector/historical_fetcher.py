@@ -1,22 +1,45 @@
-import MetaTrader5 as mt5
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
 import pandas as pd
 
+from mt5_connector.backend import mt5
 from database.db_operations import (
     insert_ohlcv_data,
     initialize_symbol_db,
-    get_db_path
+    get_db_path,
+    get_last_ohlcv_time,
+    find_time_gaps,
+    get_metadata,
+    update_symbol_metadata
 )
-from database.symbols_meta import register_symbol
+from database.ohlcv_resampler import resample_symbol, TIMEFRAME_SECONDS
+from database.symbols_meta import register_symbol, initialize_central_db, get_db_path_for_symbol
 
 from config import (
     MT5_LOGIN,
     MT5_PASSWORD,
     MT5_SERVER,
     HIST_CANDLES,
+    RESAMPLE_FROM_M1,
     SUPPORTED_TIMEFRAMES,
-    TIMEFRAME_MAP
+    TIMEFRAME_MAP,
+    timeframe_to_timedelta
 )
 
+# حداکثر کندل در هر فراخوانی copy_rates_from_pos
+DOWNLOAD_BATCH = 5000
+# حاشیه‌ی اختلاف ساعت سرور با UTC در تخمین کندل‌های جاافتاده (ثانیه)
+SERVER_TIME_MARGIN = 86400
+# حداکثر نتایج دانلودشده‌ای که منتظر نوشتن در دیتابیس می‌مانند
+PIPELINE_DEPTH = 8
+
+_DONE = object()
+
 
 def connect_mt5():
     if not mt5.initialize(login=MT5_LOGIN, server=MT5_SERVER, password=MT5_PASSWORD):
@@ -37,41 +60,262 @@ def get_crypto_symbols():
     return [s.name for s in symbols if s.path and 'crypto' in s.path.lower()]
 
 
-def download_historical_data(symbols: list[str]):
+def fetch_missing_rates(symbol: str, timeframe: int, count: int = HIST_CANDLES, batch_size: int = DOWNLOAD_BATCH):
+    """
+    دریافت فقط کندل‌های جدیدتر از آخرین زمان ذخیره‌شده (حداکثر count کندل).
+
+    دسته‌ها از جدیدترین کندل (pos=0) به عقب خوانده می‌شوند تا به آخرین کندل
+    موجود در دیتابیس برسند؛ خروجی از قدیم به جدید مرتب است.
+    """
+    tf_str = TIMEFRAME_MAP.get(timeframe, str(timeframe))
+    last_time = get_last_ohlcv_time(symbol, tf_str)
+    last_ts = int(pd.Timestamp(last_time).timestamp()) if last_time else None
+
+    # تخمین تعداد کندل‌های جاافتاده برای اندازه‌ی اولین دسته؛ حاشیه‌ی یک‌روزه اختلاف
+    # ساعت سرور بروکر با UTC را پوشش می‌دهد تا معمولاً یک فراخوانی کافی باشد
+    size = batch_size
+    if last_ts is not None:
+        seconds = timeframe_to_timedelta(timeframe).total_seconds()
+        size = max(1, int((time.time() + SERVER_TIME_MARGIN - last_ts) // seconds) + 1)
+
+    batches, fetched = [], 0
+    while fetched < count:
+        size = min(size, batch_size, count - fetched)
+        rates = mt5.copy_rates_from_pos(symbol, timeframe, fetched, size)
+        if rates is None or len(rates) == 0:
+            break
+        batches.append(rates)
+        fetched += len(rates)
+        if len(rates) < size or (last_ts is not None and rates['time'][0] <= last_ts):
+            break
+        size = batch_size
+
+    if not batches:
+        return None
+
+    rates = np.concatenate(batches[::-1])
+    if last_ts is not None:
+        rates = rates[rates['time'] > last_ts]
+    return rates
+
+
+# ------------------------ برنامه‌ریزی بک‌فیل ------------------------
+
+def _checkpoint_key(tf_str: str) -> str:
+    return f"backfill_{tf_str}"
+
+
+def _to_ts(value: str) -> int:
+    return int(pd.Timestamp(value).timestamp())
+
+
+def _to_utc(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def plan_backfill(symbol: str, timeframe: int, count: int = HIST_CANDLES, refresh_interval: float = None) -> dict:
+    """
+    برنامه‌ی حداقلی دریافت برای یک (نماد، تایم‌فریم).
+
+    - جدول خالی: آخرین count کندل (copy_rates_from_pos)
+    - فاصله‌های داخلی بعد از checkpoint قبلی: یک copy_rates_range برای هر فاصله
+    - انتهای جدول: از آخرین کندل (که ممکن است هنگام ذخیره ناتمام بوده باشد) تا
+      اکنون، مگر اینکه کمتر از refresh_interval ثانیه (پیش‌فرض یک کندل) از
+      درخواست قبلی گذشته باشد
+
+    :return: {"initial": تعداد, "gaps": [(from_ts, to_ts), ...], "tail": (from_ts, to_ts) یا None,
+              "checkpoint": {...}}
+    """
+    tf_str = TIMEFRAME_MAP.get(timeframe, str(timeframe))
+    step = int(timeframe_to_timedelta(timeframe).total_seconds())
+    refresh_interval = step if refresh_interval is None else refresh_interval
+    now = time.time()
+
+    raw = get_metadata(symbol, _checkpoint_key(tf_str))
+    checkpoint = json.loads(raw) if raw else {}
+    last_time = get_last_ohlcv_time(symbol, tf_str)
+
+    plan = {"initial": 0, "gaps": [], "tail": None,
+            "checkpoint": {"gaps_checked": last_time, "tail_requested": now}}
+    if last_time is None:
+        plan["initial"] = count
+        return plan
+
+    # فاصله‌های قبل از checkpoint قبلاً درخواست شده‌اند (مثلاً تعطیلی بازار) و دوباره بررسی نمی‌شوند
+    for prev, nxt in find_time_gaps(symbol, tf_str, step, after=checkpoint.get("gaps_checked")):
+        plan["gaps"].append((_to_ts(prev) + step, _to_ts(nxt) - step))
+
+    if now - checkpoint.get("tail_requested", 0) >= refresh_interval:
+        plan["tail"] = (_to_ts(last_time), now + SERVER_TIME_MARGIN)
+    else:
+        plan["checkpoint"]["tail_requested"] = checkpoint["tail_requested"]
+
+    return plan
+
+
+def fetch_backfill(symbol: str, timeframe: int, plan: dict, batch_size: int = DOWNLOAD_BATCH):
+    """
+    اجرای برنامه‌ی plan_backfill؛ خروجی از قدیم به جدید مرتب است.
+
+    اگر یکی از درخواست‌ها خطا بدهد checkpoint برنامه None می‌شود تا آن بازه در
+    اجرای بعدی دوباره درخواست شود.
+    """
+    batches = []
+    if plan["initial"]:
+        rates = fetch_missing_rates(symbol, timeframe, plan["initial"], batch_size)
+        if rates is None:
+            plan["checkpoint"] = None
+        else:
+            batches.append(rates)
+
+    for start, end in plan["gaps"] + ([plan["tail"]] if plan["tail"] else []):
+        rates = mt5.copy_rates_range(symbol, timeframe, _to_utc(start), _to_utc(end))
+        if rates is None:
+            plan["checkpoint"] = None
+        elif len(rates):
+            batches.append(rates)
+
+    if not batches:
+        return None
+    rates = np.concatenate(batches)
+    rates = rates[np.argsort(rates['time'], kind='stable')]
+
+    # هر چه تا جدیدترین کندل دریافتی از سرور گرفته شد کامل است
+    if plan["checkpoint"] is not None and len(rates):
+        newest = pd.Timestamp(int(rates['time'][-1]), unit='s').strftime('%Y-%m-%d %H:%M:%S')
+        plan["checkpoint"]["gaps_checked"] = max(filter(None, [plan["checkpoint"]["gaps_checked"], newest]))
+    return rates
+
+
+def _store_rates(symbol: str, tf_str: str, rates, checkpoint: dict) -> int:
+    rows = 0
+    if rates is None or len(rates) == 0:
+        print(f"⚪️ No new candles for {symbol} [{tf_str}]")
+    else:
+        df = pd.DataFrame(rates)
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+
+        print(f"📝 Inserting {len(df)} rows into DB for {symbol} [{tf_str}]")
+        insert_ohlcv_data(df, symbol, tf_str, replace=True)
+        rows = len(df)
+
+    if checkpoint is not None:
+        update_symbol_metadata(symbol, _checkpoint_key(tf_str), json.dumps(checkpoint))
+    return rows
+
+
+def _produce(symbols: list, timeframes: list, count: int, batch_size: int, out, stats: dict,
+             refresh_interval: float = None):
+    """
+    تولیدکننده: همه‌ی فراخوانی‌های متاتریدر در این ترد انجام می‌شوند.
+    """
+    try:
+        for symbol in symbols:
+            selected = False
+            for timeframe in timeframes:
+                tf_str = TIMEFRAME_MAP.get(timeframe, str(timeframe))
+                plan = plan_backfill(symbol, timeframe, count, refresh_interval)
+                requests = bool(plan["initial"]) + len(plan["gaps"]) + bool(plan["tail"])
+                if not requests:
+                    print(f"⚪️ {symbol} [{tf_str}] already up to date")
+                    continue
+
+                # انتخاب نماد فقط یک بار و فقط وقتی واقعاً چیزی برای دریافت هست
+                if not selected:
+                    if not mt5.symbol_select(symbol, True):
+                        print(f"❌ Cannot select symbol: {symbol}")
+                        break
+                    selected = True
+
+                print(f"📥 Fetching {symbol} [{tf_str}]: " + (
+                    f"last {plan['initial']} candles" if plan["initial"]
+                    else f"{'tail + ' if plan['tail'] else ''}{len(plan['gaps'])} gap(s)"
+                ))
+
+                started = time.perf_counter()
+                rates = fetch_backfill(symbol, timeframe, plan, batch_size)
+                stats["fetch_seconds"] += time.perf_counter() - started
+                stats["requests"] += requests
+
+                out.put((symbol, tf_str, rates, plan["checkpoint"]))
+    except Exception as e:
+        stats["error"] = e
+    finally:
+        out.put(_DONE)
+
+
+def download_historical_data(symbols: list[str], timeframes: list = None, count: int = HIST_CANDLES,
+                             batch_size: int = DOWNLOAD_BATCH, pipelined: bool = True,
+                             refresh_interval: float = None, resample: bool = None) -> dict:
     """
     دانلود داده‌های تاریخی برای لیست نمادهای داده‌شده
+
+    برای هر (نماد، تایم‌فریم) فقط کندل‌های جاافتاده دریافت می‌شوند (plan_backfill):
+    جدول خالی ← آخرین count کندل، در غیر این صورت فاصله‌های داخلی و انتهای جدول.
+    در حالت pipelined یک ترد کندل‌ها را از متاتریدر می‌گیرد و هم‌زمان ترد فعلی
+    نتایج قبلی را در SQLite می‌نویسد.
+
+    :param refresh_interval: حداقل فاصله (ثانیه) بین دو درخواست انتهای جدول؛ پیش‌فرض یک کندل
+    :param resample: فقط M1 دانلود و بقیه‌ی تایم‌فریم‌ها از آن ساخته شوند (پیش‌فرض RESAMPLE_FROM_M1)
+    :return: آمار اجرا (rows, requests, resampled, seconds, fetch_seconds, write_seconds)
     """
+    timeframes = timeframes or SUPPORTED_TIMEFRAMES
+    stats = {"rows": 0, "requests": 0, "resampled": 0, "seconds": 0.0, "fetch_seconds": 0.0,
+             "write_seconds": 0.0, "error": None}
+    started = time.perf_counter()
+
+    derived = []
+    resample = RESAMPLE_FROM_M1 if resample is None else resample
+    if resample and mt5.TIMEFRAME_M1 in timeframes:
+        derived = [TIMEFRAME_MAP[tf] for tf in timeframes if tf != mt5.TIMEFRAME_M1]
+        # تاریخچه‌ی M1 باید برای count کندل از بزرگ‌ترین تایم‌فریم کافی باشد
+        count *= max([TIMEFRAME_SECONDS[tf] // TIMEFRAME_SECONDS["M1"] for tf in derived], default=1)
+
+    initialize_central_db()
     for symbol in symbols:
         # ساخت دیتابیس و جدول‌های مرتبط با نماد
-        initialize_symbol_db(symbol)
+        initialize_symbol_db(symbol, [TIMEFRAME_MAP.get(tf, str(tf)) for tf in timeframes])
 
         # ثبت نماد در دیتابیس مرکزی
-        db_path = get_db_path(symbol)
-        register_symbol(symbol, db_path)
-
-        for timeframe in SUPPORTED_TIMEFRAMES:
-            tf_str = TIMEFRAME_MAP.get(timeframe, str(timeframe))
-            print(f"📥 Fetching {HIST_CANDLES} candles for {symbol} [{tf_str}]...")
-
-            if not mt5.symbol_select(symbol, True):
-                print(f"❌ Cannot select symbol: {symbol}")
-                continue
-
-            rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, HIST_CANDLES)
+        if get_db_path_for_symbol(symbol) != get_db_path(symbol):
+            register_symbol(symbol, get_db_path(symbol))
 
-            if rates is None or len(rates) == 0:
-                print(f"⚠️ No data for {symbol} [{tf_str}]")
-                continue
+    # در اجرای ترتیبی (برای مقایسه) همه‌ی دانلودها و سپس نوشتن‌ها در همین ترد انجام می‌شوند
+    results = queue.Queue(maxsize=PIPELINE_DEPTH if pipelined else 0)
+    download = [mt5.TIMEFRAME_M1] if derived else timeframes
+    args = (symbols, download, count, batch_size, results, stats, refresh_interval)
+    if pipelined:
+        producer = threading.Thread(target=_produce, args=args, name="mt5-producer", daemon=True)
+        producer.start()
+    else:
+        _produce(*args)
 
+    # قدیمی‌ترین M1 تغییرکرده‌ی هر نماد (برای ساخت دوباره‌ی کندل‌های بالاتر از آن زمان)
+    changed = {}
+    while (item := results.get()) is not _DONE:
+        write_started = time.perf_counter()
+        stats["rows"] += _store_rates(*item)
+        symbol, tf_str, rates, _ = item
+        if derived and tf_str == "M1" and rates is not None and len(rates):
+            first = int(rates['time'][0])
+            changed[symbol] = min(first, changed.get(symbol, first))
+        stats["write_seconds"] += time.perf_counter() - write_started
 
-            df = pd.DataFrame(rates)
-            df['time'] = pd.to_datetime(df['time'], unit='s')
-            df['time'] = df['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    if pipelined:
+        producer.join()
+    if stats["error"] is not None:
+        raise stats["error"]
 
-            print(f"📝 Inserting {len(df)} rows into DB for {symbol} [{tf_str}]")
-            insert_ohlcv_data(df, symbol, tf_str)
+    for symbol, first in changed.items():
+        write_started = time.perf_counter()
+        since = pd.Timestamp(first, unit='s').strftime('%Y-%m-%d %H:%M:%S')
+        stats["resampled"] += sum(resample_symbol(symbol, derived, since=since).values())
+        stats["write_seconds"] += time.perf_counter() - write_started
 
-    print("✅ All historical data fetched.")
+    stats["seconds"] = time.perf_counter() - started
+    print(f"✅ All historical data fetched: {stats['rows']} rows, {stats['requests']} requests, "
+          f"{stats['resampled']} resampled bars in {stats['seconds']:.2f}s")
+    return stats
 
 
 def download_btcusd():
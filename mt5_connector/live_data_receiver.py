@@ -1,40 +1,129 @@
-import socket 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from indicators.streaming import StreamingIndicatorEngine
+from database.ohlcv_writer import OHLCVWriter
+
+# هر پیام یک خط است: "SYMBOL|p1 p2 p3 ...\n" و سرور برای هر پیام "RECEIVES\n" برمی‌گرداند
+ACK = b"RECEIVES\n"
+MAX_LINE_BYTES = 1024 * 1024
+
 
 class CryptoSocketServer:
-    def __init__(self, address= '0.0.0.0', port=14021):
+    """
+    سرور asyncio برای دریافت قیمت‌ها از EAهای متاتریدر.
+
+    - اتصال‌ها دائمی هستند و هر اتصال می‌تواند چند پیام (خط) پشت سر هم بفرستد.
+    - پردازش پیام‌ها (parse + موتور اندیکاتور) در یک ترد جداگانه انجام می‌شود تا
+      حلقه‌ی accept مسدود نشود؛ ترتیب پیام‌ها حفظ می‌شود.
+    - backpressure: حداکثر max_pending پیام در صف پردازش؛ وقتی صف پر است
+      خواندن از سوکت‌ها متوقف می‌شود و ارسال ack هم با drain کنترل می‌شود.
+    - اگر writer داده شود کندل‌های بسته‌شده به‌صورت دسته‌ای در دیتابیس ذخیره می‌شوند.
+    """
+
+    def __init__(self, address= '0.0.0.0', port=14021, timeframes=None, max_pending=1000, writer: OHLCVWriter = None):
         self.address= address
         self.port= port
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.bind((self.address, self.port))
-        self.sock.listen(5)
-        print(f"Python Socket Server started at {self.address}:{self.port}")
+        self.engine = StreamingIndicatorEngine(timeframes)
+        self.writer = writer
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="socket-handler")
+        self.server = None
+        self.clients = 0
 
     def start(self):
-        while True:
+        asyncio.run(self.serve_forever())
+
+    async def serve_forever(self):
+        await self.open()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def open(self):
+        if self.writer is not None:
+            self.writer.start()
+        self._pending = asyncio.Semaphore(self.max_pending)
+        self.server = await asyncio.start_server(
+            self.handle_client, self.address, self.port, limit=MAX_LINE_BYTES
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"Python Socket Server started at {self.address}:{self.port}")
+        return self.server
 
-            conn, addr = self.sock.accept()
-            print("Connected by {addr}")
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+        if self.writer is not None:
+            self.writer.stop()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        addr = writer.get_extra_info('peername')
+        self.clients += 1
+        print(f"Connected by {addr} ({self.clients} clients)")
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:
+                    # اتصال بسته شد؛ آخرین پیام ممکن است بدون \n آمده باشد
+                    line = e.partial
+                    if not line.strip():
+                        break
+                except asyncio.LimitOverrunError:
+                    print(f"Message from {addr} exceeds {MAX_LINE_BYTES} bytes, closing connection")
+                    break
+
+                decoded = line.decode('utf-8').strip()
+                if decoded:
+                    async with self._pending:
+                        await loop.run_in_executor(self.executor, self.handle_data, decoded)
+                    writer.write(ACK)
+                    await writer.drain()
+
+                if reader.at_eof():
+                    break
+        except (ConnectionResetError, BrokenPipeError) as e:
+            print(f"Connection error from {addr}: {e}")
+        except Exception as e:
+            print(f"Error: {e}")
+        finally:
+            self.clients -= 1
+            writer.close()
             try:
-                data=conn.recv(10000)
-                if not data:
-                    print("No data received")
-                    continue
-                decoded = data.decode('utf-8').strip()
-                self.handle_data(decoded)
-
-                conn.send(b"RECEIVES")
-            except Exception as e:
-                print(f"Error: {e}")
-            finally:
-                conn.close()
+                await writer.wait_closed()
+            except (ConnectionResetError, BrokenPipeError):
+                pass
+
     def handle_data(self, msg):
         try:
             symbol , prices_tr = msg.split('|', 1)
             prices= [float(p) for p in prices_tr.strip().split()]
-            print(f"Data received for {symbol}: {len(prices)} prices")
         except Exception as e:
             print(f"Failed to parse message: {msg}\nError: {e}")
+            return []
+
+        # ساخت کندل و محاسبه‌ی اندیکاتورها در حافظه
+        events = self.engine.on_prices(symbol.strip(), prices)
+        for event in events:
+            self.handle_bar(event)
+        return events
+
+    def handle_bar(self, event):
+        """
+        فراخوانی برای هر کندل بسته‌شده همراه مقادیر اندیکاتورها.
+        """
+        bar = event["bar"]
+        if self.writer is not None:
+            self.writer.submit(event["symbol"], event["timeframe"], bar)
+        print(f"🕯️ {event['symbol']} [{event['timeframe']}] {bar['time']} close={bar['close']} "
+              f"→ {', '.join(event['values'])}")
 
 if __name__== '__main__':
-    server = CryptoSocketServer()
-    server.start()
\ No newline at end of file
+    server = CryptoSocketServer(writer=OHLCVWriter())
+    try:
+        server.start()
+    finally:
+        server.writer.stop()
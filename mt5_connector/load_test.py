@@ -0,0 +1,93 @@
+# mt5_connector/load_test.py
+
+"""
+تست بار سرور سوکت با کلاینت‌های جعلی محلی.
+
+    python -m mt5_connector.load_test --clients 200 --messages 500 --prices 20
+
+اگر --port داده نشود یک CryptoSocketServer روی پورت آزاد همین پروسه اجرا می‌شود.
+خروجی: تعداد پیام بر ثانیه و صدک‌های تأخیر ack.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from mt5_connector.live_data_receiver import CryptoSocketServer, ACK
+
+
+async def fake_client(host: str, port: int, messages: int, prices: int, symbol: str, latencies: list):
+    reader, writer = await asyncio.open_connection(host, port)
+    price = 60000.0
+    try:
+        for _ in range(messages):
+            ticks = []
+            for _ in range(prices):
+                price += random.uniform(-5, 5)
+                ticks.append(f"{price:.2f}")
+            payload = f"{symbol}|{' '.join(ticks)}\n".encode()
+
+            started = time.perf_counter()
+            writer.write(payload)
+            await writer.drain()
+            ack = await reader.readuntil(b"\n")
+            latencies.append(time.perf_counter() - started)
+            if ack != ACK:
+                raise RuntimeError(f"Unexpected ack: {ack!r}")
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_load_test(clients: int, messages: int, prices: int, host: str = "127.0.0.1", port: int = None) -> dict:
+    server = None
+    if port is None:
+        server = CryptoSocketServer(address=host, port=0)
+        server.handle_bar = lambda event: None
+        await server.open()
+        port = server.port
+
+    latencies = []
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*[
+            fake_client(host, port, messages, prices, f"SYM{i % 50}", latencies)
+            for i in range(clients)
+        ])
+    finally:
+        elapsed = time.perf_counter() - started
+        if server is not None:
+            await server.close()
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "clients": clients,
+        "messages": len(latencies),
+        "seconds": elapsed,
+        "msgs_per_sec": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+        "max_ms": float(lat_ms.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for CryptoSocketServer")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=200, help="messages per client")
+    parser.add_argument("--prices", type=int, default=20, help="prices per message")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="existing server port (default: start one in-process)")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run_load_test(args.clients, args.messages, args.prices, args.host, args.port))
+    print(f"📊 {stats['clients']} clients, {stats['messages']} messages in {stats['seconds']:.2f}s")
+    print(f"   {stats['msgs_per_sec']:,.0f} msgs/s | ack p50 {stats['p50_ms']:.2f} ms | "
+          f"p99 {stats['p99_ms']:.2f} ms | max {stats['max_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# mt5_connector/replay_mt5.py
+
+"""
+جایگزین آفلاین ماژول MetaTrader5: آرایه‌های rates ضبط‌شده (numpy structured با همان
+dtype خروجی copy_rates_*) را بازپخش می‌کند تا دانلودر، بک‌فیل و بنچمارک‌ها بدون
+ترمینال متاتریدر (مثلاً روی لینوکس) اجرا شوند.
+
+فقط بخشی از API که پروژه استفاده می‌کند پیاده‌سازی شده است:
+initialize / shutdown / last_error / symbols_get / symbol_select /
+copy_rates_from_pos / copy_rates_from / copy_rates_range
+
+داده‌ها از پوشه‌ی REPLAY_MT5_DIR (فایل‌های <SYMBOL>_<TIMEFRAME>.npy) یا با
+load_rates() بارگذاری می‌شوند. با set_clock() فقط کندل‌های تا یک زمان مشخص دیده
+می‌شوند و با latency تأخیر هر فراخوانی ترمینال شبیه‌سازی می‌شود.
+"""
+
+import glob
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+
+TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60,
+    TIMEFRAME_M5: 300,
+    TIMEFRAME_M15: 900,
+    TIMEFRAME_M30: 1800,
+    TIMEFRAME_H1: 3600,
+    TIMEFRAME_H4: 14400,
+    TIMEFRAME_D1: 86400,
+}
+
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8'),
+])
+
+SymbolInfo = namedtuple("SymbolInfo", ["name", "path", "visible"])
+
+# تأخیر شبیه‌سازی‌شده‌ی هر فراخوانی ترمینال (ثانیه)
+latency = 0.0
+
+_rates = {}
+_selected = set()
+_clock = None
+_initialized = False
+_last_error = (1, "Success")
+
+
+# ------------------------ بارگذاری داده‌ها ------------------------
+
+def load_rates(symbol: str, timeframe: int, rates: np.ndarray):
+    """
+    ثبت آرایه‌ی rates برای (نماد، تایم‌فریم)؛ بر اساس time مرتب می‌شود.
+    """
+    rates = np.asarray(rates)
+    converted = np.zeros(len(rates), dtype=RATES_DTYPE)
+    for name in RATES_DTYPE.names:
+        if name in rates.dtype.names:
+            converted[name] = rates[name]
+    _rates[(symbol, timeframe)] = converted[np.argsort(converted['time'], kind='stable')]
+
+
+def load_directory(path: str) -> int:
+    """
+    بارگذاری همه‌ی فایل‌های <SYMBOL>_<TIMEFRAME>.npy یک پوشه.
+    """
+    count = 0
+    for file in glob.glob(os.path.join(path, "*.npy")):
+        symbol, _, timeframe = os.path.basename(file)[:-4].rpartition("_")
+        load_rates(symbol, int(timeframe), np.load(file))
+        count += 1
+    return count
+
+
+def save_rates(path: str, symbol: str, timeframe: int, rates: np.ndarray = None):
+    os.makedirs(path, exist_ok=True)
+    rates = _rates[(symbol, timeframe)] if rates is None else rates
+    np.save(os.path.join(path, f"{symbol}_{timeframe}.npy"), rates)
+
+
+def record_from_terminal(terminal, path: str, symbols: list, timeframes: list, count: int):
+    """
+    ضبط داده‌های ترمینال واقعی (ماژول MetaTrader5 متصل) برای بازپخش بعدی.
+    """
+    for symbol in symbols:
+        terminal.symbol_select(symbol, True)
+        for timeframe in timeframes:
+            rates = terminal.copy_rates_from_pos(symbol, timeframe, 0, count)
+            if rates is not None and len(rates):
+                save_rates(path, symbol, timeframe, rates)
+
+
+def synthetic_rates(timeframe: int, count: int, end=None, seed: int = 0, start_price: float = 60000.0) -> np.ndarray:
+    """
+    تولید کندل‌های تصادفی (random walk) برای بنچمارک‌ها.
+    """
+    seconds = TIMEFRAME_SECONDS[timeframe]
+    end = _to_seconds(end if end is not None else time.time())
+    end -= end % seconds
+
+    rng = np.random.default_rng(seed)
+    close = start_price + np.cumsum(rng.normal(0, start_price * 1e-3, count))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    spread = np.abs(rng.normal(0, start_price * 5e-4, count))
+
+    rates = np.zeros(count, dtype=RATES_DTYPE)
+    rates['time'] = end - seconds * np.arange(count - 1, -1, -1, dtype=np.int64)
+    rates['open'] = open_
+    rates['close'] = close
+    rates['high'] = np.maximum(open_, close) + spread
+    rates['low'] = np.minimum(open_, close) - spread
+    rates['tick_volume'] = rng.integers(1, 1000, count)
+    return rates
+
+
+def set_clock(ts=None):
+    """
+    زمان فعلی بازپخش؛ کندل‌های بعد از آن دیده نمی‌شوند (None = همه).
+    """
+    global _clock
+    _clock = None if ts is None else _to_seconds(ts)
+
+
+def reset():
+    global _clock
+    _rates.clear()
+    _selected.clear()
+    _clock = None
+
+
+# ------------------------ API سازگار با MetaTrader5 ------------------------
+
+def initialize(*args, **kwargs) -> bool:
+    global _initialized
+    replay_dir = os.environ.get("REPLAY_MT5_DIR")
+    if replay_dir and not _rates:
+        load_directory(replay_dir)
+    _initialized = True
+    _set_error(1, "Success")
+    return True
+
+
+def shutdown():
+    global _initialized
+    _initialized = False
+    return True
+
+
+def last_error():
+    return _last_error
+
+
+def symbols_get(group: str = None):
+    names = sorted({symbol for symbol, _ in _rates})
+    return tuple(SymbolInfo(name, f"Crypto\\{name}", name in _selected) for name in names)
+
+
+def symbol_select(symbol: str, enable: bool = True) -> bool:
+    _call()
+    if not any(s == symbol for s, _ in _rates):
+        _set_error(-1, f"Unknown symbol {symbol}")
+        return False
+    if enable:
+        _selected.add(symbol)
+    else:
+        _selected.discard(symbol)
+    return True
+
+
+def copy_rates_from_pos(symbol: str, timeframe: int, start_pos: int, count: int):
+    """
+    start_pos=0 جدیدترین کندل است؛ خروجی از قدیم به جدید مرتب است.
+    """
+    rates = _visible(symbol, timeframe)
+    if rates is None:
+        return None
+    stop = len(rates) - start_pos
+    if stop <= 0:
+        return rates[:0].copy()
+    return rates[max(0, stop - count):stop].copy()
+
+
+def copy_rates_from(symbol: str, timeframe: int, date_from, count: int):
+    rates = _visible(symbol, timeframe)
+    if rates is None:
+        return None
+    stop = np.searchsorted(rates['time'], _to_seconds(date_from), side='right')
+    return rates[max(0, stop - count):stop].copy()
+
+
+def copy_rates_range(symbol: str, timeframe: int, date_from, date_to):
+    rates = _visible(symbol, timeframe)
+    if rates is None:
+        return None
+    times = rates['time']
+    lo = np.searchsorted(times, _to_seconds(date_from), side='left')
+    hi = np.searchsorted(times, _to_seconds(date_to), side='right')
+    return rates[lo:hi].copy()
+
+
+# ------------------------ داخلی ------------------------
+
+def _set_error(code: int, message: str):
+    global _last_error
+    _last_error = (code, message)
+
+
+def _call():
+    if latency:
+        time.sleep(latency)
+
+
+def _visible(symbol: str, timeframe: int):
+    _call()
+    if not _initialized:
+        _set_error(-10004, "No IPC connection")
+        return None
+    rates = _rates.get((symbol, timeframe))
+    if rates is None:
+        _set_error(-1, f"No rates for {symbol} [{timeframe}]")
+        return None
+    if _clock is not None:
+        rates = rates[:np.searchsorted(rates['time'], _clock, side='right')]
+    return rates
+
+
+def _to_seconds(value) -> int:
+    # datetime بدون منطقه‌ی زمانی مثل متاتریدر UTC در نظر گرفته می‌شود
+    if isinstance(value, (int, np.integer, float, np.floating)):
+        return int(value)
+    return int(pd.Timestamp(value).timestamp())
@@ -0,0 +1,122 @@
+# refresh_service.py
+
+"""
+سرویس بروزرسانی پس‌زمینه: در فواصل ثابت کندل‌های جدید را از متاتریدر دریافت و
+اندیکاتورها و پرایس اکشن را به‌صورت افزایشی محاسبه می‌کند؛ پس از هر تغییر زمان آخرین بروزرسانی
+در metadata نماد (کلید last_updated) ثبت می‌شود تا خواننده‌ها (app.py) فقط وقتی
+داده واقعاً عوض شده کش خود را نامعتبر کنند.
+
+    python refresh_service.py --symbols BTCUSD ETHUSD --interval 60
+
+یا درون پروسه: RefreshService(["BTCUSD"]).start()
+"""
+
+import argparse
+import threading
+import traceback
+from datetime import datetime, timezone
+
+from config import SUPPORTED_TIMEFRAMES, REFRESH_INTERVAL
+from database.db_operations import get_metadata, update_symbol_metadata
+from indicators.indicator_runner import build_targets, run_indicators, close_worker_pool
+from mt5_connector.historical_fetcher import connect_mt5, shutdown_mt5, download_historical_data
+
+LAST_UPDATED_KEY = "last_updated"
+
+
+def get_last_updated(symbol: str):
+    return get_metadata(symbol, LAST_UPDATED_KEY)
+
+
+def refresh_symbols(symbols: list, timeframes: list = None, processes: int = 1) -> list:
+    """
+    یک دور بروزرسانی: دانلود کندل‌های جاافتاده و محاسبه‌ی افزایشی اندیکاتورها.
+
+    :param processes: 1 = در همین پروسه؛ بیشتر = pool کارگرهایی که بین دورها نگه داشته می‌شود
+
+    :return: نمادهایی که داده‌شان تغییر کرده است
+    """
+    timeframes = timeframes or SUPPORTED_TIMEFRAMES
+    download_historical_data(symbols, timeframes)
+
+    # فقط (نماد، تایم‌فریم)هایی که OHLCVشان تغییر کرده
+    rows = run_indicators(build_targets(symbols, timeframes), processes=processes)
+
+    changed = sorted({symbol for (symbol, _), count in rows.items() if count})
+    for symbol in changed:
+        update_symbol_metadata(symbol, LAST_UPDATED_KEY,
+                               datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f'))
+    return changed
+
+
+class RefreshService:
+    """
+    ترد پس‌زمینه‌ی بروزرسانی؛ اتصال متاتریدر در تمام عمر سرویس باز می‌ماند.
+    """
+
+    def __init__(self, symbols: list, interval: float = REFRESH_INTERVAL, timeframes: list = None,
+                 processes: int = 1):
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.timeframes = timeframes
+        self.processes = processes
+        self.thread = None
+        self.first_cycle = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.thread is None:
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, name="refresh-service", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        if self.thread is not None:
+            self._stop.set()
+            self.thread.join(timeout)
+            self.thread = None
+
+    def wait_first_cycle(self, timeout: float = None) -> bool:
+        return self.first_cycle.wait(timeout)
+
+    def _run(self):
+        connected = False
+        try:
+            while not self._stop.is_set():
+                try:
+                    if not connected:
+                        connect_mt5()
+                        connected = True
+                    changed = refresh_symbols(self.symbols, self.timeframes, self.processes)
+                    print(f"🔄 Refresh cycle done ({len(changed)} symbol(s) changed)")
+                except Exception as e:
+                    print(f"❌ Refresh cycle failed: {e}")
+                    traceback.print_exc()
+                finally:
+                    self.first_cycle.set()
+                self._stop.wait(self.interval)
+        finally:
+            if connected:
+                shutdown_mt5()
+            if self.processes != 1:
+                close_worker_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep symbol databases and indicators up to date")
+    parser.add_argument("--symbols", nargs="+", default=["BTCUSD"])
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL, help="seconds between refresh cycles")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="indicator worker processes, kept alive across cycles (1 = run in the service thread)")
+    args = parser.parse_args()
+
+    service = RefreshService(args.symbols, interval=args.interval, processes=args.processes).start()
+    try:
+        service.thread.join()
+    except KeyboardInterrupt:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
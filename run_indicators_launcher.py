@@ -1,5 +1,31 @@
 # run_indicators_launcher.py
-from indicators.indicator_runner import run_all_indicators_parallel
+
+"""
+    python run_indicators_launcher.py                                   # همه‌ی نمادها و تایم‌فریم‌های تغییرکرده
+    python run_indicators_launcher.py --symbols BTCUSD --timeframes H4
+    python run_indicators_launcher.py --symbols BTCUSD --indicators rsi macd --full
+    python run_indicators_launcher.py --indicators price_action         # فقط سوینگ‌ها، ساختار و کانال‌ها
+
+درون پروسه: main(["--symbols", "BTCUSD", "--timeframes", "H4"])
+"""
+
+import argparse
+
+from indicators.indicator_runner import build_targets, run_indicators
+
+
+def main(argv: list = None) -> dict:
+    parser = argparse.ArgumentParser(description="Recompute indicators for changed symbol/timeframe pairs")
+    parser.add_argument("--symbols", nargs="+", help="default: all registered symbols")
+    parser.add_argument("--timeframes", nargs="+", help="timeframe names, e.g. M5 H4 (default: all supported)")
+    parser.add_argument("--indicators", nargs="+", help="indicator names, e.g. rsi macd price_action (default: all)")
+    parser.add_argument("--full", action="store_true", help="full recompute, ignoring stored states")
+    parser.add_argument("--processes", type=int, help="worker processes (1 = run in this process)")
+    args = parser.parse_args(argv)
+
+    targets = build_targets(args.symbols, args.timeframes, args.indicators)
+    return run_indicators(targets, full=args.full, processes=args.processes)
+
 
 if __name__ == "__main__":
-    run_all_indicators_parallel()
+    main()
@@ -0,0 +1,58 @@
+# tests/conftest.py
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_ohlcv(n: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """
+    کندل‌های ساختگی ثابت (قدم تصادفی با seed مشخص) با ستون‌های جدول OHLCV.
+    """
+    rng = np.random.default_rng(seed)
+    close = 60000 + np.cumsum(rng.normal(0, 50, n))
+    open_ = close + rng.normal(0, 20, n)
+    high = np.maximum(open_, close) + rng.random(n) * 40
+    low = np.minimum(open_, close) - rng.random(n) * 40
+    return pd.DataFrame({
+        "time": pd.date_range("2024-01-01", periods=n, freq="h"),
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": rng.integers(1, 1000, n),
+    })
+
+
+def to_mt5_rates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    همان کندل‌ها با نام ستون‌های MT5 (ورودی insert_ohlcv_data).
+    """
+    return df.rename(columns={"volume": "tick_volume"})
+
+
+@pytest.fixture
+def ohlcv():
+    return make_ohlcv()
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    دیتابیس‌های نماد و کش ستونی در یک پوشه‌ی موقت.
+    """
+    from database import db_operations, column_cache
+
+    os.makedirs(tmp_path / "db_per_symbol")
+    monkeypatch.setattr(db_operations, "DB_DIR", str(tmp_path / "db_per_symbol"))
+    monkeypatch.setattr(db_operations, "_initialized_tables", set())
+    monkeypatch.setattr(db_operations, "_time_kinds", {})
+    monkeypatch.setattr(column_cache, "CACHE_DIR", str(tmp_path / "column_cache"))
+    monkeypatch.setattr(column_cache, "_maps", {})
+    yield tmp_path
+    db_operations.close_connections()
@@ -0,0 +1,78 @@
+# tests/test_column_cache.py
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from conftest import make_ohlcv, to_mt5_rates
+from database.column_cache import read_ohlcv, _generations
+from database.db_operations import (
+    connect,
+    get_db_path,
+    insert_ohlcv_data,
+    fetch_recent_data,
+    delete_old_data
+)
+
+
+def assert_matches_sqlite(symbol: str, timeframe: str):
+    expected = fetch_recent_data(symbol, timeframe, limit=None)
+    pd.testing.assert_frame_equal(read_ohlcv(symbol, timeframe, limit=None), expected, check_dtype=False)
+
+
+def test_views_are_never_rewritten(data_dir):
+    rates = to_mt5_rates(make_ohlcv(3000))
+    insert_ohlcv_data(rates.iloc[:2000].copy(), "CACHE", "H1")
+    view = read_ohlcv("CACHE", "H1", limit=None)
+    snapshot = view.copy()
+
+    # اضافه شدن کندل‌های جدید: همان نسل
+    insert_ohlcv_data(rates.iloc[2000:2500].copy(), "CACHE", "H1")
+    assert_matches_sqlite("CACHE", "H1")
+    assert _generations("CACHE", "H1") == [1]
+
+    # جایگزینی آخرین کندل: نسل جدید
+    bar = rates.iloc[2499:2500].copy()
+    bar["close"] += 5
+    insert_ohlcv_data(bar, "CACHE", "H1", replace=True)
+    assert_matches_sqlite("CACHE", "H1")
+    assert _generations("CACHE", "H1") == [1, 2]
+
+    # حذف داده‌های قدیمی: نسل جدید از ابتدا
+    delete_old_data("CACHE", "H1", keep_last_n=1000)
+    assert_matches_sqlite("CACHE", "H1")
+    assert _generations("CACHE", "H1") == [2, 3]
+
+    # نمای گرفته‌شده پیش از همه‌ی این تغییرات دست نخورده است
+    pd.testing.assert_frame_equal(view, snapshot)
+    assert not view["close"].to_numpy().flags.writeable
+
+
+def test_other_timeframe_changes_take_no_write_lock(data_dir):
+    rates = to_mt5_rates(make_ohlcv(500))
+    insert_ohlcv_data(rates.copy(), "LOCK", "H1")
+    read_ohlcv("LOCK", "H1")
+    insert_ohlcv_data(rates.copy(), "LOCK", "M15")
+
+    # نویسنده‌ی دیگری قفل نوشتن را نگه داشته است
+    writer = sqlite3.connect(get_db_path("LOCK"))
+    writer.execute("BEGIN IMMEDIATE")
+    connect("LOCK").execute("PRAGMA busy_timeout = 50")
+    try:
+        assert len(read_ohlcv("LOCK", "H1", limit=None)) == 500
+    finally:
+        writer.rollback()
+        writer.close()
+
+
+def test_insert_does_not_touch_the_cache(data_dir):
+    rates = to_mt5_rates(make_ohlcv(500))
+    insert_ohlcv_data(rates.iloc[:400].copy(), "LAZY", "H1")
+    assert _generations("LAZY", "H1") == []
+
+    read_ohlcv("LAZY", "H1")
+    insert_ohlcv_data(rates.iloc[400:].copy(), "LAZY", "M15")
+    insert_ohlcv_data(rates.iloc[400:].copy(), "LAZY", "H1")
+    assert _generations("LAZY", "M15") == []
+    assert_matches_sqlite("LAZY", "H1")
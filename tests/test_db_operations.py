@@ -0,0 +1,67 @@
+# tests/test_db_operations.py
+
+import pandas as pd
+
+from conftest import make_ohlcv, to_mt5_rates
+from database.db_operations import (
+    connect,
+    insert_ohlcv_data,
+    store_indicator_frame,
+    store_channel_frame,
+    delete_old_data,
+    fetch_recent_data,
+    fetch_indicator_data,
+    fetch_channel_frame,
+    get_indicator_table
+)
+from indicators.enums import TRADE, choose
+
+
+def test_text_column_is_recreated_as_codes(data_dir):
+    rates = to_mt5_rates(make_ohlcv(50))
+    insert_ohlcv_data(rates.copy(), "OLD", "H1")
+
+    # جدول قدیمی با ستون متنی
+    signal = pd.Series(["Hold", "Buy", "Sell"] * 16 + ["Hold", "Buy"])
+    old = pd.DataFrame({"time": rates["time"], "TR": rates["close"] * 0.01, "Final_Signal": signal})
+    store_indicator_frame("OLD", "H1", "atr", old)
+
+    table = get_indicator_table("atr", "H1")
+    conn = connect("OLD")
+    types = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+    assert types["Final_Signal"] == "TEXT"
+
+    coded = old.assign(Final_Signal=choose([signal == "Buy", signal == "Sell"], TRADE))
+    store_indicator_frame("OLD", "H1", "atr", coded)
+
+    types = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+    assert list(types) == ["time", "TR", "Final_Signal"]
+    assert types["Final_Signal"] == "INTEGER"
+    assert not conn.in_transaction
+
+    stored = fetch_indicator_data("OLD", "H1", "atr", limit=None)
+    assert stored["TR"].tolist() == old["TR"].tolist()
+    assert stored["Final_Signal"].astype(object).tolist() == signal.tolist()
+
+
+def test_delete_old_data_prunes_channels(data_dir):
+    rates = to_mt5_rates(make_ohlcv(100))
+    insert_ohlcv_data(rates.copy(), "PRUNE", "H1")
+    times = rates["time"]
+
+    def channel(kind, start, end):
+        return {"type": kind, "start": times[start], "end": times[end],
+                "lower_x0": times[start], "lower_y0": 1.0, "lower_x1": times[end], "lower_y1": 2.0,
+                "upper_x0": times[start], "upper_y0": 3.0, "upper_x1": times[end], "upper_y1": 4.0}
+
+    store_channel_frame("PRUNE", "H1", pd.DataFrame([
+        channel("up", 10, 40),     # قبل از کندل‌های باقی‌مانده تمام می‌شود
+        channel("down", 30, 70),   # با کندل‌های باقی‌مانده هم‌پوشانی دارد
+        channel("up", 60, 99),
+    ]))
+
+    delete_old_data("PRUNE", "H1", keep_last_n=50)
+
+    assert fetch_recent_data("PRUNE", "H1", limit=None)["time"].iloc[0] == times[49]
+    channels = fetch_channel_frame("PRUNE", "H1")
+    assert channels["start"].tolist() == [times[30], times[60]]
@@ -0,0 +1,28 @@
+# tests/test_incremental.py
+
+import pandas as pd
+
+from conftest import make_ohlcv, to_mt5_rates
+from database.db_operations import insert_ohlcv_data
+from indicators.indicator_manager import calculate_and_store_indicators, fetch_indicators
+
+
+def test_incremental_matches_full_after_appends(data_dir):
+    rates = to_mt5_rates(make_ohlcv(1520, seed=1))
+
+    # اجرای کامل روی 1500 کندل و سپس 20 کندل یکی‌یکی (مثل پخش زنده)
+    insert_ohlcv_data(rates.iloc[:1500].copy(), "INC", "H1")
+    calculate_and_store_indicators("INC", "H1")
+    for end in range(1501, 1521):
+        insert_ohlcv_data(rates.iloc[:end].copy(), "INC", "H1")
+        assert calculate_and_store_indicators("INC", "H1") > 0
+
+    insert_ohlcv_data(rates.copy(), "FULL", "H1")
+    calculate_and_store_indicators("FULL", "H1", incremental=False)
+
+    incremental = fetch_indicators("INC", "H1")
+    full = fetch_indicators("FULL", "H1")
+    assert list(incremental.columns) == list(full.columns)
+    assert {"SMA", "RSI_MA_SMA", "RSI_MA_VWMA", "TR"} <= set(full.columns)
+    # بیت‌به‌بیت، نه با تلورانس
+    pd.testing.assert_frame_equal(incremental, full, check_exact=True)
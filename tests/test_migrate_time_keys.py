@@ -0,0 +1,67 @@
+# tests/test_migrate_time_keys.py
+
+import json
+
+import pandas as pd
+
+from conftest import make_ohlcv, to_mt5_rates
+from database import db_operations
+from database.db_operations import (
+    connect,
+    get_db_path,
+    get_metadata,
+    insert_ohlcv_data,
+    fetch_channel_frame
+)
+from database.migrate_time_keys import migrate_database
+from indicators.indicator_manager import calculate_and_store_indicators, fetch_indicators
+from analysis.price_action.price_action_manager import calculate_and_store_price_action
+
+
+def _time_types(symbol: str) -> dict:
+    conn = connect(symbol)
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    types = {}
+    for table in tables:
+        for row in conn.execute(f"PRAGMA table_info({table})"):
+            if row[1] in ("time", "start", "end"):
+                types[f"{table}.{row[1]}"] = row[2]
+    return types
+
+
+def test_compute_migrate_fetch(data_dir, monkeypatch):
+    rates = to_mt5_rates(make_ohlcv(610, seed=2))
+
+    # دیتابیس قدیمی با کلیدهای متنی
+    monkeypatch.setattr(db_operations, "EPOCH_TIME_KEYS", False)
+    insert_ohlcv_data(rates.iloc[:600].copy(), "OLD", "H1")
+    calculate_and_store_indicators("OLD", "H1")
+    calculate_and_store_price_action("OLD", "H1")
+    before = fetch_indicators("OLD", "H1")
+    channels = fetch_channel_frame("OLD", "H1")
+    assert before["RSI"].notna().sum() == 600
+    assert len(channels)
+    assert set(_time_types("OLD").values()) == {"TEXT"}
+
+    monkeypatch.setattr(db_operations, "EPOCH_TIME_KEYS", True)
+    migrated = migrate_database(get_db_path("OLD"))
+    assert {"ohlcv_H1", "rsi_h1", "price_action_h1", "channels_h1"} <= set(migrated)
+    assert set(_time_types("OLD").values()) == {"INTEGER"}
+
+    after = fetch_indicators("OLD", "H1")
+    pd.testing.assert_frame_equal(after, before)
+    pd.testing.assert_frame_equal(fetch_channel_frame("OLD", "H1"), channels)
+    assert get_metadata("OLD", "indicator_state_rsi_H1") is None
+    assert get_metadata("OLD", "price_action_state_H1") is None
+
+    # اجرای بعدی کامل است و با یک دیتابیس epoch از ابتدا یکی است
+    insert_ohlcv_data(rates.copy(), "OLD", "H1")
+    assert calculate_and_store_indicators("OLD", "H1") == 610
+    assert calculate_and_store_price_action("OLD", "H1") == 610
+    insert_ohlcv_data(rates.copy(), "NEW", "H1")
+    calculate_and_store_indicators("NEW", "H1")
+    calculate_and_store_price_action("NEW", "H1")
+    pd.testing.assert_frame_equal(fetch_indicators("OLD", "H1"),
+                                  fetch_indicators("NEW", "H1"))
+    assert json.loads(get_metadata("OLD", "indicator_state_rsi_H1"))["last_time"] == \
+        json.loads(get_metadata("NEW", "indicator_state_rsi_H1"))["last_time"]
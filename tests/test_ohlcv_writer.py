@@ -0,0 +1,50 @@
+# tests/test_ohlcv_writer.py
+
+from contextlib import contextmanager
+
+from conftest import make_ohlcv
+from database import ohlcv_writer
+from database.db_operations import fetch_recent_data
+from database.ohlcv_writer import OHLCVWriter
+
+
+def write(bars_by_series: dict, monkeypatch) -> list:
+    """
+    نوشتن کندل‌ها با یک OHLCVWriter (یک flush در stop)؛ خروجی: نماد هر transaction.
+    """
+    opened = []
+    transaction = ohlcv_writer.transaction
+
+    @contextmanager
+    def counted(symbol):
+        opened.append(symbol)
+        with transaction(symbol) as conn:
+            yield conn
+
+    monkeypatch.setattr(ohlcv_writer, "transaction", counted)
+    writer = OHLCVWriter(max_batch=10**6, flush_interval=60).start()
+    for (symbol, timeframe), df in bars_by_series.items():
+        for bar in df.to_dict("records"):
+            writer.submit(symbol, timeframe, bar)
+    writer.stop()
+    assert writer.stats["errors"] == 0
+    return opened
+
+
+def test_flush_writes_each_symbol_in_one_transaction(data_dir, monkeypatch):
+    ohlcv = make_ohlcv(50)
+    series = {(symbol, tf): ohlcv for symbol in ("A", "B") for tf in ("M1", "M5")}
+
+    assert sorted(write(series, monkeypatch)) == ["A", "B"]
+    for symbol, timeframe in series:
+        assert len(fetch_recent_data(symbol, timeframe, limit=None)) == 50
+
+
+def test_late_bars_are_not_dropped(data_dir, monkeypatch):
+    ohlcv = make_ohlcv(50)
+    write({("A", "M1"): ohlcv.drop(index=[10, 20])}, monkeypatch)
+    write({("A", "M1"): ohlcv.loc[[10, 20]]}, monkeypatch)
+
+    stored = fetch_recent_data("A", "M1", limit=None)
+    assert len(stored) == 50
+    assert stored["time"].tolist() == ohlcv["time"].tolist()
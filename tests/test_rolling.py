@@ -0,0 +1,73 @@
+# tests/test_rolling.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import rolling
+from indicators.online import RollingMean, RollingSum, RollingWMA
+
+
+def apply_wma(series: pd.Series, length: int) -> pd.Series:
+    # مسیر قدیمی: یک np.dot برای هر پنجره
+    return series.rolling(length).apply(
+        lambda x: np.dot(x, np.arange(1, len(x)+1))/np.arange(1, len(x)+1).sum(),
+        raw=True
+    )
+
+
+@pytest.fixture
+def series(ohlcv):
+    # یک NaN وسط سری تا پنجره‌های NaN‌دار هم پوشش داده شوند
+    close = ohlcv["close"].copy()
+    close.iloc[700] = np.nan
+    return close
+
+
+def assert_close(result: pd.Series, expected: pd.Series, rtol: float):
+    assert np.array_equal(np.isnan(result.to_numpy()), np.isnan(expected.to_numpy()))
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=rtol, atol=0)
+
+
+@pytest.mark.parametrize("length", [2, 9, 14, 50])
+def test_wma_matches_apply(series, length):
+    assert_close(rolling.wma(series, length), apply_wma(series, length), rtol=1e-14)
+
+
+@pytest.mark.parametrize("length", [9, 14, 50])
+def test_hma_matches_apply(series, length):
+    raw = 2 * apply_wma(series, int(length / 2)) - apply_wma(series, length)
+    assert_close(rolling.hma(series, length), apply_wma(raw, int(np.sqrt(length))), rtol=1e-12)
+
+
+def test_sums_match_pandas(ohlcv, series):
+    volume = ohlcv["volume"]
+    assert_close(rolling.sma(series, 20), series.rolling(20).mean(), rtol=1e-14)
+    assert_close(rolling.vwma(series, volume, 14),
+                 (series * volume).rolling(14).sum() / volume.rolling(14).sum(), rtol=1e-14)
+
+
+def test_rolling_max_abs_matches_apply(series):
+    expected = (series - series.mean()).rolling(50).apply(lambda x: np.max(np.abs(x)), raw=True)
+    result = rolling.rolling_max_abs(series - series.mean(), 50)
+    assert np.array_equal(result.to_numpy(), expected.to_numpy(), equal_nan=True)
+
+
+@pytest.mark.parametrize("func", [rolling.sma, rolling.wma, rolling.hma])
+def test_independent_of_start(series, func):
+    # مقدار هر کندل فقط به پنجره‌ی خودش وابسته است (محاسبه‌ی افزایشی = محاسبه‌ی کامل)
+    full = func(series, 14).to_numpy()
+    for start in (1, 333, 1200):
+        part = func(series.iloc[start:], 14).to_numpy()
+        assert np.array_equal(part[30:], full[start + 30:], equal_nan=True)
+
+
+@pytest.mark.parametrize("online, func", [
+    (RollingMean, rolling.sma),
+    (RollingSum, rolling.rolling_sum),
+    (RollingWMA, rolling.wma),
+])
+def test_online_matches_batch(series, online, func):
+    state = online(14)
+    streamed = [state.update(x) for x in series.tolist()]
+    assert np.array_equal(np.array(streamed), func(series, 14).to_numpy(), equal_nan=True)
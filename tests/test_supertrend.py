@@ -0,0 +1,85 @@
+# tests/test_supertrend.py
+
+import numpy as np
+import pandas as pd
+
+from indicators.inds.rsi import RSIIndicator
+from indicators.kernels import supertrend_scan
+
+
+def iloc_supertrend(rsi: pd.Series, atr: pd.Series, factor: float):
+    """
+    حلقه‌ی قدیمی calculate_supertrend (پیمایش با iloc) به‌عنوان مرجع؛ trend و band
+    پیش از fillna برگردانده می‌شوند.
+    """
+    upper_band = rsi + factor * atr
+    lower_band = rsi - factor * atr
+
+    supertrend = pd.Series(index=rsi.index, dtype=float)
+    trend_dir = pd.Series(index=rsi.index, dtype=int)
+
+    trend_dir.iloc[0] = 1
+    supertrend.iloc[0] = lower_band.iloc[0]
+
+    for i in range(1, len(rsi)):
+        if pd.isna(atr.iloc[i-1]):
+            trend_dir.iloc[i] = 1
+            supertrend.iloc[i] = lower_band.iloc[i]
+            continue
+
+        if supertrend.iloc[i-1] == upper_band.iloc[i-1]:
+            trend_dir.iloc[i] = 1 if rsi.iloc[i] >= upper_band.iloc[i] else -1
+        else:
+            trend_dir.iloc[i] = -1 if rsi.iloc[i] <= lower_band.iloc[i] else 1
+
+        if trend_dir.iloc[i] == 1:
+            supertrend.iloc[i] = lower_band.iloc[i]
+        else:
+            supertrend.iloc[i] = upper_band.iloc[i]
+
+    return trend_dir.to_numpy(dtype=float), supertrend.to_numpy(dtype=float)
+
+
+def _rsi_and_atr(ohlcv):
+    indicator = RSIIndicator("TEST", "H1", {})
+    rsi = indicator.calculate(ohlcv)['RSI']
+    # یک بازه‌ی بدون ATR وسط سری تا شاخه‌ی NaN هم پوشش داده شود
+    atr = indicator.calculate_atr_on_rsi(rsi, indicator.atr_length).copy()
+    atr.iloc[500:520] = np.nan
+    return indicator, rsi, atr
+
+
+def test_scan_matches_iloc_loop(ohlcv):
+    indicator, rsi, atr = _rsi_and_atr(ohlcv)
+    expected_trend, expected_band = iloc_supertrend(rsi, atr, indicator.trend_factor)
+
+    source = rsi.to_numpy(dtype=float)
+    upper = (rsi + indicator.trend_factor * atr).to_numpy(dtype=float)
+    lower = (rsi - indicator.trend_factor * atr).to_numpy(dtype=float)
+    inputs = [source, upper, lower, atr.to_numpy(dtype=float)]
+    before = [values.copy() for values in inputs]
+
+    trend = np.full(len(source), np.nan)
+    band = np.full(len(source), np.nan)
+    trend[0] = 1
+    band[0] = lower[0]
+    supertrend_scan(*inputs, trend, band, 1)
+
+    assert np.isnan(expected_band).any()
+    assert np.array_equal(trend, expected_trend, equal_nan=True)
+    assert np.array_equal(band, expected_band, equal_nan=True)
+    # ورودی‌ها دست نخورده‌اند
+    for values, original in zip(inputs, before):
+        assert np.array_equal(values, original, equal_nan=True)
+
+
+def test_calculate_supertrend_matches_iloc_loop(ohlcv):
+    indicator = RSIIndicator("TEST", "H1", {})
+    rsi = indicator.calculate(ohlcv)['RSI']
+    atr = indicator.calculate_atr_on_rsi(rsi, indicator.atr_length)
+    expected_trend, expected_band = iloc_supertrend(rsi, atr, indicator.trend_factor)
+
+    band, trend = RSIIndicator("TEST", "H1", {}).calculate_supertrend(indicator.trend_factor, indicator.atr_length, rsi)
+
+    assert np.array_equal(trend.to_numpy(), pd.Series(expected_trend).fillna(1).astype(int).to_numpy())
+    assert np.array_equal(band.to_numpy(), pd.Series(expected_band).bfill().ffill().to_numpy(), equal_nan=True)
@@ -10,7 +10,7 @@ VISIBLE_CANDLES_ATR = 20
 VISIBLE_CANDLES_EMA = 100
 
 # ----------------------------------------------------
-def plot_price_action_chart(df: pd.DataFrame, channels: list = None, title="Price Action"):
+def plot_price_action_chart(df: pd.DataFrame, channels: pd.DataFrame = None, title="Price Action"):
     df = df[df['time'].notna()].copy()
 
     visible_start = df['time'].iloc[-VISIBLE_CANDLES_PRICE]
@@ -68,8 +68,8 @@ def plot_price_action_chart(df: pd.DataFrame, channels: list = None, title="Pric
     ))
 
     # کانال‌ها
-    if channels and isinstance(channels, list):
-        fig = add_channels_to_figure(fig, df, channels)
+    if channels is not None and len(channels):
+        fig = add_channels_to_figure(fig, channels)
 
     fig.update_layout(
         title=title,